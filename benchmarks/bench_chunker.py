@@ -0,0 +1,70 @@
+"""Benchmark messaging.split_message on multi-KB responses.
+
+Generates tutor-like Markdown (prose, Unicode math, inline code and fenced
+code blocks) and reports throughput. The chunker's invariants are checked
+in tests/test_messaging.py.
+
+Usage:
+    python benchmarks/bench_chunker.py --samples 2000 --size 8000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import messaging
+
+WORDS = [
+    "the", "derivative", "of", "function", "is", "let's", "think", "about", "why",
+    "**key idea**", "*note*", "`f(x)`", "a² + b² = c²", "x = (-b ± √(b² - 4ac)) ÷ 2a",
+    "∫₀^∞ e^(-x²) dx = √π/2", "Σₙ₌₁^∞ 1/n² = π²/6", "θ", "λ", "café", "naïve",
+]
+
+
+def make_response(rng, size):
+    parts = []
+    length = 0
+    while length < size:
+        roll = rng.random()
+        if roll < 0.02:
+            lines = "\n".join(f"    total += values[{i}] * {rng.randrange(100)}" for i in range(rng.randrange(2, 120)))
+            part = f"\n```python\ndef compute(values):\n    total = 0\n{lines}\n    return total\n```\n"
+        elif roll < 0.08:
+            part = "\n\n"
+        elif roll < 0.12:
+            part = "\n- "
+        else:
+            part = rng.choice(WORDS)
+        parts.append(part)
+        length += len(part) + 1
+    return " ".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=8000, help="Approximate characters per response")
+    parser.add_argument("--limit", type=int, default=messaging.DISCORD_MESSAGE_LIMIT)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    responses = [make_response(rng, rng.randrange(args.size // 4, args.size * 2)) for _ in range(args.samples)]
+    total_chars = sum(len(r) for r in responses)
+
+    start = time.perf_counter()
+    results = [messaging.split_message(r, args.limit) for r in responses]
+    elapsed = time.perf_counter() - start
+
+    total_chunks = sum(len(c) for c in results)
+    print(f"responses      : {args.samples:,} ({total_chars / args.samples:,.0f} chars avg)")
+    print(f"chunks         : {total_chunks:,} ({total_chunks / args.samples:.2f} per response)")
+    print(f"per response   : {elapsed / args.samples * 1e6:,.1f} µs")
+    print(f"throughput     : {total_chars / elapsed / 1e6:,.2f} M chars/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Benchmark the bucketed conversation store against one document per turn.
+
+Writes --exchanges question/answer pairs for each of --users users through
+both layouts, then times the reads the bot does:
+
+    legacy   insert_many of two documents per exchange into `conversations`;
+             reads sort the user's documents by _id, limit, and reverse
+    buckets  db.add_exchange ($push into the latest bucket) and
+             db.get_conversation / db.get_conversation_exchanges
+
+and, against a real server, compares data and index sizes of the two
+collections.
+
+Usage:
+    python benchmarks/bench_conversation_store.py --users 200 --exchanges 500 --db schrody_bench
+    python benchmarks/bench_conversation_store.py --users 20 --exchanges 100 --mock
+
+Requires MONGO_URL unless --mock is given (mongomock; checks that both
+layouts return the same context, its timings say nothing about a real
+server). The scratch database is dropped at the end unless --keep is given.
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ANSWER = "Let's work through it together. What do you already know about this step? " * 4
+
+
+def legacy_add_exchange(db, user_id, question, answer):
+    now = datetime.datetime.utcnow()
+    db.conversations.insert_many([
+        {"user_id": str(user_id), "message": question, "role": "user", "timestamp": now},
+        {"user_id": str(user_id), "message": answer, "role": "assistant", "timestamp": now},
+    ])
+
+
+def legacy_get_conversation(db, user_id, limit):
+    msgs = list(db.conversations.find({"user_id": str(user_id)}).sort("_id", -1).limit(limit))
+    return [{"role": msg["role"], "message": msg["message"]} for msg in reversed(msgs)]
+
+
+def legacy_get_exchanges(db, user_id, limit=2000):
+    msgs = list(db.conversations.find({"user_id": str(user_id)}, {"_id": 0, "role": 1, "message": 1})
+                .sort("_id", -1).limit(limit * 2))
+    msgs.reverse()
+    return [(q["message"], a["message"]) for q, a in zip(msgs, msgs[1:])
+            if q["role"] == "user" and a["role"] != "user"]
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda pct: ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+    return f"mean {statistics.mean(samples):7.3f}ms  p50 {pick(50):7.3f}ms  p99 {pick(99):7.3f}ms"
+
+
+def time_each(fn, calls):
+    samples = []
+    for args in calls:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def sizes(db, name):
+    try:
+        stats = db.db.command("collStats", name)
+    except Exception:
+        return None
+    return stats.get("count", 0), stats.get("size", 0), stats.get("totalIndexSize", 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--exchanges", type=int, default=500, help="Exchanges per user")
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--context", type=int, default=10, help="Turns read per get_conversation")
+    parser.add_argument("--db", default="schrody_bench")
+    parser.add_argument("--mock", action="store_true", help="Use mongomock instead of MONGO_URL")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch database afterwards")
+    args = parser.parse_args()
+
+    os.environ["MONGO_DB"] = args.db
+    if args.mock:
+        import fakes  # noqa: F401  (swaps in mongomock)
+    import db
+
+    for name in ("conversations", "conversation_buckets", "users"):
+        db.db.drop_collection(name)
+    db.latest_bucket_cache.clear()
+    db.ensure_indexes()
+
+    rng = random.Random(7)
+    # Users take turns, as they do in production, so their documents interleave
+    writes = [(str(user), f"Question {i} from {user}?", ANSWER)
+              for i in range(args.exchanges) for user in range(args.users)]
+    total = len(writes)
+    print(f"{args.users:,} users x {args.exchanges:,} exchanges = {total:,} exchanges")
+
+    legacy = time_each(lambda *a: legacy_add_exchange(db, *a), writes)
+    buckets = time_each(db.add_exchange, writes)
+    print(f"\nwrite  legacy   {percentiles(legacy)}")
+    print(f"write  buckets  {percentiles(buckets)}")
+
+    # Bucket reads start from a cold pointer cache, as after a restart
+    readers = [(str(rng.randrange(args.users)), args.context) for _ in range(args.reads)]
+    legacy = time_each(lambda *a: legacy_get_conversation(db, *a), readers)
+    db.latest_bucket_cache.clear()
+    buckets = time_each(db.get_conversation, readers)
+    print(f"\nget_conversation({args.context})")
+    print(f"  legacy   {percentiles(legacy)}")
+    print(f"  buckets  {percentiles(buckets)}")
+
+    sample = readers[:50]
+    mismatches = sum(legacy_get_conversation(db, *r) != db.get_conversation(*r) for r in sample)
+    print(f"  same context for {len(sample) - mismatches}/{len(sample)} sampled users")
+
+    full = [(str(user),) for user in range(min(args.users, 50))]
+    legacy = time_each(lambda user: legacy_get_exchanges(db, user), full)
+    buckets = time_each(db.get_conversation_exchanges, full)
+    print(f"\nget_conversation_exchanges (retrieval index load)")
+    print(f"  legacy   {percentiles(legacy)}")
+    print(f"  buckets  {percentiles(buckets)}")
+
+    rows = [(name, sizes(db, name)) for name in ("conversations", "conversation_buckets")]
+    if all(stats for _, stats in rows):
+        print("\nstorage")
+        for name, (count, size, index_size) in rows:
+            print(f"  {name:<22} {count:>10,} docs  data {size / 2 ** 20:8.1f} MiB  "
+                  f"indexes {index_size / 2 ** 20:8.1f} MiB")
+
+    if not args.keep:
+        db.mongo_client.drop_database(args.db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark the feedback aggregation pipelines against the old cursor scan.
+
+Seeds a scratch database with synthetic sessions and feedback, then times
+the legacy `find(...)` + `list(...)` approach against `db.get_pending_feedback`
+and `db.get_feedback_stats`.
+
+Usage:
+    python benchmarks/bench_feedback.py --sessions 1000000 --db schrody_bench
+
+Requires MONGO_URL. The scratch database is dropped at the end unless --keep is given.
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def seed(database, sessions, users, guilds, batch_size=10_000):
+    """Insert synthetic sessions (80% ended, half of those without feedback) and feedback."""
+    rng = random.Random(42)
+    now = datetime.datetime.utcnow()
+    inserted = 0
+    while inserted < sessions:
+        batch = []
+        feedback = []
+        for _ in range(min(batch_size, sessions - inserted)):
+            user = rng.randrange(users)
+            start = now - datetime.timedelta(minutes=rng.randrange(60 * 24 * 60))
+            active = rng.random() < 0.2
+            feedback_given = not active and rng.random() < 0.5
+            guild_id = str(rng.randrange(guilds))
+            batch.append({
+                "user_id": str(user),
+                "username": f"user{user}",
+                "start_time": start,
+                "last_activity": start,
+                "end_time": None if active else start + datetime.timedelta(minutes=30),
+                "active": active,
+                "thread_id": str(rng.randrange(10 ** 12)),
+                "guild_id": guild_id,
+                "feedback_given": feedback_given,
+            })
+            if feedback_given:
+                feedback.append({
+                    "user_id": str(user),
+                    "rating": rng.randint(1, 5),
+                    "guild_id": guild_id,
+                    "timestamp": start + datetime.timedelta(minutes=31),
+                })
+        database.sessions.insert_many(batch, ordered=False)
+        if feedback:
+            database.feedback.insert_many(feedback, ordered=False)
+        inserted += len(batch)
+        print(f"  seeded {inserted:,}/{sessions:,} sessions", end="\r")
+    print()
+
+
+def timed(label, fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<45} {best * 1000:>10.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--guilds", type=int, default=50)
+    parser.add_argument("--db", default="schrody_bench")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch database afterwards")
+    args = parser.parse_args()
+
+    os.environ["MONGO_DB"] = args.db
+    import db
+
+    if db.sessions_collection.estimated_document_count() < args.sessions:
+        db.db.drop_collection("sessions")
+        db.db.drop_collection("feedback")
+        print(f"Seeding {args.sessions:,} sessions into '{args.db}'...")
+        seed(db.db, args.sessions, args.users, args.guilds)
+    db.ensure_indexes()
+
+    def legacy_pending():
+        cursor = db.sessions_collection.find({"active": False, "feedback_given": False})
+        return [session["username"] for session in cursor]
+
+    legacy = timed("legacy find() + list (all sessions)", legacy_pending, args.repeat)
+    first_page = timed("pipeline pending feedback, page 1", lambda: db.get_pending_feedback(0, 20), args.repeat)
+    timed("pipeline pending feedback, page 50", lambda: db.get_pending_feedback(49, 20), args.repeat)
+    timed("feedback stats per day (30 days)", lambda: db.get_feedback_stats("day"), args.repeat)
+    timed("feedback stats per guild (30 days)", lambda: db.get_feedback_stats("guild"), args.repeat)
+
+    print(f"\nLegacy returned {len(legacy):,} rows (with duplicates); "
+          f"pipeline reports {first_page['total']:,} distinct users.")
+
+    if not args.keep:
+        db.mongo_client.drop_database(args.db)
+
+
+if __name__ == "__main__":
+    main()
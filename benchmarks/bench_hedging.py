@@ -0,0 +1,113 @@
+"""Tail-latency benchmark for hedged Gemini requests (LearnLMTutor.ask_async).
+
+A fake model answers most calls around --latency seconds but a fraction
+(--tail-probability) take --tail-latency seconds, like the occasional 30 s
+Gemini call. The same request stream is run with hedging off and on, and
+the script reports p50/p95/p99, how many requests were hedged and how much
+time the winning hedges saved.
+
+Latencies are scaled down (milliseconds instead of seconds) so a run takes
+a few seconds; the shape of the distribution is what matters.
+
+Usage:
+    python benchmarks/bench_hedging.py --requests 2000 --concurrency 20
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GEMINI_API_KEY", "offline")
+
+import learnlm
+from metrics import RollingWindow
+
+
+class TailModel:
+    """Blocking fake GenerativeModel with a heavy latency tail."""
+
+    latency = 0.03
+    tail_latency = 1.0
+    tail_probability = 0.02
+    _rng = random.Random(0)
+    _lock = threading.Lock()
+
+    def __init__(self, model_name, *args, **kwargs):
+        self.model_name = model_name
+
+    def generate_content(self, prompt, tools=None, **kwargs):
+        with self._lock:
+            slow = self._rng.random() < self.tail_probability
+            jitter = self._rng.uniform(0.7, 1.3)
+        time.sleep(self.tail_latency if slow else self.latency * jitter)
+        return types.SimpleNamespace(text="Let's think about it step by step.")
+
+
+# Skip importing the real SDK
+learnlm.genai = types.SimpleNamespace(GenerativeModel=TailModel)
+
+
+async def run(hedging, requests, concurrency):
+    learnlm.HEDGE_REQUESTS = hedging
+    learnlm.hedge_stats = learnlm.HedgeStats()
+    learnlm.gemini_latency_ms = RollingWindow(500)
+    tier = learnlm.router.tier_for(learnlm.LearnLMTutor().model_name)
+    if tier:
+        tier.latency_ms = RollingWindow(200)
+
+    latencies = RollingWindow(requests)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await learnlm.ask_learnlm_async(f"Question {i}: what is a derivative?")
+            latencies.record((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return latencies.summary(), time.perf_counter() - start, learnlm.hedge_stats.summary()
+
+
+async def main_async(args):
+    TailModel.latency = args.latency
+    TailModel.tail_latency = args.tail_latency
+    TailModel.tail_probability = args.tail_probability
+    learnlm.HEDGE_PERCENTILE = args.percentile
+    learnlm.HEDGE_MAX_FRACTION = args.max_fraction
+    learnlm.HEDGE_MIN_DELAY_MS = 0
+
+    for hedging in (False, True):
+        summary, wall, hedges = await run(hedging, args.requests, args.concurrency)
+        print(f"\n=== hedging {'on' if hedging else 'off'} ===")
+        print(f"{args.requests} requests in {wall:.2f}s: p50 {summary['p50']:.1f}ms  "
+              f"p95 {summary['p95']:.1f}ms  p99 {summary['p99']:.1f}ms")
+        if hedging:
+            # Give abandoned originals time to finish so their savings are recorded
+            await asyncio.sleep(args.tail_latency)
+            saved = learnlm.hedge_stats.saved_ms.summary()
+            print(f"hedged {hedges['hedge_rate']:.1%} of requests, hedge won {hedges['hedge_win_rate']:.0%}, "
+                  f"time saved per winning hedge p50 {saved['p50'] or 0:.1f}ms "
+                  f"(n={saved['count']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.03, help="Typical fake latency in seconds")
+    parser.add_argument("--tail-latency", type=float, default=1.0)
+    parser.add_argument("--tail-probability", type=float, default=0.02)
+    parser.add_argument("--percentile", type=float, default=95)
+    parser.add_argument("--max-fraction", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Benchmark the inactivity sweep's database work against the old per-session loop.
+
+Seeds a scratch database with active sessions whose last activity is spread
+over the past hour, then times:
+
+    legacy  find() every active session, classify in Python, one update_one
+            per reminder and an unscoped end_session per expired session
+    facet   db.classify_inactive_sessions (one $facet aggregation) followed
+            by db.close_sessions and db.mark_sessions (update_many by _id)
+
+The sessions are reseeded before every run since a sweep changes them.
+Discord sends are not part of either measurement.
+
+Usage:
+    python benchmarks/bench_inactive_sweep.py --sessions 50000 --db schrody_bench
+    python benchmarks/bench_inactive_sweep.py --sessions 5000 --mock
+
+Requires MONGO_URL unless --mock is given (mongomock; only useful to check
+that both paths agree, its timings say nothing about a real server). The
+scratch database is dropped at the end unless --keep is given.
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def seed(database, sessions, batch_size=10_000):
+    """Insert active sessions idle for 0-60 minutes, some already reminded or warned."""
+    rng = random.Random(42)
+    now = datetime.datetime.utcnow()
+    database.sessions.delete_many({})
+    for offset in range(0, sessions, batch_size):
+        batch = []
+        for i in range(offset, min(offset + batch_size, sessions)):
+            idle = rng.uniform(0, 60)
+            last = now - datetime.timedelta(minutes=idle)
+            batch.append({
+                "user_id": str(i),
+                "username": f"user{i}",
+                "start_time": last - datetime.timedelta(minutes=rng.uniform(0, 30)),
+                "last_activity": last,
+                "active": True,
+                "thread_id": str(10 ** 12 + i),
+                "guild_id": str(rng.randrange(50)),
+                "feedback_given": False,
+                "thread_reminder_sent": idle >= 5 and rng.random() < 0.5,
+                "dm_warning_sent": idle >= 15 and rng.random() < 0.5,
+                # Bulk of a real session document the legacy loop also pulls back
+                "notes": "x" * 200,
+            })
+        database.sessions.insert_many(batch, ordered=False)
+
+
+def legacy_sweep(db):
+    """The database side of the old check_inactive_sessions loop."""
+    now = datetime.datetime.utcnow()
+    counts = {"expired": 0, "warn": 0, "remind": 0}
+    for session in db.sessions_collection.find({"active": True}):
+        idle = now - session.get("last_activity", session["start_time"])
+        user_id = session["user_id"]
+        if idle >= datetime.timedelta(minutes=30):
+            db.end_session(user_id)
+            counts["expired"] += 1
+        elif idle >= datetime.timedelta(minutes=15) and not session.get("dm_warning_sent", False):
+            db.sessions_collection.update_one({"user_id": user_id, "active": True},
+                                              {"$set": {"dm_warning_sent": True}})
+            counts["warn"] += 1
+        elif idle >= datetime.timedelta(minutes=5) and not session.get("thread_reminder_sent", False):
+            db.sessions_collection.update_one({"user_id": user_id, "active": True},
+                                              {"$set": {"thread_reminder_sent": True}})
+            counts["remind"] += 1
+    return counts
+
+
+def facet_sweep(db):
+    due = db.classify_inactive_sessions()
+    db.close_sessions(due["expired"])
+    db.mark_sessions([session["_id"] for session in due["warn"]], "dm_warning_sent")
+    db.mark_sessions([session["_id"] for session in due["remind"]], "thread_reminder_sent")
+    return {bucket: len(sessions) for bucket, sessions in due.items()}
+
+
+def timed(label, db, sweep, sessions, repeat):
+    best, counts = float("inf"), None
+    for _ in range(repeat):
+        seed(db.db, sessions)
+        start = time.perf_counter()
+        counts = sweep(db)
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<8} {best * 1000:>10.1f} ms   closed {counts['expired']:,}, "
+          f"warned {counts['warn']:,}, reminded {counts['remind']:,}")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50_000)
+    parser.add_argument("--db", default="schrody_bench")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--mock", action="store_true", help="Use mongomock instead of MONGO_URL")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch database afterwards")
+    args = parser.parse_args()
+
+    os.environ["MONGO_DB"] = args.db
+    if args.mock:
+        import fakes  # noqa: F401  (swaps in mongomock)
+    import db
+
+    db.ensure_indexes()
+    print(f"Sweeping {args.sessions:,} active sessions (best of {args.repeat}):")
+    legacy = timed("legacy", db, legacy_sweep, args.sessions, args.repeat)
+    facet = timed("facet", db, facet_sweep, args.sessions, args.repeat)
+    print(f"\nfacet sweep is {legacy / facet:.1f}x faster")
+
+    if not args.keep:
+        db.mongo_client.drop_database(args.db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Offline benchmark for model_router: tier mix, latency and cost against fake models.
+
+Each tier is backed by a fake model with its own latency distribution and
+error rate; latencies are simulated, so nothing sleeps and no network or
+SDK is needed. Halfway through, the standard tier degrades (slow and
+failing) for --outage requests, to show requests falling back to the fast
+tier and returning once probes see it recover.
+
+Compares three policies over the same prompt stream:
+    fixed    every request on the standard tier (the old behaviour)
+    routed   tier by prompt features, no fallback
+    router   tier by prompt features plus health-based fallback
+
+Usage:
+    python benchmarks/bench_model_router.py --requests 20000 --outage 3000
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import model_router
+from metrics import RollingWindow
+
+# (median ms, spread factor, error rate) per tier when healthy
+FAKE_MODELS = {
+    "fast": (1200, 1.4, 0.01),
+    "standard": (3000, 1.6, 0.01),
+    "deep": (9000, 1.8, 0.02),
+}
+# The standard tier during the simulated outage
+OUTAGE_MODEL = (30000, 1.5, 0.30)
+
+PROMPTS = [
+    ("hi", 0),
+    ("thanks!", 2),
+    ("What is a derivative?", 0),
+    ("Can you check my working? " + "I expanded (x + 2)² and got x² + 4x + 4, then ... " * 8, 3),
+    ("Walk me through this multi-step proof. " + "Step: assume n = k and show n = k + 1 holds ... " * 100, 1),
+    ("I still don't get why the limit exists here.", 7),
+]
+
+
+class FakeModel:
+    """Samples latency and failure for one tier from a lognormal distribution."""
+
+    def __init__(self, median_ms, spread, error_rate, rng):
+        self.median_ms = median_ms
+        self.spread = spread
+        self.error_rate = error_rate
+        self.rng = rng
+
+    def call(self):
+        latency = self.median_ms * self.spread ** self.rng.gauss(0, 1)
+        return latency, self.rng.random() >= self.error_rate
+
+
+def run(policy, requests, outage, seed):
+    rng = random.Random(seed)
+    router = model_router.ModelRouter(enabled=policy != "fixed")
+    if policy == "routed":
+        for tier in router.tiers:
+            tier.is_degraded = lambda: False
+    healthy = {name: FakeModel(*FAKE_MODELS[name], rng) for name in FAKE_MODELS}
+    broken = FakeModel(*OUTAGE_MODEL, rng)
+    outage_start = requests // 2 - outage // 2
+
+    latencies = RollingWindow(requests)
+    failures = 0
+    for i in range(requests):
+        prompt, depth = rng.choice(PROMPTS)
+        tier = router.choose(prompt, session_depth=depth)
+        fake = healthy[tier.name]
+        if tier.name == "standard" and outage_start <= i < outage_start + outage:
+            fake = broken
+        latency, ok = fake.call()
+        router.record(tier.model, latency, ok, prompt_chars=len(prompt) + 3500, answer_chars=600)
+        latencies.record(latency)
+        failures += not ok
+    return router.stats(), latencies.summary(), failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--outage", type=int, default=3000, help="Requests during which the standard tier degrades")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    for policy in ("fixed", "routed", "router"):
+        tiers, overall, failures = run(policy, args.requests, args.outage, args.seed)
+        cost = sum(t["total_cost_usd"] for t in tiers.values())
+        print(f"\n=== {policy} ===")
+        print(f"latency p50 {overall['p50']:.0f}ms  p95 {overall['p95']:.0f}ms  p99 {overall['p99']:.0f}ms  "
+              f"failures {failures / args.requests:.1%}  cost ${cost:.2f}")
+        for name, tier in tiers.items():
+            if tier["routed"]:
+                print(f"  {name:<9} routed {tier['routed']:>6}  fell back {tier['fallbacks']:>5}  "
+                      f"mean cost ${tier['cost_usd']['mean'] or 0:.5f}  total ${tier['total_cost_usd']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Benchmark for the per-user retrieval index (retrieval.py).
+
+1. Latency: builds one user's index with --exchanges stored exchanges using
+   the hashing embedder, then times single-query and batched top-k search.
+2. Prompt size: replays a synthetic multi-topic conversation and compares
+   the context the old get_context built (last 5 exchanges) with the
+   retrieval context (last 2 plus the most relevant older ones), and how
+   often the retrieved exchanges are on the question's topic.
+
+Usage:
+    python benchmarks/bench_retrieval.py --exchanges 100000 --queries 200
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_DB", "schrody_bench")
+os.environ.setdefault("GEMINI_API_KEY", "offline")
+
+import retrieval
+import sessions
+
+TOPICS = {
+    "calculus": ["derivative", "integral", "limit", "chain rule", "tangent line", "rate of change"],
+    "chemistry": ["mole", "stoichiometry", "covalent bond", "balancing equations", "pH", "titration"],
+    "physics": ["velocity", "acceleration", "Newton's second law", "momentum", "friction", "kinetic energy"],
+    "history": ["French Revolution", "Treaty of Versailles", "Industrial Revolution", "Cold War", "Magna Carta"],
+    "biology": ["mitosis", "photosynthesis", "DNA replication", "enzymes", "natural selection"],
+}
+TEMPLATES = [
+    "Can you explain {} again?",
+    "I'm confused about {} in my homework.",
+    "How does {} work?",
+    "Why does {} matter here?",
+]
+ANSWER = ("Good question! Let's think about {term} step by step. What do you already know about {term}? "
+          "Try relating it to the last example we did in {topic}, then tell me your reasoning. ") * 3
+
+
+def exchange(rng):
+    topic = rng.choice(list(TOPICS))
+    term = rng.choice(TOPICS[topic])
+    question = rng.choice(TEMPLATES).format(term)
+    return topic, question, ANSWER.format(term=term, topic=topic)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def bench_latency(n, queries, k, seed):
+    rng = random.Random(seed)
+    embedder = retrieval.HashingEmbedder()
+    data = [exchange(rng) for _ in range(n)]
+
+    start = time.perf_counter()
+    index = retrieval.UserIndex(embedder.dim, capacity=n)
+    for offset in range(0, n, 5000):
+        chunk = data[offset:offset + 5000]
+        index.add(embedder.embed([f"{q}\n{a}" for _, q, a in chunk]), [(q, a) for _, q, a in chunk])
+    build = time.perf_counter() - start
+    print(f"\n=== {n:,} stored exchanges ({index.vectors.nbytes / 2 ** 20:.0f} MiB of vectors) ===")
+    print(f"build (embed + insert): {build:.1f}s ({n / build:,.0f} exchanges/s)")
+
+    questions = [exchange(rng)[1] for _ in range(queries)]
+    single = []
+    for question in questions:
+        start = time.perf_counter()
+        index.search(embedder.embed([question]), k)
+        single.append((time.perf_counter() - start) * 1000)
+    print(f"single query top-{k}: p50 {percentile(single, 50):.2f}ms  p95 {percentile(single, 95):.2f}ms")
+
+    batch = embedder.embed(questions)
+    start = time.perf_counter()
+    index.search(batch, k)
+    batched = (time.perf_counter() - start) * 1000
+    print(f"batched {queries} queries: {batched:.1f}ms total, {batched / queries:.2f}ms per query")
+
+
+def bench_prompt_size(turns, seed):
+    rng = random.Random(seed)
+    retrieval.RETRIEVAL_CONTEXT = True
+    index = retrieval.RetrievalIndex()
+    index._users.set("1", index._new_index())
+    sessions.retrieval_index = index
+    user = sessions.UserSession(1, 1)
+
+    old_sizes, new_sizes, on_topic, retrieved = [], [], 0, 0
+    for _ in range(turns):
+        topic, question, answer = exchange(rng)
+
+        retrieval.RETRIEVAL_CONTEXT = False
+        old_sizes.append(len(user.get_context(question)))
+        retrieval.RETRIEVAL_CONTEXT = True
+        new_sizes.append(len(user.get_context(question)))
+
+        recent = min(len(user.conversation_history), sessions.RECENT_CONTEXT_TURNS)
+        for score, q, _ in index.search("1", question, k=sessions.RETRIEVED_CONTEXT_TURNS, exclude_last=recent,
+                                        min_score=sessions.RETRIEVAL_MIN_SCORE):
+            retrieved += 1
+            on_topic += any(term in q for term in TOPICS[topic])
+
+        user.add_to_history(question, answer)
+        index.add_exchange("1", question, answer)
+
+    print(f"\n=== prompt context over {turns} turns ===")
+    print(f"last 5 exchanges:    mean {statistics.mean(old_sizes):,.0f} chars")
+    print(f"recent + retrieved:  mean {statistics.mean(new_sizes):,.0f} chars "
+          f"({1 - statistics.mean(new_sizes) / statistics.mean(old_sizes):.0%} smaller)")
+    if retrieved:
+        print(f"retrieved exchanges on the question's topic: {on_topic / retrieved:.0%} ({retrieved} retrieved)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exchanges", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--turns", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    for n in args.exchanges:
+        bench_latency(n, args.queries, args.k, args.seed)
+    bench_prompt_size(args.turns, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Dispatch microbenchmark for the speed runtime (runtime.py, SPEED_MODE=1).
+
+Feeds synthetic MESSAGE_CREATE gateway frames through the same steps the
+bot does for every guild message: decode the frame and dispatch the event
+to listeners with Bot.dispatch, which schedules one task per
+listener. Each mode runs on a fresh event loop:
+
+    default  asyncio loop, json module
+    speed    uvloop, orjson
+
+Modes whose packages are not installed are skipped. Resolver lookups are
+network-bound and not measured here.
+
+Usage:
+    python benchmarks/bench_runtime.py --events 50000 --listeners 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord
+from discord.ext import commands
+
+
+def gateway_frame(i):
+    """A MESSAGE_CREATE frame shaped like the ones the bot receives with message_content."""
+    author = {"id": str(10 ** 17 + i % 500), "username": f"student{i % 500}", "global_name": None,
+              "avatar": "a" * 32, "discriminator": "0", "public_flags": 0, "flags": 0}
+    return json.dumps({
+        "op": 0, "s": i, "t": "MESSAGE_CREATE",
+        "d": {
+            "id": str(10 ** 18 + i), "channel_id": "1200000000000000000", "guild_id": "1100000000000000000",
+            "type": 0, "tts": False, "pinned": False, "flags": 0, "nonce": str(i),
+            "timestamp": "2026-10-19T12:00:00.000000+00:00", "edited_timestamp": None,
+            "content": "Can you explain how the chain rule works when there are three nested functions? " * 2,
+            "author": author, "member": {"roles": ["1300000000000000000"], "joined_at": "2025-01-01T00:00:00+00:00",
+                                         "deaf": False, "mute": False, "flags": 0},
+            "mentions": [], "mention_roles": [], "mention_everyone": False,
+            "attachments": [], "embeds": [], "components": [],
+        },
+    })
+
+
+def modes():
+    available = {"default": (asyncio.new_event_loop, json.loads)}
+    try:
+        import orjson
+        import uvloop
+    except ImportError as e:
+        print(f"speed mode skipped: {e}")
+    else:
+        available["speed"] = (uvloop.new_event_loop, orjson.loads)
+    return available
+
+
+async def dispatch_run(frames, loads, listeners):
+    bot = commands.Bot(command_prefix="!", intents=discord.Intents.none())
+    # What login does to bind the client to the running loop
+    await bot._async_setup_hook()
+    remaining = len(frames) * listeners
+    done = asyncio.Event()
+
+    async def on_message(payload):
+        nonlocal remaining
+        # Roughly what the cogs' listeners do before deciding to ignore a message
+        if payload["d"]["author"]["id"] and payload["d"]["content"].startswith("!"):
+            return
+        remaining -= 1
+        if not remaining:
+            done.set()
+
+    for _ in range(listeners):
+        bot.add_listener(on_message)
+
+    start = time.perf_counter()
+    for frame in frames:
+        bot.dispatch("message", loads(frame))
+        # The gateway awaits the socket between frames, letting scheduled listeners run
+        await asyncio.sleep(0)
+    await done.wait()
+    return time.perf_counter() - start
+
+
+def run_mode(new_loop, loads, frames, listeners, repeats):
+    decode, dispatch = [], []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for frame in frames:
+            loads(frame)
+        decode.append(time.perf_counter() - start)
+
+        loop = new_loop()
+        try:
+            dispatch.append(loop.run_until_complete(dispatch_run(frames, loads, listeners)))
+        finally:
+            loop.close()
+    return statistics.median(decode), statistics.median(dispatch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--listeners", type=int, default=3, help="on_message listeners per event")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    frames = [gateway_frame(i) for i in range(args.events)]
+    print(f"{args.events:,} frames of {len(frames[0])} bytes, {args.listeners} listeners, "
+          f"median of {args.repeats} runs")
+
+    results = {}
+    for name, (new_loop, loads) in modes().items():
+        decode, dispatch = run_mode(new_loop, loads, frames, args.listeners, args.repeats)
+        results[name] = dispatch
+        print(f"{name:8} decode {decode / args.events * 1e6:5.2f}us/frame   "
+              f"decode+dispatch {args.events / dispatch:>9,.0f} events/s "
+              f"({dispatch / args.events * 1e6:5.2f}us/event)")
+    if len(results) == 2:
+        print(f"speed mode dispatches {results['default'] / results['speed']:.2f}x as fast")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Memory benchmark for in-memory tutoring sessions (tracemalloc).
+
+Compares the previous representation (full discord objects per session and
+an unbounded list of dicts with datetime timestamps) with the current
+ID-based __slots__ classes and HistoryRing, at 10k and 100k simulated users.
+
+Each simulated user has their own thread and sends --exchanges messages.
+Stand-in user and thread objects mimic discord.py cache entries; with the
+old classes they stay referenced by the session, with the new classes they
+are released once the session holds only IDs.
+
+Usage:
+    python benchmarks/bench_session_memory.py --users 10000 100000 --exchanges 30
+"""
+import argparse
+import datetime
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_DB", "schrody_bench")
+os.environ.setdefault("GEMINI_API_KEY", "offline")
+
+import sessions
+
+
+class CachedObject:
+    """Rough stand-in for a discord.py User/Thread cache entry."""
+
+    def __init__(self, object_id, name):
+        self.id = object_id
+        self.name = name
+        self.display_name = name
+        self.global_name = name
+        self.avatar = f"a_{object_id:x}"
+        self.flags = 0
+        self.created_at = datetime.datetime.utcnow()
+        self.data = {"id": str(object_id), "name": name, "flags": 0}
+
+
+class LegacyUserSession:
+    def __init__(self, user, thread):
+        self.user = user
+        self.thread = thread
+        self.start_time = datetime.datetime.utcnow()
+        self.active = True
+        self.conversation_history = []
+        self.last_activity = datetime.datetime.utcnow()
+
+    def add_to_history(self, message_content, response):
+        self.conversation_history.append({
+            'timestamp': datetime.datetime.utcnow(),
+            'user_message': message_content,
+            'bot_response': response
+        })
+        self.last_activity = datetime.datetime.utcnow()
+
+
+class LegacyTutoringSession:
+    def __init__(self, thread):
+        self.thread = thread
+        self.start_time = datetime.datetime.utcnow()
+        self.active = True
+        self.user_sessions = {}
+        self.session_timeout = 1800
+
+    def add_user(self, user):
+        if user.id not in self.user_sessions:
+            self.user_sessions[user.id] = LegacyUserSession(user, self.thread)
+        return self.user_sessions[user.id]
+
+
+def build(users, exchanges, session_cls):
+    """Build one session per user; returns the sessions dict (thread_id -> session)."""
+    built = {}
+    for i in range(users):
+        user = CachedObject(10 ** 17 + i, f"student{i}")
+        thread = CachedObject(2 * 10 ** 17 + i, f"Schrödy-student{i}")
+        session = session_cls(thread)
+        user_session = session.add_user(user)
+        for n in range(exchanges):
+            # Distinct strings per exchange, like real messages
+            user_session.add_to_history(f"question {n} from {i}: what is x² + {n}?",
+                                        f"answer {n} for {i}: let's think step by step about x² + {n}.")
+        built[thread.id] = session
+    return built
+
+
+def measure(users, exchanges, session_cls):
+    gc.collect()
+    tracemalloc.start()
+    built = build(users, exchanges, session_cls)
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del built
+    return current, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--exchanges", type=int, default=30)
+    args = parser.parse_args()
+
+    print(f"history capacity: {sessions.HISTORY_CAPACITY} exchanges, {args.exchanges} sent per user\n")
+    print(f"{'users':>8} {'variant':<8} {'retained MB':>12} {'peak MB':>10} {'bytes/user':>11}")
+    for users in args.users:
+        for label, cls in (("before", LegacyTutoringSession), ("after", sessions.TutoringSession)):
+            current, peak = measure(users, args.exchanges, cls)
+            print(f"{users:>8,} {label:<8} {current / 2 ** 20:>12.1f} {peak / 2 ** 20:>10.1f} {current / users:>11,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Benchmark cold start: module imports plus Schrody.setup_hook.
+
+Each run is a fresh interpreter that imports bot.py and awaits setup_hook
+with the Discord command sync stubbed out, so only local startup work is
+measured (gateway login is network-bound and excluded). Runs are repeated
+and the median is reported.
+
+Pass --ref to run the same measurement against another git revision
+(e.g. the commit before startup was parallelised) and compare.
+
+Usage:
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --runs 5 --ref HEAD~1
+
+Requires the bot's environment (.env with MONGO_URL, MONGO_DB, GEMINI_API_KEY).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPET = r"""
+import asyncio, json, time
+started = time.perf_counter()
+from discord import app_commands
+
+async def _no_sync(self, *, guild=None):
+    return []
+
+app_commands.CommandTree.sync = _no_sync
+
+import bot
+imported = time.perf_counter()
+
+async def run():
+    start = time.perf_counter()
+    await bot.bot.setup_hook()
+    return time.perf_counter() - start
+
+setup_hook = asyncio.run(run())
+print(json.dumps({"imports": imported - started, "setup_hook": setup_hook,
+                  "total": imported - started + setup_hook}))
+"""
+
+
+def measure(source_dir, runs):
+    samples = []
+    env = dict(os.environ, COMMAND_SYNC_FILE=os.path.join(tempfile.gettempdir(), "schrody_bench_sync.json"))
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", SNIPPET],
+            cwd=source_dir, env=env, capture_output=True, text=True, check=True,
+        )
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    return {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+
+
+def export_revision(ref, target):
+    """Extract a git revision into target, reusing this checkout's .env."""
+    archive = subprocess.run(["git", "archive", ref], cwd=REPO, capture_output=True, check=True).stdout
+    path = os.path.join(target, "src.tar")
+    with open(path, "wb") as f:
+        f.write(archive)
+    with tarfile.open(path) as tar:
+        tar.extractall(target)
+    env_file = os.path.join(REPO, ".env")
+    if os.path.exists(env_file):
+        with open(env_file) as src, open(os.path.join(target, ".env"), "w") as dst:
+            dst.write(src.read())
+
+
+def print_row(label, timings):
+    print(f"{label:<12} imports {timings['imports']:>7.3f}s   setup_hook {timings['setup_hook']:>7.3f}s   "
+          f"total {timings['total']:>7.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--ref", help="Git revision to compare against")
+    args = parser.parse_args()
+
+    current = measure(REPO, args.runs)
+    print_row("working tree", current)
+
+    if args.ref:
+        with tempfile.TemporaryDirectory() as tmp:
+            export_revision(args.ref, tmp)
+            baseline = measure(tmp, args.runs)
+        print_row(args.ref, baseline)
+        saved = baseline["total"] - current["total"]
+        print(f"\ncold start changed by {-saved:+.3f}s ({saved / baseline['total'] * 100:.0f}% faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""Offline stand-ins for Discord, Gemini and MongoDB used by the benchmarks.
+
+Importing this module prepares the environment so the bot's modules can be
+imported without network access: dummy credentials are set, pymongo's client
+is replaced with mongomock, and Gemini models are replaced with FakeModel.
+Import it before importing db, learnlm, sessions or any cog.
+"""
+import asyncio
+import datetime
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_DB", "schrody_loadtest")
+os.environ.setdefault("GEMINI_API_KEY", "offline")
+
+import mongomock
+import pymongo
+
+pymongo.MongoClient = mongomock.MongoClient
+
+import discord
+import learnlm
+
+_snowflakes = itertools.count(10 ** 17)
+
+
+def snowflake():
+    """Return a fresh, unique Discord-style ID."""
+    return next(_snowflakes)
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Replacement for genai.GenerativeModel with configurable latency and errors.
+
+    generate_content blocks the calling thread for the configured latency,
+    just like the real synchronous client does.
+    """
+
+    latency = 0.05          # mean seconds per call
+    jitter = 0.5            # +/- fraction of the mean
+    tail_probability = 0.0  # chance of a slow call
+    tail_latency = 2.0      # seconds for a slow call
+    error_rate = 0.0        # chance of raising instead of answering
+    response_chars = 600
+    calls = 0
+
+    _rng = random.Random(0)
+
+    def __init__(self, model_name, *args, **kwargs):
+        self.model_name = model_name
+
+    @classmethod
+    def configure(cls, **settings):
+        for name, value in settings.items():
+            if not hasattr(cls, name):
+                raise AttributeError(f"FakeModel has no setting {name!r}")
+            setattr(cls, name, value)
+
+    @classmethod
+    def sample_latency(cls):
+        if cls._rng.random() < cls.tail_probability:
+            return cls.tail_latency
+        return max(0.0, cls.latency * (1 + cls._rng.uniform(-cls.jitter, cls.jitter)))
+
+    def generate_content(self, prompt, tools=None, **kwargs):
+        type(self).calls += 1
+        time.sleep(self.sample_latency())
+        if self._rng.random() < self.error_rate:
+            raise RuntimeError("503 fake Gemini overload")
+        body = "Let's think about this step by step. What do you already know about x² + y²? "
+        return FakeResponse((body * (self.response_chars // len(body) + 1))[:self.response_chars])
+
+
+learnlm.get_genai().GenerativeModel = FakeModel
+
+
+class _Typing:
+    def __init__(self, channel):
+        self.channel = channel
+
+    async def __aenter__(self):
+        self.channel.rest_calls += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __await__(self):
+        self.channel.rest_calls += 1
+        return asyncio.sleep(self.channel.rest_latency).__await__()
+
+
+class FakeSentMessage:
+    def __init__(self, channel, content=None, embed=None):
+        self.id = snowflake()
+        self.channel = channel
+        self.content = content
+        self.embed = embed
+
+    async def delete(self):
+        self.channel.rest_calls += 1
+        await asyncio.sleep(self.channel.rest_latency)
+
+    async def edit(self, content=None, **kwargs):
+        self.channel.rest_calls += 1
+        await asyncio.sleep(self.channel.rest_latency)
+        self.content = content
+        return self
+
+
+class FakeThread(discord.Thread):
+    """A discord.Thread that records what is sent to it instead of calling Discord."""
+
+    def __init__(self, name, guild, parent=None, rest_latency=0.0):
+        self.id = snowflake()
+        self.name = name
+        self.guild = guild
+        self.parent_id = parent.id if parent else None
+        self._parent = parent
+        self._members = []
+        self.rest_latency = rest_latency
+        self.rest_calls = 0
+        self.sent = []
+
+    @property
+    def parent(self):
+        return self._parent
+
+    @property
+    def members(self):
+        return self._members
+
+    async def send(self, content=None, *, embed=None, **kwargs):
+        self.rest_calls += 1
+        await asyncio.sleep(self.rest_latency)
+        message = FakeSentMessage(self, content, embed)
+        self.sent.append(message)
+        return message
+
+    def typing(self):
+        return _Typing(self)
+
+    async def add_user(self, user):
+        self._members.append(user)
+
+    async def edit(self, **kwargs):
+        return self
+
+
+class FakeUser:
+    """Stands in for discord.User / discord.Member."""
+
+    def __init__(self, name, guild=None, bot=False):
+        self.id = snowflake()
+        self.name = name
+        self.display_name = name
+        self.nick = None
+        self.bot = bot
+        self.guild = guild
+        self.mention = f"<@{self.id}>"
+        self.guild_permissions = discord.Permissions.none()
+        self.dms = []
+
+    async def send(self, content=None, *, embed=None, **kwargs):
+        self.dms.append(content or embed)
+
+
+class FakeGuild:
+    def __init__(self, name="Load Test Guild"):
+        self.id = snowflake()
+        self.name = name
+        self.members = {}
+
+    def get_member(self, user_id):
+        return self.members.get(user_id)
+
+    def add_member(self, name):
+        member = FakeUser(name, guild=self)
+        self.members[member.id] = member
+        return member
+
+    async def active_threads(self):
+        return []
+
+    async def archived_threads(self, limit=100):
+        for _ in ():
+            yield _
+
+
+class FakeMessage:
+    def __init__(self, channel, author, content):
+        self.id = snowflake()
+        self.channel = channel
+        self.author = author
+        self.content = content
+        self.guild = channel.guild
+        self.created_at = discord.utils.utcnow()
+
+
+class _FakeResponse:
+    def __init__(self, interaction):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def defer(self, **kwargs):
+        self._interaction.rest_calls += 1
+        self._done = True
+
+    async def send_message(self, content=None, **kwargs):
+        self._interaction.rest_calls += 1
+        self._done = True
+        self._interaction.sent.append(content or kwargs.get("embed"))
+
+
+class _FakeFollowup:
+    def __init__(self, interaction):
+        self._interaction = interaction
+
+    async def send(self, content=None, **kwargs):
+        self._interaction.rest_calls += 1
+        self._interaction.sent.append(content or kwargs.get("embed"))
+
+
+class FakeInteraction:
+    def __init__(self, user, channel):
+        self.id = snowflake()
+        self.user = user
+        self.channel = channel
+        self.guild = channel.guild
+        self.created_at = discord.utils.utcnow()
+        self.rest_calls = 0
+        self.sent = []
+        self.response = _FakeResponse(self)
+        self.followup = _FakeFollowup(self)
+
+
+class FakeBot:
+    """Just enough of commands.Bot for the cogs to run."""
+
+    def __init__(self):
+        self.user = FakeUser("Schrödy", bot=True)
+        self.users = {}
+        self.channels = {}
+        self.latency = 0.05
+        self.guilds = []
+
+    def register(self, *objects):
+        for obj in objects:
+            if isinstance(obj, FakeUser):
+                self.users[obj.id] = obj
+            else:
+                self.channels[obj.id] = obj
+
+    def get_user(self, user_id):
+        return self.users.get(user_id)
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    def get_guild(self, guild_id):
+        return next((guild for guild in self.guilds if guild.id == guild_id), None)
+
+    async def fetch_user(self, user_id):
+        user = self.users.get(user_id)
+        if user is None:
+            raise discord.NotFound(_FakeHTTPResponse(404), "Unknown User")
+        return user
+
+    async def wait_until_ready(self):
+        await asyncio.Event().wait()
+
+
+class _FakeHTTPResponse:
+    def __init__(self, status):
+        self.status = status
+        self.reason = "fake"
+
+
+def reset_database():
+    """Drop everything the previous run left in the mongomock database."""
+    import db
+    for name in db.db.list_collection_names():
+        db.db.drop_collection(name)
+    db.active_session_cache.clear()
+    db.latest_bucket_cache.clear()
+
+
+def age_sessions(minutes):
+    """Move every active session's last activity back by the given number of minutes."""
+    import db
+    past = datetime.datetime.utcnow() - datetime.timedelta(minutes=minutes)
+    db.sessions_collection.update_many({"active": True}, {"$set": {"last_activity": past}})
@@ -0,0 +1,255 @@
+"""Offline load test: how many concurrent tutoring threads can one process sustain?
+
+Drives Tutor.on_message, the /ask command and the check_inactive_sessions
+sweep through fake Discord threads, members and interactions, with a fake
+Gemini model (configurable latency and error rate) and mongomock as the
+database. Reports p50/p95/p99 latency, throughput and event-loop lag per
+concurrency level, plus the stack of anything that blocks the loop for
+longer than --stall-ms.
+
+Usage:
+    python benchmarks/loadtest.py --threads 10 100 1000 --messages 3 --latency 0.02
+    python benchmarks/loadtest.py --threads 100 --error-rate 0.05 --fail-p95-ms 5000
+
+Requires discord.py, google-generativeai and mongomock to be installed; no
+network access is needed.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+import fakes
+from fakes import FakeBot, FakeGuild, FakeInteraction, FakeMessage, FakeModel, FakeThread
+
+import db
+import interactions
+import messaging
+from loop_monitor import LoopMonitor
+from sessions import session_manager
+from cogs.tutor import Tutor
+
+QUESTIONS = [
+    "What is a derivative?",
+    "Can you explain the quadratic formula?",
+    "Why is the sky blue?",
+    "How do I balance this equation: H₂ + O₂ → H₂O?",
+    "What's the difference between speed and velocity?",
+]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class LoopLagProbe:
+    """Measures how late the event loop wakes a task that asked to sleep `interval` seconds."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+def summarize(latencies):
+    return {
+        "count": len(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies, default=0) * 1000,
+    }
+
+
+async def setup_threads(bot, guild, count):
+    """Create `count` tutoring threads, each owned by one student with an active session."""
+    students = []
+    for i in range(count):
+        user = guild.add_member(f"student{i}")
+        thread = FakeThread(f"Schrödy-student{i}", guild)
+        bot.register(user, thread)
+        session = session_manager.create_session(thread)
+        session.add_user(user)
+        db.start_session(user.id, user.name, thread.id, guild_id=guild.id)
+        students.append((user, thread))
+    return students
+
+
+async def run_scenario(threads, messages, ask_every, think_time, seed, stall_ms=100):
+    """Run one concurrency level and return its metrics."""
+    fakes.reset_database()
+    session_manager.sessions.clear()
+    session_manager.tutoring_thread_ids.clear()
+    messaging.delivery_stats = messaging.DeliveryStats()
+    interactions.ack_stats = interactions.AckStats()
+
+    rng = random.Random(seed)
+    bot = FakeBot()
+    guild = FakeGuild()
+    bot.guilds.append(guild)
+
+    cog = Tutor(bot)
+    cog.check_inactive_sessions.cancel()
+    cog.flush_guest_participation.cancel()
+    cog.deliver_outbox.cancel()
+    await cog.rehydrate_tutoring_threads()
+
+    students = await setup_threads(bot, guild, threads)
+    latencies = {"message": [], "ask": []}
+    errors = 0
+
+    async def student(user, thread):
+        nonlocal errors
+        for n in range(messages):
+            question = rng.choice(QUESTIONS)
+            start = time.perf_counter()
+            try:
+                if ask_every and n % ask_every == ask_every - 1:
+                    await cog.ask.callback(cog, FakeInteraction(user, thread), question)
+                    latencies["ask"].append(time.perf_counter() - start)
+                else:
+                    await cog.on_message(FakeMessage(thread, user, question))
+                    latencies["message"].append(time.perf_counter() - start)
+            except Exception as e:
+                errors += 1
+                print(f"  error: {e!r}", file=sys.stderr)
+            if think_time:
+                await asyncio.sleep(rng.uniform(0, think_time))
+
+    probe = LoopLagProbe()
+    probe.start()
+    monitor = LoopMonitor(interval=0.01, threshold=stall_ms / 1000)
+    monitor.start()
+    calls_before = FakeModel.calls
+    start = time.perf_counter()
+    await asyncio.gather(*(student(user, thread) for user, thread in students))
+    wall = time.perf_counter() - start
+    await probe.stop()
+    await monitor.stop()
+
+    # Inactivity sweep with every session old enough to get a thread reminder
+    fakes.age_sessions(6)
+    sweep_start = time.perf_counter()
+    await cog.check_inactive_sessions.coro(cog)
+    sweep = time.perf_counter() - sweep_start
+
+    answered = sum(len(v) for v in latencies.values())
+    rest_calls = sum(thread.rest_calls for _, thread in students)
+    return {
+        "threads": threads,
+        "answered": answered,
+        "errors": errors,
+        "wall_s": wall,
+        "throughput_per_s": answered / wall if wall else 0.0,
+        "gemini_calls": FakeModel.calls - calls_before,
+        "rest_calls_per_answer": rest_calls / answered if answered else 0.0,
+        "message": summarize(latencies["message"]),
+        "ask": summarize(latencies["ask"]),
+        "loop_lag": summarize(probe.samples),
+        "sweep_ms": sweep * 1000,
+        "delivery": messaging.delivery_stats.summary(),
+        "acks": interactions.ack_stats.summary(),
+        "stalls": [{"task": stall["task"], "stalled_ms": stall["stalled_ms"]} for stall in monitor.stalls],
+        "stall_stacks": [stall["stack"] for stall in monitor.stalls],
+    }
+
+
+def print_report(result):
+    print(f"\n=== {result['threads']} concurrent threads ===")
+    print(f"answered {result['answered']:,} in {result['wall_s']:.2f}s "
+          f"({result['throughput_per_s']:.1f}/s), errors {result['errors']}, "
+          f"REST calls/answer {result['rest_calls_per_answer']:.2f}")
+    for name in ("message", "ask", "loop_lag"):
+        stats = result[name]
+        print(f"  {name:<9} n={stats['count']:<6} p50={stats['p50_ms']:>9.1f}ms "
+              f"p95={stats['p95_ms']:>9.1f}ms p99={stats['p99_ms']:>9.1f}ms max={stats['max_ms']:>9.1f}ms")
+    for route, stats in result["delivery"].items():
+        kinds = ", ".join(f"{kind} {count:.2f}" for kind, count in sorted(stats["by_kind"].items()))
+        print(f"  {route:<10} REST calls/message {stats['per_message']:.2f} ({kinds})")
+    acks = result["acks"]
+    if acks["acked"] or acks["missed"]:
+        print(f"  /ask time-to-ack p50={acks['latency']['p50']:.1f}ms p95={acks['latency']['p95']:.1f}ms, "
+              f"missed {acks['missed']}")
+    print(f"  inactivity sweep: {result['sweep_ms']:.1f}ms")
+    if result["stalls"]:
+        print(f"  ⚠️ {len(result['stalls'])} event loop stall(s); first in {result['stalls'][0]['task']}:")
+        print("    " + result["stall_stacks"][0].rstrip().replace("\n", "\n    "))
+
+
+async def main_async(args):
+    FakeModel.configure(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        tail_probability=args.tail_probability,
+        tail_latency=args.tail_latency,
+    )
+    results = []
+    for threads in args.threads:
+        result = await run_scenario(threads, args.messages, args.ask_every, args.think_time, args.seed, args.stall_ms)
+        print_report(result)
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--messages", type=int, default=3, help="Messages per student")
+    parser.add_argument("--ask-every", type=int, default=3, help="Every Nth message uses /ask (0 = never)")
+    parser.add_argument("--think-time", type=float, default=0.1, help="Max seconds between a student's messages")
+    parser.add_argument("--latency", type=float, default=0.02, help="Mean fake Gemini latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--tail-probability", type=float, default=0.0)
+    parser.add_argument("--tail-latency", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--fail-p95-ms", type=float, help="Exit non-zero if any message p95 exceeds this")
+    parser.add_argument("--stall-ms", type=float, default=100, help="Event loop lag reported as a stall, with its stack")
+    parser.add_argument("--fail-on-stall", action="store_true", help="Exit non-zero if the event loop stalled")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.fail_p95_ms is not None:
+        worst = max(r["message"]["p95_ms"] for r in results)
+        if worst > args.fail_p95_ms:
+            print(f"\n❌ message p95 {worst:.1f}ms exceeds {args.fail_p95_ms:.1f}ms")
+            sys.exit(1)
+
+    if args.fail_on_stall:
+        stalls = sum(len(r["stalls"]) for r in results)
+        if stalls:
+            print(f"\n❌ event loop stalled {stalls} time(s) for more than {args.stall_ms:.0f}ms")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
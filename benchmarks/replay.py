@@ -0,0 +1,242 @@
+"""Replay a recorded traffic trace against the cogs, offline and time-compressed.
+
+Reads a JSONL trace written by tracing.py (run the bot with TRACE_FILE set)
+and re-issues its events against Tutor.on_message and the /ask command,
+with the same fake Discord objects, fake Gemini model and mongomock
+database as loadtest.py. Events keep their relative timing divided by
+--speed, so lecture-end bursts, long multi-user threads and guests show up
+as they did in production. Text is synthetic, with the recorded length.
+
+In each tutoring thread the first user seen owns the session; everyone
+else arrives as a guest. Other slash commands are counted but not replayed.
+
+Reports latency percentiles, throughput and event loop lag, and compares
+them with a stored baseline.
+
+Usage:
+    python benchmarks/replay.py traces/events.jsonl --speed 20
+    python benchmarks/replay.py traces/events.jsonl --speed 20 --save-baseline benchmarks/replay_baseline.json
+    python benchmarks/replay.py traces/events.jsonl --speed 20 --baseline benchmarks/replay_baseline.json --fail-regression 20
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import Counter
+
+import fakes
+from fakes import FakeBot, FakeGuild, FakeInteraction, FakeMessage, FakeModel, FakeThread
+
+import db
+import messaging
+from loadtest import LoopLagProbe, summarize
+from sessions import session_manager
+from cogs.tutor import Tutor
+
+REPLAYED_COMMANDS = {"ask"}
+FILLER = "Could you walk me through this step again, I'm not sure why it works? "
+
+# (result key, metric, True when higher is better) compared against the baseline
+BASELINE_METRICS = [
+    ("message", "p50_ms", False), ("message", "p95_ms", False), ("message", "p99_ms", False),
+    ("ask", "p50_ms", False), ("ask", "p95_ms", False), ("ask", "p99_ms", False),
+    ("loop_lag", "p99_ms", False), (None, "throughput_per_s", True),
+]
+
+
+def load_trace(path, max_events=None):
+    events = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+    events.sort(key=lambda event: event["ts"])
+    return events[:max_events] if max_events else events
+
+
+def text_of(chars):
+    return (FILLER * (chars // len(FILLER) + 1))[:max(chars, 1)]
+
+
+class World:
+    """Fake guilds, users and threads standing in for the hashes in a trace."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.guilds = {}
+        self.users = {}
+        self.channels = {}
+
+    def guild(self, key):
+        if key not in self.guilds:
+            guild = FakeGuild(f"guild-{len(self.guilds)}")
+            self.bot.guilds.append(guild)
+            self.guilds[key] = guild
+        return self.guilds[key]
+
+    def user(self, key, guild):
+        if key not in self.users:
+            user = guild.add_member(f"user-{len(self.users)}")
+            self.bot.register(user)
+            self.users[key] = user
+        return self.users[key]
+
+    def channel(self, event, user):
+        """The thread for an event's channel, creating it (owned by `user`) on first sight."""
+        key = event["channel"]
+        if key not in self.channels:
+            guild = self.guild(event.get("guild"))
+            if event.get("tutoring_thread"):
+                thread = FakeThread(f"Schrödy-{user.name}", guild)
+                session = session_manager.create_session(thread)
+                session.add_user(user)
+                db.start_session(user.id, user.name, thread.id, guild_id=guild.id)
+            else:
+                thread = FakeThread(f"channel-{len(self.channels)}", guild)
+            self.bot.register(thread)
+            self.channels[key] = thread
+        return self.channels[key]
+
+
+async def replay(events, speed, stall_ms=100):
+    fakes.reset_database()
+    session_manager.sessions.clear()
+    session_manager.tutoring_thread_ids.clear()
+    messaging.delivery_stats = messaging.DeliveryStats()
+
+    bot = FakeBot()
+    world = World(bot)
+    cog = Tutor(bot)
+    cog.check_inactive_sessions.cancel()
+    cog.flush_guest_participation.cancel()
+    cog.deliver_outbox.cancel()
+
+    latencies = {"message": [], "ask": []}
+    skipped = Counter()
+    errors = 0
+
+    async def run(kind, handler):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            await handler
+            latencies[kind].append(time.perf_counter() - start)
+        except Exception as e:
+            errors += 1
+            print(f"  error: {e!r}", file=sys.stderr)
+
+    probe = LoopLagProbe()
+    probe.start()
+    loop = asyncio.get_running_loop()
+    tasks = []
+    first = events[0]["ts"] if events else 0.0
+    started = loop.time()
+    for event in events:
+        delay = started + (event["ts"] - first) / speed - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        kind, name = event.get("kind"), event.get("name")
+        if kind == "command" and name not in REPLAYED_COMMANDS:
+            skipped[name] += 1
+            continue
+        guild = world.guild(event.get("guild"))
+        user = world.user(event["user"], guild)
+        channel = world.channel(event, user)
+        if kind == "message":
+            handler = cog.on_message(FakeMessage(channel, user, text_of(event.get("chars", 0))))
+            tasks.append(asyncio.create_task(run("message", handler)))
+        elif kind == "command":
+            handler = cog.ask.callback(cog, FakeInteraction(user, channel), text_of(event.get("chars", 0)))
+            tasks.append(asyncio.create_task(run("ask", handler)))
+    await asyncio.gather(*tasks)
+    wall = loop.time() - started
+    await probe.stop()
+
+    replayed = len(tasks)
+    return {
+        "events": len(events),
+        "replayed": replayed,
+        "skipped": dict(skipped),
+        "threads": sum(1 for channel in world.channels.values() if channel.name.startswith("Schrödy-")),
+        "users": len(world.users),
+        "trace_s": (events[-1]["ts"] - first) if events else 0.0,
+        "wall_s": wall,
+        "throughput_per_s": replayed / wall if wall else 0.0,
+        "errors": errors,
+        "message": summarize(latencies["message"]),
+        "ask": summarize(latencies["ask"]),
+        "loop_lag": summarize(probe.samples),
+    }
+
+
+def print_report(result, speed):
+    print(f"\n=== replayed {result['replayed']:,} of {result['events']:,} events at {speed:g}x "
+          f"({result['trace_s']:.0f}s of trace in {result['wall_s']:.1f}s) ===")
+    print(f"{result['threads']} tutoring threads, {result['users']} users, "
+          f"{result['throughput_per_s']:.1f} events/s, errors {result['errors']}")
+    for name in ("message", "ask", "loop_lag"):
+        stats = result[name]
+        print(f"  {name:<9} n={stats['count']:<6} p50={stats['p50_ms']:>9.1f}ms "
+              f"p95={stats['p95_ms']:>9.1f}ms p99={stats['p99_ms']:>9.1f}ms max={stats['max_ms']:>9.1f}ms")
+    if result["skipped"]:
+        print("  not replayed: " + ", ".join(f"/{name} x{count}" for name, count in sorted(result["skipped"].items())))
+
+
+def compare(result, baseline):
+    """Print the change of every tracked metric; returns the worst regression in percent."""
+    print("\n=== against baseline ===")
+    worst = 0.0
+    for section, metric, higher_is_better in BASELINE_METRICS:
+        current = result[section][metric] if section else result[metric]
+        before = baseline[section][metric] if section else baseline[metric]
+        label = f"{section}.{metric}" if section else metric
+        if not before:
+            print(f"  {label:<22} {before:>10.1f} -> {current:>10.1f}")
+            continue
+        change = (current - before) / before * 100
+        regression = -change if higher_is_better else change
+        worst = max(worst, regression)
+        marker = "  ⚠️" if regression >= 1 else ""
+        print(f"  {label:<22} {before:>10.1f} -> {current:>10.1f}  ({change:+.1f}%){marker}")
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace", help="JSONL trace recorded with TRACE_FILE")
+    parser.add_argument("--speed", type=float, default=10.0, help="Time compression factor")
+    parser.add_argument("--max-events", type=int)
+    parser.add_argument("--latency", type=float, default=0.02, help="Mean fake Gemini latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--baseline", help="Compare against results stored with --save-baseline")
+    parser.add_argument("--save-baseline", help="Store this run's results as a baseline")
+    parser.add_argument("--fail-regression", type=float,
+                        help="Exit non-zero if any metric is this many percent worse than the baseline")
+    args = parser.parse_args()
+
+    FakeModel.configure(latency=args.latency, error_rate=args.error_rate)
+    events = load_trace(args.trace, args.max_events)
+    result = asyncio.run(replay(events, args.speed))
+    print_report(result, args.speed)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({**result, "speed": args.speed, "trace": args.trace}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("speed") != args.speed:
+            print(f"\nnote: baseline was replayed at {baseline.get('speed')}x, this run at {args.speed:g}x")
+        worst = compare(result, baseline)
+        if args.fail_regression is not None and worst > args.fail_regression:
+            print(f"\n❌ {worst:.1f}% regression exceeds {args.fail_regression:.1f}%")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Soak test for GuestParticipationTracker memory over simulated weeks of uptime.
+
+Streams millions of synthetic guest IDs through the tracker while a fake
+clock advances, flushing to a discarding collection every simulated 30
+seconds like the tutor cog does. Memory is sampled with tracemalloc; the
+run fails if the cache ever exceeds maxsize or if memory keeps growing
+after the cache has reached its size bound.
+
+Usage:
+    python benchmarks/soak_guest_tracker.py --ids 5000000 --days 28 --maxsize 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_DB", "schrody_bench")
+os.environ.setdefault("GEMINI_API_KEY", "offline")
+
+from guest_tracker import GuestParticipationTracker
+
+
+class DiscardingCollection:
+    """Accepts bulk writes and only counts them."""
+
+    def __init__(self):
+        self.writes = 0
+
+    def bulk_write(self, operations, ordered=True):
+        self.writes += len(operations)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ids", type=int, default=5_000_000, help="Guest prompts to simulate")
+    parser.add_argument("--days", type=float, default=28, help="Simulated uptime")
+    parser.add_argument("--maxsize", type=int, default=100_000)
+    parser.add_argument("--ttl-days", type=float, default=7)
+    parser.add_argument("--samples", type=int, default=10)
+    parser.add_argument("--max-growth", type=float, default=0.2,
+                        help="Allowed memory growth once the cache is full, as a fraction")
+    args = parser.parse_args()
+
+    clock = FakeClock()
+    collection = DiscardingCollection()
+    tracker = GuestParticipationTracker(collection, maxsize=args.maxsize, ttl_days=args.ttl_days, clock=clock)
+    rng = random.Random(0)
+
+    step = args.days * 86400 / args.ids
+    flush_every = max(1, int(30 / step))
+    sample_every = max(1, args.ids // args.samples)
+
+    tracemalloc.start()
+    print(f"{'ids seen':>12} {'sim day':>8} {'cached':>8} {'traced MB':>10} {'peak MB':>9}")
+    repeats = 0
+    full_samples = []  # traced memory at samples taken with the cache full
+    for n in range(1, args.ids + 1):
+        clock.now += step
+        # Mostly new guests, with some returning ones
+        user_id = rng.randrange(n) if rng.random() < 0.2 else 10 ** 17 + n
+        if user_id in tracker:
+            repeats += 1
+        else:
+            tracker.add(user_id)
+        if n % flush_every == 0:
+            tracker.purge_expired()
+            tracker.flush()
+        assert len(tracker) <= args.maxsize, f"cache holds {len(tracker):,} entries, bound is {args.maxsize:,}"
+        if n % sample_every == 0:
+            current, peak = tracemalloc.get_traced_memory()
+            if len(tracker) == args.maxsize:
+                full_samples.append(current)
+            day = (clock.now - 1_700_000_000.0) / 86400
+            print(f"{n:>12,} {day:>8.1f} {len(tracker):>8,} {current / 2 ** 20:>10.1f} {peak / 2 ** 20:>9.1f}")
+    tracemalloc.stop()
+
+    print(f"\nflushed {collection.writes:,} entries, {repeats:,} lookups answered from memory")
+    if len(full_samples) >= 2:
+        growth = full_samples[-1] / full_samples[0] - 1
+        print(f"memory growth with the cache full: {growth:+.1%}")
+        assert growth <= args.max_growth, f"memory grew {growth:.1%} after the cache was full"
+    else:
+        print("cache never filled; raise --ids or lower --maxsize to check memory growth")
+
+
+if __name__ == "__main__":
+    main()
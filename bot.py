@@ -1,3 +1,6 @@
+import time
+_process_started = time.perf_counter()
+
 import discord
 from discord.ext import commands
 from discord import app_commands
@@ -6,7 +9,16 @@ import asyncio
 import signal
 import sys
 import os
+import json
+import hashlib
 from dotenv import load_dotenv
+import db
+import learnlm
+import retention
+import runtime
+import tracing
+import interactions
+from loop_monitor import LOOP_MONITOR, loop_monitor
 
 # Load environment variables
 load_dotenv()
@@ -21,6 +33,45 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Extensions loaded (concurrently) at startup
+COGS = ("cogs.tutor", "cogs.feedback", "cogs.database", "cogs.general")
+
+# Startup milestones as perf_counter timestamps, in the order they happen
+startup_marks = {"process_start": _process_started}
+STARTUP_PHASES = (
+    ("imports", "imports_done"),
+    ("login", "setup_hook_started"),
+    ("cogs", "cogs_loaded"),
+    ("command sync", "commands_synced"),
+    ("gateway", "ready"),
+)
+
+def mark_startup(name):
+    """Record when a startup milestone was reached."""
+    startup_marks.setdefault(name, time.perf_counter())
+
+mark_startup("imports_done")
+
+def startup_breakdown():
+    """Per-phase startup durations in seconds, for the milestones reached so far."""
+    phases = {}
+    previous = startup_marks["process_start"]
+    for phase, milestone in STARTUP_PHASES:
+        if milestone not in startup_marks:
+            break
+        phases[phase] = startup_marks[milestone] - previous
+        previous = startup_marks[milestone]
+    phases["total"] = previous - startup_marks["process_start"]
+    return phases
+
+def prewarm_enabled():
+    """Whether to pre-warm the Gemini client in the background (PREWARM_CLIENTS, default on)."""
+    return os.getenv("PREWARM_CLIENTS", "true").lower() not in ("0", "false", "no")
+
+# Where the hash of the last globally synced command tree is kept
+COMMAND_SYNC_KEY = "command_tree_sync"
+COMMAND_SYNC_FILE = os.getenv("COMMAND_SYNC_FILE", ".command_tree_sync.json")
+
 # Bot intents
 intents = discord.Intents.default()
 intents.messages = True
@@ -33,37 +84,135 @@ class Schrody(commands.Bot):
         super().__init__(command_prefix="!", intents=intents)
 
     async def setup_hook(self):
-        """Sync commands when bot starts."""
-        try:
-            await self.load_extension("cogs.tutor")
-            logger.info("✅ Loaded tutor cog")
-        except Exception as e:
-            logger.error(f"❌ Failed to load tutor cog: {e}")
-        
-        try:
-            await self.load_extension("cogs.feedback")
-            logger.info("✅ Loaded feedback cog")
-        except Exception as e:
-            logger.error(f"❌ Failed to load feedback cog: {e}")
-        
-        try:
-            await self.load_extension("cogs.database")
-            logger.info("✅ Loaded database cog")
-        except Exception as e:
-            logger.error(f"❌ Failed to load database cog: {e}")
-        
+        """Load cogs and sync commands when bot starts."""
+        mark_startup("setup_hook_started")
+
+        # Watch for anything blocking the event loop from here on
+        if LOOP_MONITOR:
+            loop_monitor.start()
+        if tracing.recorder:
+            tracing.recorder.start()
+
+        # Mongo and Gemini clients are created lazily; warm them up off the critical path
+        self.warmup_task = asyncio.create_task(self.warm_up())
+
+        await asyncio.gather(*(self.load_cog(name) for name in COGS))
+        mark_startup("cogs_loaded")
+
+        await self.sync_commands()
+        mark_startup("commands_synced")
+
+    async def load_cog(self, name):
+        """Load one extension, logging instead of raising on failure."""
+        label = name.split(".")[-1]
         try:
-            await self.load_extension("cogs.general")
-            logger.info("✅ Loaded general cog")
+            await self.load_extension(name)
+            logger.info(f"✅ Loaded {label} cog")
         except Exception as e:
-            logger.error(f"❌ Failed to load general cog: {e}")
-        
+            logger.error(f"❌ Failed to load {label} cog: {e}")
+
+    async def warm_up(self):
+        """Connect to Mongo (ensuring indexes) and import the Gemini SDK in the background."""
+        async def ensure_indexes():
+            # Separate steps, so a failure in one does not skip the other
+            failed = []
+            try:
+                failed += await asyncio.to_thread(db.ensure_indexes)
+            except Exception as e:
+                failed.append("indexes")
+                logger.error(f"❌ Failed to ensure database indexes: {e}")
+            try:
+                failed += await asyncio.to_thread(retention.ensure_ttl_indexes)
+            except Exception as e:
+                failed.append("retention TTL indexes")
+                logger.error(f"❌ Failed to ensure retention TTL indexes: {e}")
+            if failed:
+                logger.warning(f"⚠️ Some database indexes could not be ensured: {', '.join(failed)}")
+            else:
+                logger.info("✅ Ensured database indexes")
+
+        async def prewarm_gemini():
+            try:
+                await asyncio.to_thread(learnlm.prewarm)
+                logger.info("✅ Gemini client ready")
+            except Exception as e:
+                logger.error(f"❌ Failed to prewarm Gemini client: {e}")
+
+        tasks = [ensure_indexes()]
+        if prewarm_enabled():
+            tasks.append(prewarm_gemini())
+        await asyncio.gather(*tasks)
+
+    async def sync_commands(self):
+        """Sync slash commands only when the command tree changed since the last sync."""
+        fingerprint = command_tree_fingerprint(self.tree)
+        commands_count = len(self.tree.get_commands())
+
+        # Optional per-guild sync for development; guild syncs apply instantly
+        dev_guild_id = os.getenv("DEV_GUILD_ID")
+        if dev_guild_id:
+            try:
+                guild = discord.Object(id=int(dev_guild_id))
+                self.tree.copy_global_to(guild=guild)
+                await self.tree.sync(guild=guild)
+                logger.info(f"✅ Synced {commands_count} slash commands to dev guild {dev_guild_id}.")
+            except Exception as e:
+                logger.error(f"❌ Failed to sync commands to dev guild {dev_guild_id}: {e}")
+
+        state = await asyncio.to_thread(load_sync_state)
+        force = os.getenv("FORCE_COMMAND_SYNC", "").lower() in ("1", "true", "yes")
+        if state and state.get("hash") == fingerprint and not force:
+            saved = state.get("duration", 0.0)
+            logger.info(f"✅ Command tree unchanged ({fingerprint[:12]}), skipped global sync (saved ~{saved:.2f}s).")
+            return
+
         try:
+            start = time.perf_counter()
             await self.tree.sync()
-            logger.info(f"✅ Synced {len(self.tree.get_commands())} slash commands.")
+            duration = time.perf_counter() - start
+            logger.info(f"✅ Synced {commands_count} slash commands in {duration:.2f}s.")
+            await asyncio.to_thread(save_sync_state, {"hash": fingerprint, "duration": duration})
         except Exception as e:
             logger.error(f"❌ Failed to sync commands: {e}")
 
+def command_tree_fingerprint(tree):
+    """Stable hash of the serialized global command tree."""
+    payload = []
+    for command in tree.get_commands():
+        try:
+            payload.append(command.to_dict(tree))
+        except TypeError:
+            # discord.py < 2.4 takes no tree argument
+            payload.append(command.to_dict())
+    payload.sort(key=lambda c: (c.get("type", 1), c["name"]))
+    serialized = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+def load_sync_state():
+    """Load the last command sync state from the local file, falling back to Mongo."""
+    try:
+        with open(COMMAND_SYNC_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+    try:
+        return db.get_bot_meta(COMMAND_SYNC_KEY)
+    except Exception as e:
+        logger.warning(f"Could not read command sync state from database: {e}")
+        return None
+
+def save_sync_state(state):
+    """Persist the command sync state to Mongo and the local file."""
+    try:
+        db.set_bot_meta(COMMAND_SYNC_KEY, state)
+    except Exception as e:
+        logger.warning(f"Could not store command sync state in database: {e}")
+    try:
+        with open(COMMAND_SYNC_FILE, "w") as f:
+            json.dump(state, f)
+    except OSError as e:
+        logger.warning(f"Could not write {COMMAND_SYNC_FILE}: {e}")
+
 bot = Schrody()
 
 # Global error handler
@@ -89,6 +238,11 @@ async def on_command_error(ctx, error):
 async def on_ready():
     logger.info(f"✅ Logged in as {bot.user}")
     logger.info(f'Bot is in {len(bot.guilds)} guilds')
+
+    if "ready" not in startup_marks:
+        mark_startup("ready")
+        breakdown = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in startup_breakdown().items())
+        logger.info(f"⏱️ Startup: {breakdown}")
     
     # Set bot status (optional)
     await bot.change_presence(
@@ -96,9 +250,16 @@ async def on_ready():
     )
 
 
+# Record slash command traffic when tracing is enabled
+@bot.event
+async def on_interaction(interaction):
+    if tracing.recorder and interaction.type == discord.InteractionType.application_command:
+        tracing.recorder.record_interaction(interaction)
+
+
 @bot.tree.command(name="hello", description="Sends a greeting")
 async def hello(interaction: discord.Interaction):
-    await interaction.response.send_message(f"Hello, {interaction.user.mention}! How can I help?")
+    await interactions.respond(interaction, f"Hello, {interaction.user.mention}! How can I help?")
 
 async def load_cogs():
     """Load all cogs from the cogs directory"""
@@ -113,6 +274,8 @@ async def shutdown():
     """Gracefully shutdown the bot"""
     logger.info("Shutting down bot...")
     await bot.close()
+    if tracing.recorder:
+        await asyncio.to_thread(tracing.recorder.stop)
     logger.info("Bot shut down complete")
 
 # Register signal handlers for graceful shutdown
@@ -128,8 +291,15 @@ async def main():
             logger.error("DISCORD_TOKEN not found in environment variables")
             sys.exit(1)
         
+        # The aiodns resolver has to be created on the running loop
+        if runtime.speed_mode_enabled():
+            connector = runtime.make_connector()
+            if connector is not None:
+                bot.http.connector = connector
+
         # Start the bot
-        logger.info("Starting bot...")
+        logger.info(f"Starting bot... (loop {runtime.features['loop']}, json {runtime.features['json']}, "
+                    f"resolver {runtime.features['resolver']})")
         await bot.start(token)
         
     except discord.LoginFailure:
@@ -141,6 +311,7 @@ async def main():
 
 # Run the bot
 if __name__ == "__main__":
+    runtime.install()
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
@@ -1,35 +1,100 @@
-
 import discord
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 import db
+import retention
+import interactions
+from outbox import reply_outbox
+import io
+import marshal
+import time
+import pstats
+import asyncio
+import cProfile
 import datetime
 
+# How long cached collection statistics are served before being refreshed
+STATS_TTL_SECONDS = 60
+
+# Longest /debug_profile run and how many functions its summary lists
+PROFILE_MAX_SECONDS = 120
+PROFILE_TOP_FUNCTIONS = 25
+
 class Database(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.stats_cache = None
+        self.stats_cached_at = None
+        self.profile_lock = asyncio.Lock()
+        self.refresh_stats.start()
+        # A bad retention setting must not keep the rest of the cog from loading
+        try:
+            policies = retention.load_policies()
+        except ValueError as e:
+            print(f"Invalid retention settings, archiving disabled: {e}")
+            policies = []
+        if any(policy.archive_days for policy in policies):
+            self.archive_old_data.start()
+
+    def cog_unload(self):
+        self.refresh_stats.cancel()
+        self.archive_old_data.cancel()
+
+    async def get_stats(self):
+        """Return cached collection statistics, refreshing them if missing or stale."""
+        now = datetime.datetime.utcnow()
+        if self.stats_cache is None or (now - self.stats_cached_at).total_seconds() > STATS_TTL_SECONDS * 2:
+            self.stats_cache = await asyncio.to_thread(db.get_collection_stats)
+            self.stats_cached_at = now
+        return self.stats_cache, self.stats_cached_at
+
+    @tasks.loop(seconds=STATS_TTL_SECONDS)
+    async def refresh_stats(self):
+        """Refresh collection statistics in the background so /db_status never waits on counts."""
+        try:
+            self.stats_cache = await asyncio.to_thread(db.get_collection_stats)
+            self.stats_cached_at = datetime.datetime.utcnow()
+        except Exception as e:
+            print(f"Error refreshing database stats: {e}")
+
+    @tasks.loop(hours=24)
+    async def archive_old_data(self):
+        """Archive documents nearing their TTL to compressed files, once a day."""
+        try:
+            results = await asyncio.to_thread(retention.archive_all)
+            for result in results:
+                print(f"🗃️ Archived {result['archived']} documents from {result['collection']}")
+        except Exception as e:
+            print(f"Error archiving old data: {e}")
+
+    @refresh_stats.before_loop
+    async def before_refresh_stats(self):
+        """Wait until the bot is ready so the first refresh does not open the Mongo client during startup."""
+        await self.bot.wait_until_ready()
+
+    @archive_old_data.before_loop
+    async def before_archive_old_data(self):
+        """Wait until the bot is ready before starting the task."""
+        await self.bot.wait_until_ready()
 
     @app_commands.command(name="db_status", description="Check database connection and show statistics")
     async def db_status(self, interaction: discord.Interaction):
         """Check if database is working and show basic stats."""
         # Check if user has administrator permissions
         if not interaction.user.guild_permissions.administrator:
-            await interaction.response.send_message("❌ This command is restricted to administrators only.", ephemeral=True)
+            await interactions.respond(interaction, "❌ This command is restricted to administrators only.", ephemeral=True)
             return
-            
+
+        await interactions.acknowledge(interaction)
         try:
             # Test database connection
-            db.mongo_client.admin.command('ping')
-            
-            # Get collection counts
-            users_count = db.users_collection.count_documents({})
-            messages_count = db.messages_collection.count_documents({})
-            sessions_count = db.sessions_collection.count_documents({})
-            feedback_count = db.feedback_collection.count_documents({})
-            conversations_count = db.conversations.count_documents({})
-            
-            # Get active sessions
-            active_sessions = db.sessions_collection.count_documents({"active": True})
+            ping_ms = await asyncio.to_thread(db.ping)
+
+            # Get collection counts (estimated, cached)
+            stats, cached_at = await self.get_stats()
+            pool = db.get_pool_usage()
+            outbox = await asyncio.to_thread(reply_outbox.stats)
+            cache_age = (datetime.datetime.utcnow() - cached_at).total_seconds()
             
             embed = discord.Embed(
                 title="🗄️ Database Status",
@@ -38,21 +103,36 @@ class Database(commands.Cog):
             )
             
             embed.add_field(name="📊 Collection Statistics", value=f"""
-            **Users:** {users_count}
-            **Messages:** {messages_count}
-            **Sessions:** {sessions_count}
-            **Active Sessions:** {active_sessions}
-            **Feedback:** {feedback_count}
-            **Conversations:** {conversations_count}
+            **Users:** ~{stats['users']}
+            **Messages:** ~{stats['messages']}
+            **Sessions:** ~{stats['sessions']}
+            **Active Sessions:** {stats['active_sessions']}
+            **Feedback:** ~{stats['feedback']}
+            **Conversation Buckets:** ~{stats['conversation_buckets']}
+            *Estimated counts, updated {cache_age:.0f}s ago*
             """, inline=False)
             
             embed.add_field(name="🔗 Connection Info", value=f"""
             **Database:** {db.mongo_db_name}
             **Status:** ✅ Connected
+            **Ping:** {ping_ms:.1f}ms
+            **Connection Pool:** {pool['in_use']} in use / {pool['open']} open (max {pool['max']})
             **Timestamp:** {datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC
             """, inline=False)
+
+            session_cache = db.active_session_cache.stats()
+            embed.add_field(name="⚡ Active Session Cache", value=f"""
+            **Hit Rate:** {session_cache['hit_rate']:.1%} ({session_cache['hits']} hits / {session_cache['misses']} misses)
+            **Entries:** {session_cache['size']} / {session_cache['maxsize']}
+            """, inline=False)
+
+            oldest = f"{outbox['oldest_age_s']:.0f}s" if outbox["oldest_age_s"] is not None else "n/a"
+            embed.add_field(name="📮 Reply Outbox", value=f"""
+            **Pending:** {outbox['depth']} (oldest {oldest})
+            **Since Start:** {outbox['delivered']} delivered, {outbox['redelivered']} on retry, {outbox['retried']} retries scheduled, {outbox['failed']} given up
+            """, inline=False)
             
-            await interaction.response.send_message(embed=embed)
+            await interactions.respond(interaction, embed=embed)
             
         except Exception as e:
             error_embed = discord.Embed(
@@ -60,32 +140,80 @@ class Database(commands.Cog):
                 description=f"Failed to connect to database: {str(e)}",
                 color=discord.Color.red()
             )
-            await interaction.response.send_message(embed=error_embed)
+            await interactions.respond(interaction, embed=error_embed)
+
+    @app_commands.command(name="debug_profile", description="Profile the bot for a number of seconds")
+    @app_commands.describe(seconds=f"How long to profile (1-{PROFILE_MAX_SECONDS})")
+    async def debug_profile(self, interaction: discord.Interaction,
+                            seconds: app_commands.Range[int, 1, PROFILE_MAX_SECONDS] = 10):
+        """Run cProfile over the event loop thread and upload the results.
+
+        The profiler is only enabled for the duration of the command, so there
+        is no overhead otherwise. Work done in executor threads (database
+        calls, Gemini requests) shows up as the time spent awaiting it.
+        """
+        if not interaction.user.guild_permissions.administrator:
+            await interactions.respond(interaction, "❌ This command is restricted to administrators only.", ephemeral=True)
+            return
+        if self.profile_lock.locked():
+            await interactions.respond(interaction, "⏳ A profile is already running, try again when it finishes.", ephemeral=True)
+            return
+
+        async with self.profile_lock:
+            await interactions.acknowledge(interaction, ephemeral=True, thinking=True)
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profiler.disable()
+            elapsed = time.perf_counter() - started
+
+            summary = io.StringIO()
+            stats = pstats.Stats(profiler, stream=summary)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_TOP_FUNCTIONS)
+            # Same format as Stats.dump_stats, loadable with pstats or snakeviz
+            dump = io.BytesIO(marshal.dumps(stats.stats))
+
+        stamp = datetime.datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+        files = [
+            discord.File(dump, filename=f"profile-{stamp}.pstats"),
+            discord.File(io.BytesIO(summary.getvalue().encode("utf-8")), filename=f"profile-{stamp}-top.txt"),
+        ]
+        await interaction.followup.send(
+            f"🔬 Profiled the event loop for {elapsed:.1f}s: {stats.total_calls:,} calls. "
+            f"Top {PROFILE_TOP_FUNCTIONS} functions by cumulative time are in the .txt, "
+            f"load the .pstats with `python -m pstats` or snakeviz.",
+            files=files,
+            ephemeral=True
+        )
 
     @app_commands.command(name="db_test", description="Test database operations")
     async def db_test(self, interaction: discord.Interaction):
         """Test basic database operations."""
         # Check if user has administrator permissions
         if not interaction.user.guild_permissions.administrator:
-            await interaction.response.send_message("❌ This command is restricted to administrators only.", ephemeral=True)
+            await interactions.respond(interaction, "❌ This command is restricted to administrators only.", ephemeral=True)
             return
-            
+
+        await interactions.acknowledge(interaction)
         try:
             user_id = str(interaction.user.id)
             
             # Test adding a user
-            db.add_user(interaction.user.id, interaction.user.name)
+            await asyncio.to_thread(db.add_user, interaction.user.id, interaction.user.name)
             
             # Test logging a message
             test_message = f"Database test at {datetime.datetime.utcnow()}"
-            db.log_message(user_id, test_message)
+            await asyncio.to_thread(db.log_message, user_id, test_message)
             
             # Test retrieving messages
-            recent_messages = db.get_messages(user_id, limit=3)
+            recent_messages = await asyncio.to_thread(db.get_messages, user_id, limit=3)
             
             # Test conversation functions
-            db.add_message(user_id, "Test conversation message", role="user")
-            conversation = db.get_conversation(user_id, limit=3)
+            await asyncio.to_thread(db.add_message, user_id, "Test conversation message", role="user")
+            conversation = await asyncio.to_thread(db.get_conversation, user_id, limit=3)
             
             embed = discord.Embed(
                 title="🧪 Database Test Results",
@@ -103,7 +231,7 @@ class Database(commands.Cog):
             embed.add_field(name="📝 Recent Messages", value=f"Found {len(recent_messages)} recent messages", inline=True)
             embed.add_field(name="💬 Conversation", value=f"Found {len(conversation)} conversation entries", inline=True)
             
-            await interaction.response.send_message(embed=embed)
+            await interactions.respond(interaction, embed=embed)
             
         except Exception as e:
             error_embed = discord.Embed(
@@ -111,7 +239,7 @@ class Database(commands.Cog):
                 description=f"Error during database test: {str(e)}",
                 color=discord.Color.red()
             )
-            await interaction.response.send_message(embed=error_embed)
+            await interactions.respond(interaction, embed=error_embed)
 
 async def setup(bot):
     await bot.add_cog(Database(bot))
@@ -1,9 +1,15 @@
 import discord
 from discord import app_commands
 from discord.ext import commands, tasks
+from typing import Literal
 import db
+import asyncio
+import interactions
 import datetime
 
+PENDING_PAGE_SIZE = 20
+FEEDBACK_STATS_MAX_DAYS = 365
+
 class Feedback(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -13,27 +19,72 @@ class Feedback(commands.Cog):
     async def feedback(self, interaction: discord.Interaction, rating: int):
         """Logs user feedback."""
         if rating < 1 or rating > 5:
-            await interaction.response.send_message("❌ Please provide a rating between 1 and 5.")
+            await interactions.respond(interaction, "❌ Please provide a rating between 1 and 5.")
             return
 
-        db.log_feedback(interaction.user.id, rating)
-        await interaction.response.send_message("✅ Thanks for your feedback!")
+        await interactions.acknowledge(interaction)
+        guild_id = interaction.guild.id if interaction.guild else None
+        await asyncio.to_thread(db.log_feedback, interaction.user.id, rating, guild_id=guild_id)
+        await interactions.respond(interaction, "✅ Thanks for your feedback!")
 
     @app_commands.command(name="pending_feedback", description="List users who haven't given feedback.")
-    async def pending_feedback(self, interaction: discord.Interaction):
-        """Lists users who haven't submitted feedback."""
-        pending_users = db.get_pending_feedback()
-        if len(list(pending_users)) == 0:
-            await interaction.response.send_message("✅ Everyone has submitted feedback!")
+    async def pending_feedback(self, interaction: discord.Interaction, page: int = 1):
+        """Lists users who haven't submitted feedback, one page at a time."""
+        page = max(page, 1)
+        await interactions.acknowledge(interaction)
+        pending = await asyncio.to_thread(db.get_pending_feedback, page=page - 1, page_size=PENDING_PAGE_SIZE)
+        if pending["total"] == 0:
+            await interactions.respond(interaction, "✅ Everyone has submitted feedback!")
+            return
+
+        total_pages = (pending["total"] + PENDING_PAGE_SIZE - 1) // PENDING_PAGE_SIZE
+        if not pending["users"]:
+            await interactions.respond(interaction, f"❌ Page {page} is empty. There are {total_pages} page(s).")
             return
-        
-        user_list = "\n".join([user["username"] for user in pending_users])
-        await interaction.response.send_message(f"🚨 Users who haven't submitted feedback:\n```{user_list}```")
+
+        user_list = "\n".join(
+            f"{user['username']} ({user['pending_sessions']} session{'s' if user['pending_sessions'] != 1 else ''})"
+            for user in pending["users"]
+        )
+        await interactions.respond(
+            interaction,
+            f"🚨 Users who haven't submitted feedback ({pending['total']} total, page {page}/{total_pages}):\n```{user_list}```"
+        )
+
+    @app_commands.command(name="feedback_stats", description="Show average feedback rating per day or per server.")
+    @app_commands.describe(days=f"How many days to look back (1-{FEEDBACK_STATS_MAX_DAYS})")
+    async def feedback_stats(self, interaction: discord.Interaction, group_by: Literal["day", "guild"] = "day",
+                             days: app_commands.Range[int, 1, FEEDBACK_STATS_MAX_DAYS] = 30):
+        """Shows the average rating, aggregated by the database."""
+        if not interaction.user.guild_permissions.administrator:
+            await interactions.respond(interaction, "❌ This command is restricted to administrators only.", ephemeral=True)
+            return
+
+        await interactions.acknowledge(interaction)
+        rows = await asyncio.to_thread(db.get_feedback_stats, group_by=group_by, days=days)
+        if not rows:
+            await interactions.respond(interaction, f"📭 No feedback in the last {days} days.")
+            return
+
+        embed = discord.Embed(
+            title="⭐ Feedback Statistics",
+            description=f"Average rating per {group_by} over the last {days} days",
+            color=discord.Color.gold()
+        )
+        lines = []
+        for row in rows[-25:]:
+            key = row["key"]
+            if group_by == "guild":
+                guild = self.bot.get_guild(int(key)) if key else None
+                key = guild.name if guild else (key or "Unknown")
+            lines.append(f"**{key}:** {row['average']:.2f} ({row['count']} ratings)")
+        embed.add_field(name="📊 Ratings", value="\n".join(lines), inline=False)
+        await interactions.respond(interaction, embed=embed)
 
     @tasks.loop(hours=12)
     async def remind_feedback(self):
         """Reminds users to submit feedback every 12 hours."""
-        for session in db.get_pending_feedback():
+        for session in db.iter_pending_feedback_sessions():
             # Check if we've already sent a reminder for this session
             if not session.get("reminder_sent", False):
                 try:
@@ -1,7 +1,17 @@
-
 import discord
 from discord import app_commands
 from discord.ext import commands
+import asyncio
+import db
+import learnlm
+import interactions
+from loop_monitor import loop_monitor
+
+# How long /ping waits for the Mongo ping before reporting it as unreachable
+MONGO_PING_TIMEOUT = 2.0
+
+def _ms(value):
+    return f"{value:.0f}ms" if value is not None else "n/a"
 
 class General(commands.Cog):
     def __init__(self, bot):
@@ -9,8 +19,74 @@ class General(commands.Cog):
 
     @app_commands.command(name="ping", description="Check if the bot is responsive.")
     async def ping(self, interaction: discord.Interaction):
-        """Simple ping command to test bot responsiveness."""
-        await interaction.response.send_message(f"🏓 Pong! Latency: {round(self.bot.latency * 1000)}ms")
+        """Ping command reporting gateway latency plus Mongo and Gemini health."""
+        await interactions.acknowledge(interaction)
+        try:
+            mongo = await asyncio.wait_for(asyncio.to_thread(db.get_health), timeout=MONGO_PING_TIMEOUT)
+        except asyncio.TimeoutError:
+            mongo = {"ok": False, "error": f"no reply within {MONGO_PING_TIMEOUT:.0f}s"}
+
+        if mongo["ok"]:
+            pool = mongo["pool"]
+            mongo_line = (
+                f"✅ ping {_ms(mongo['ping_ms'])}, commands p95 {_ms(mongo['commands']['p95'])}, "
+                f"pool wait p95 {_ms(mongo['pool_wait']['p95'])}, "
+                f"{pool['in_use']}/{pool['max']} connections in use"
+            )
+        else:
+            mongo_line = f"❌ {mongo['error']}"
+
+        gemini = learnlm.get_health()
+        if not gemini["calls"]:
+            gemini_line = "⚪ no calls yet"
+        else:
+            status = "✅" if gemini["error_rate"] < 0.2 else "⚠️"
+            gemini_line = (
+                f"{status} p50 {_ms(gemini['latency']['p50'])}, p95 {_ms(gemini['latency']['p95'])}, "
+                f"errors {gemini['error_rate'] * 100:.0f}%"
+            )
+            hedging = gemini["hedging"]
+            if hedging["enabled"] and hedging["requests"]:
+                gemini_line += (
+                    f"\n  • hedged {hedging['hedge_rate'] * 100:.1f}% of requests, "
+                    f"hedge won {hedging['hedge_win_rate'] * 100:.0f}%, "
+                    f"saved p50 {_ms(hedging['saved_ms']['p50'])}"
+                )
+            if gemini["routing"]:
+                for name, tier in gemini["tiers"].items():
+                    if tier["routed"]:
+                        flag = "⚠️ " if tier["degraded"] else ""
+                        gemini_line += (
+                            f"\n  • {flag}{name} ({tier['model']}): {tier['routed']} routed, "
+                            f"p95 {_ms(tier['latency_ms']['p95'])}, ${tier['total_cost_usd']:.4f} spent"
+                        )
+
+        loop = loop_monitor.snapshot()
+        if not loop["count"]:
+            loop_line = "⚪ not monitored"
+        else:
+            p99 = f"≤{loop['p99_ms']}ms" if loop["p99_ms"] is not None else f">{loop_monitor.histogram.buckets[-1]}ms"
+            status = "✅" if not loop["stalls"] else "⚠️"
+            loop_line = f"{status} lag p99 {p99}, max {_ms(loop['max_ms'])}, {loop['stalls']} stalls"
+
+        acks = interactions.ack_stats.summary()
+        if not acks["acked"] and not acks["missed"]:
+            ack_line = "⚪ no commands yet"
+        else:
+            status = "✅" if not acks["missed"] else "⚠️"
+            ack_line = (
+                f"{status} time-to-ack p50 {_ms(acks['latency']['p50'])}, p95 {_ms(acks['latency']['p95'])}, "
+                f"{acks['missed']} missed"
+            )
+
+        await interactions.respond(
+            interaction,
+            f"🏓 Pong! Latency: {round(self.bot.latency * 1000)}ms\n"
+            f"🗄️ Mongo: {mongo_line}\n"
+            f"🤖 Gemini: {gemini_line}\n"
+            f"⏱️ Event loop: {loop_line}\n"
+            f"⚡ Interactions: {ack_line}"
+        )
 
 async def setup(bot):
     await bot.add_cog(General(bot))
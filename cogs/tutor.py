@@ -2,15 +2,53 @@ import discord
 from discord import app_commands
 from discord.ext import commands, tasks
 import db
-import datetime
-from learnlm import ask_learnlm
+import asyncio
+import messaging
+import interactions
+import outbox
+import tracing
 from sessions import session_manager 
+from guest_tracker import GuestParticipationTracker
 
 class Tutor(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.guest_participation_asked = set()  # Track users who have been asked about participation
+        self.guest_participation_asked = GuestParticipationTracker()  # Track users who have been asked about participation
+        session_manager.bot = bot  # lets sessions resolve stored IDs from the bot's cache
+        self.rehydrate_task = None  # set in cog_load
         self.check_inactive_sessions.start()
+        self.flush_guest_participation.start()
+        self.deliver_outbox.start()
+
+    async def cog_load(self):
+        """Rehydrate in-memory state in the background so startup doesn't wait on Mongo."""
+        self.rehydrate_task = asyncio.create_task(self.rehydrate_tutoring_threads())
+        self.guest_load_task = asyncio.create_task(self.load_guest_participation())
+
+    async def cog_unload(self):
+        """Stop background loops and persist any queued guest entries."""
+        self.check_inactive_sessions.cancel()
+        self.flush_guest_participation.cancel()
+        self.deliver_outbox.cancel()
+        try:
+            await asyncio.to_thread(self.guest_participation_asked.flush)
+        except Exception as e:
+            print(f"Error flushing guest participation: {e}")
+
+    async def load_guest_participation(self):
+        """Restore which guests were already asked, so they aren't re-prompted after a restart."""
+        try:
+            await asyncio.to_thread(self.guest_participation_asked.load)
+        except Exception as e:
+            print(f"Error loading guest participation: {e}")
+
+    async def rehydrate_tutoring_threads(self):
+        """Load active sessions' thread IDs so on_message can filter without I/O."""
+        try:
+            thread_ids = await asyncio.to_thread(db.get_active_thread_ids)
+            session_manager.rehydrate_thread_ids(thread_ids)
+        except Exception as e:
+            print(f"Error loading tutoring threads: {e}")
 
     def get_user_display_name(self, user, guild):
         """Get user's display name (nickname if available, otherwise username)"""
@@ -26,7 +64,8 @@ class Tutor(commands.Cog):
         """Starts a tutoring session and logs the start time."""
         # Check if the command is being used in a DM
         if isinstance(interaction.channel, discord.DMChannel):
-            await interaction.response.send_message(
+            await interactions.respond(
+                interaction,
                 "❌ This command cannot be used in DMs. Please use it in a server channel where I can create threads.",
                 ephemeral=True
             )
@@ -34,17 +73,20 @@ class Tutor(commands.Cog):
 
         # Check if the channel supports threads
         if not hasattr(interaction.channel, 'create_thread'):
-            await interaction.response.send_message(
+            await interactions.respond(
+                interaction,
                 "❌ This command can only be used in channels that support threads (text channels).",
                 ephemeral=True
             )
             return
-            
+
+        # Everything below talks to Mongo or Discord, so acknowledge first
+        await interactions.acknowledge(interaction, ephemeral=True, thinking=True)
         user = interaction.user
-        existing_session = db.sessions_collection.find_one({"user_id": str(user.id), "active": True})
+        existing_session = await asyncio.to_thread(db.get_active_session, user.id)
 
         if existing_session:
-            await interaction.response.send_message(f"❌ {user.mention}, you already have an active session with Schrödy!", ephemeral=True)
+            await interactions.respond(interaction, f"❌ {user.mention}, you already have an active session with Schrödy!", ephemeral=True)
             return
 
         # Check if we're in an existing Schrödy thread
@@ -71,7 +113,7 @@ class Tutor(commands.Cog):
                 )
                 embed.set_footer(text="Use the command again in the main channel if you want to start fresh, or use /resume_session to continue.")
 
-                await interaction.response.send_message(embed=embed, ephemeral=True)
+                await interactions.respond(interaction, embed=embed, ephemeral=True)
                 return
 
         # Use user's display name for thread name
@@ -88,7 +130,8 @@ class Tutor(commands.Cog):
         session = session_manager.create_session(thread)
         user_session = session.add_user(user)
 
-        db.start_session(interaction.user.id, interaction.user.name, thread.id)
+        await asyncio.to_thread(db.start_session, interaction.user.id, interaction.user.name, thread.id,
+                                guild_id=interaction.guild.id)
 
         # Create styled embed for session start
         embed = discord.Embed(
@@ -113,23 +156,23 @@ class Tutor(commands.Cog):
         )
 
         await thread.send(embed=embed)
-        await interaction.response.send_message(f"📚 Tutoring session started, {interaction.user.mention}! I'll assist you in the thread I created.")
+        await interactions.respond(
+            interaction,
+            f"📚 Tutoring session started, {interaction.user.mention}! I'll assist you in {thread.mention}.",
+            ephemeral=True
+        )
 
     @app_commands.command(name="ask", description="Ask Schrody a question.")
     async def ask(self, interaction: discord.Interaction, question: str):
-        # Show thinking indicator immediately before deferring with user identification
-        user_display_name = self.get_user_display_name(interaction.user, interaction.guild)
-        thinking_message = await interaction.channel.send(f"🤔 Schrödy is thinking... (responding to {user_display_name})")
-
-        # Defer the response to prevent timeout
-        await interaction.response.defer()
+        # Acknowledge before any other work so the interaction cannot expire
+        await interactions.acknowledge(interaction)
 
         user_id = str(interaction.user.id)
         user_int_id = interaction.user.id
 
         try:
             # Check if user has an active session
-            existing_session = db.sessions_collection.find_one({"user_id": user_id, "active": True})
+            existing_session = await asyncio.to_thread(db.get_active_session, user_id)
 
             if existing_session:
                 # User has active session - check if we're in a tutoring thread
@@ -139,24 +182,20 @@ class Tutor(commands.Cog):
                         user_session = session.get_user_session(user_int_id)
                         if user_session:
                             # Handle as active session owner
-                            await self._handle_active_user_question(interaction, question, user_id, user_int_id, session, thinking_message)
+                            await self._handle_active_user_question(interaction, question, user_id, user_int_id, session)
                         else:
-                            await thinking_message.delete()
                             await interaction.followup.send("❌ Please use this command in your tutoring thread or start a new session with `/start_session`.")
                     else:
-                        await thinking_message.delete()
                         await interaction.followup.send("❌ Please use this command in your tutoring thread or start a new session with `/start_session`.")
                 else:
-                    await thinking_message.delete()
                     await interaction.followup.send("❌ Please use this command in your tutoring thread or start a new session with `/start_session`.")
             else:
                 # User doesn't have active session - check if they're in someone else's thread
                 if isinstance(interaction.channel, discord.Thread) and interaction.channel.name.startswith("Schrödy-"):
                     # They're in a tutoring thread - handle as guest
-                    await self._handle_guest_user_question(interaction, question, user_id, user_int_id, thinking_message)
+                    await self._handle_guest_user_question(interaction, question, user_id, user_int_id)
                 else:
                     # Not in a tutoring thread and no active session
-                    await thinking_message.delete()
                     embed = discord.Embed(
                         title="❌ No Active Session",
                         description="You don't have an active tutoring session.",
@@ -169,22 +208,14 @@ class Tutor(commands.Cog):
                     )
                     await interaction.followup.send(embed=embed, ephemeral=True)
         except Exception as e:
-            await thinking_message.delete()
             print(f"Error in ask command: {e}")
             await interaction.followup.send("❌ An error occurred while processing your question. Please try again.", ephemeral=True)
 
-    async def _handle_active_user_question(self, interaction, question, user_id, user_int_id, session, thinking_message):
+    async def _handle_active_user_question(self, interaction, question, user_id, user_int_id, session):
         """Handle question from user with active session using sessions.py system."""
         try:
             # Update last activity time in database and reset warning flags
-            db.sessions_collection.update_one(
-                {"user_id": user_id, "active": True},
-                {"$set": {
-                    "last_activity": datetime.datetime.utcnow(),
-                    "dm_warning_sent": False,
-                    "thread_reminder_sent": False
-                }}
-            )
+            await asyncio.to_thread(db.update_session_activity, user_id)
 
             # Process the message through the session system
             # Create a mock message object for the session system
@@ -196,24 +227,20 @@ class Tutor(commands.Cog):
 
             mock_message = MockMessage(question, interaction.user, interaction.channel)
 
-            # Let the session system handle the message processing
-            await session.process_message(mock_message)
-
-            # Delete the thinking message
-            await thinking_message.delete()
+            # Let the session system handle the message processing, showing typing meanwhile
+            async with messaging.responding(interaction.channel, "ask"):
+                await session.process_message(mock_message)
         except Exception as e:
-            await thinking_message.delete()
             print(f"Error handling active user question: {e}")
             await interaction.followup.send("❌ An error occurred while processing your question. Please try again.", ephemeral=True)
 
-    async def _handle_guest_user_question(self, interaction, question, user_id, user_int_id, thinking_message):
+    async def _handle_guest_user_question(self, interaction, question, user_id, user_int_id):
         """Handle question from guest user."""
         try:
             thread_id = interaction.channel.id
             session = session_manager.get_session(thread_id)
 
             if not session:
-                await thinking_message.delete()
                 await interaction.followup.send("❌ This appears to be an inactive tutoring thread. Please start a new session with `/start_session`.")
                 return
 
@@ -252,13 +279,10 @@ class Tutor(commands.Cog):
 
             mock_message = MockMessage(question, interaction.user, interaction.channel)
 
-            # Let the session system handle the message processing
-            await session.process_message(mock_message)
-
-            # Delete the thinking message
-            await thinking_message.delete()
+            # Let the session system handle the message processing, showing typing meanwhile
+            async with messaging.responding(interaction.channel, "ask_guest"):
+                await session.process_message(mock_message)
         except Exception as e:
-            await thinking_message.delete()
             print(f"Error handling guest user question: {e}")
             await interaction.followup.send("❌ An error occurred while processing your question. Please try again.", ephemeral=True)
 
@@ -268,20 +292,24 @@ class Tutor(commands.Cog):
         user = interaction.user
         user_id = str(user.id)
 
+        # Every reply below is ephemeral; acknowledge before the database and thread lookups
+        await interactions.acknowledge(interaction, ephemeral=True, thinking=True)
         try:
             # Check if user has an active session first
-            existing_session = db.sessions_collection.find_one({"user_id": user_id, "active": True})
+            existing_session = await asyncio.to_thread(db.get_active_session, user_id)
 
             # If no active session, check for any previous session (including ended ones)
             if not existing_session:
                 # Look for the most recent session (active or ended)
-                recent_session = db.sessions_collection.find_one(
+                recent_session = await asyncio.to_thread(
+                    db.sessions_collection.find_one,
                     {"user_id": user_id}, 
                     sort=[("start_time", -1)]
                 )
 
                 if not recent_session:
-                    await interaction.response.send_message(
+                    await interactions.respond(
+                        interaction,
                         f"❌ {user.mention}, you don't have any previous sessions to resume. Use `/start_session` to begin a new one!", 
                         ephemeral=True
                     )
@@ -289,15 +317,7 @@ class Tutor(commands.Cog):
 
                 # Reactivate the session if it was ended
                 if not recent_session.get("active", False):
-                    db.sessions_collection.update_one(
-                        {"user_id": user_id, "_id": recent_session["_id"]},
-                        {"$set": {
-                            "active": True,
-                            "last_activity": datetime.datetime.utcnow(),
-                            "dm_warning_sent": False,
-                            "thread_reminder_sent": False
-                        }}
-                    )
+                    await asyncio.to_thread(db.reactivate_session, user_id, recent_session["_id"])
                     existing_session = recent_session
 
             # Try to find the existing thread
@@ -317,16 +337,10 @@ class Tutor(commands.Cog):
                     user_session = session.add_user(user)
 
                     # Update last activity time and reset warning flags
-                    db.sessions_collection.update_one(
-                        {"user_id": user_id, "active": True}, 
-                        {"$set": {
-                            "last_activity": datetime.datetime.utcnow(),
-                            "dm_warning_sent": False,
-                            "thread_reminder_sent": False
-                        }}
-                    )
+                    await asyncio.to_thread(db.update_session_activity, user_id)
 
-                    await interaction.response.send_message(
+                    await interactions.respond(
+                        interaction,
                         f"✅ {user.mention}, your session has been resumed in this thread!", 
                         ephemeral=True
                     )
@@ -371,16 +385,10 @@ class Tutor(commands.Cog):
                             user_session = session.add_user(user)
 
                             # Update last activity time and reset warning flags
-                            db.sessions_collection.update_one(
-                                {"user_id": user_id, "active": True}, 
-                                {"$set": {
-                                    "last_activity": datetime.datetime.utcnow(),
-                                    "dm_warning_sent": False,
-                                    "thread_reminder_sent": False
-                                }}
-                            )
+                            await asyncio.to_thread(db.update_session_activity, user_id)
 
-                            await interaction.response.send_message(
+                            await interactions.respond(
+                                interaction,
                                 f"✅ {user.mention}, your session has been resumed in {thread.mention}!", 
                                 ephemeral=True
                             )
@@ -426,16 +434,10 @@ class Tutor(commands.Cog):
                                 user_session = session.add_user(user)
 
                                 # Update last activity time and reset warning flags
-                                db.sessions_collection.update_one(
-                                    {"user_id": user_id, "active": True}, 
-                                    {"$set": {
-                                        "last_activity": datetime.datetime.utcnow(),
-                                        "dm_warning_sent": False,
-                                        "thread_reminder_sent": False
-                                    }}
-                                )
+                                await asyncio.to_thread(db.update_session_activity, user_id)
 
-                                await interaction.response.send_message(
+                                await interactions.respond(
+                                    interaction,
                                     f"✅ {user.mention}, your session has been resumed in {thread.mention}!", 
                                     ephemeral=True
                                 )
@@ -482,16 +484,10 @@ class Tutor(commands.Cog):
                 user_session = session.add_user(user)
 
                 # Update last activity time and reset warning flags
-                db.sessions_collection.update_one(
-                    {"user_id": user_id, "active": True}, 
-                    {"$set": {
-                        "last_activity": datetime.datetime.utcnow(),
-                        "dm_warning_sent": False,
-                        "thread_reminder_sent": False
-                    }}
-                )
+                await asyncio.to_thread(db.update_session_activity, user_id)
 
-                await interaction.response.send_message(
+                await interactions.respond(
+                    interaction,
                     f"✅ {user.mention}, your session has been resumed in a new thread since the previous one wasn't found!", 
                     ephemeral=True
                 )
@@ -522,11 +518,11 @@ class Tutor(commands.Cog):
 
         except Exception as e:
             print(f"Error in resume_session: {e}")
-            if not interaction.response.is_done():
-                await interaction.response.send_message(
-                    f"❌ {user.mention}, an error occurred while resuming your session. Please try again or start a new session.", 
-                    ephemeral=True
-                )
+            await interactions.respond(
+                interaction,
+                f"❌ {user.mention}, an error occurred while resuming your session. Please try again or start a new session.", 
+                ephemeral=True
+            )
 
     @app_commands.command(name="end_session", description="End the tutoring session.")
     async def end_session(self, interaction: discord.Interaction):
@@ -536,12 +532,12 @@ class Tutor(commands.Cog):
             if session:
                 user_session = session.get_user_session(interaction.user.id)
                 if user_session:
-                    await interaction.response.send_message("Session ended successfully.", ephemeral=True)
+                    await interactions.respond(interaction, "Session ended successfully.", ephemeral=True)
                     # End the user's individual session
                     await session.end_user_session(interaction.user)
 
                     # Update database with thread_id
-                    db.end_session(interaction.user.id, interaction.channel.id)
+                    await asyncio.to_thread(db.end_session, interaction.user.id, interaction.channel.id)
 
                     # Create styled embed for session end
                     embed = discord.Embed(
@@ -567,21 +563,24 @@ class Tutor(commands.Cog):
                     await interaction.channel.send(embed=embed)                   
 
                     # Only remove the entire session if no other users are active
-                    if len(session.get_active_users()) == 0:
+                    if len(session.get_active_user_ids()) == 0:
                         session_manager.end_session(interaction.channel.id)
 
                 else:
-                    await interaction.response.send_message(
+                    await interactions.respond(
+                        interaction,
                         "❌ You don't have an active session in this thread.", 
                         ephemeral=True
                     )
             else:
-                await interaction.response.send_message(
+                await interactions.respond(
+                    interaction,
                     "❌ No active session found in this thread.", 
                     ephemeral=True
                 )
         else:
-            await interaction.response.send_message(
+            await interactions.respond(
+                interaction,
                 "❌ This command must be used in a tutoring thread.", 
                 ephemeral=True
             )
@@ -589,28 +588,26 @@ class Tutor(commands.Cog):
     @commands.Cog.listener()
     async def on_message(self, message):
         """Listen for messages in tutoring threads and respond automatically."""
+        # Fast path: only threads with an active tutoring session are answered.
+        # Until the startup rehydration has finished the set may still be missing
+        # some, so wait for it before rejecting a message.
+        if message.channel.id not in session_manager.tutoring_thread_ids:
+            if self.rehydrate_task is None or self.rehydrate_task.done():
+                return
+            await self.rehydrate_task
+            if message.channel.id not in session_manager.tutoring_thread_ids:
+                return
+
         # Ignore bot messages
         if message.author.bot:
             return
 
-        # Check if message is in a tutoring thread
-        if not (isinstance(message.channel, discord.Thread) and message.channel.name.startswith("Schrödy-")):
-            return
+        if tracing.recorder:
+            tracing.recorder.record_message(message)
 
         # Update last activity time for any active session in this thread and reset warning flags
         user_id = str(message.author.id)
-        db.sessions_collection.update_one(
-            {"user_id": user_id, "active": True},
-            {"$set": {
-                "last_activity": datetime.datetime.utcnow(),
-                "dm_warning_sent": False,
-                "thread_reminder_sent": False
-            }}
-        )
-
-        # Show thinking indicator with user identification
-        user_display_name = self.get_user_display_name(message.author, message.guild)
-        thinking_message = await message.channel.send(f"🤔 Schrödy is thinking... (responding to {user_display_name})")
+        await asyncio.to_thread(db.update_session_activity, user_id)
 
         try:
             # Get or create session using sessions.py system
@@ -622,13 +619,10 @@ class Tutor(commands.Cog):
             # Add user to session if not already added
             session.add_user(message.author)
 
-            # Let the session system handle the message
-            await session.process_message(message)
-
-            # Delete the thinking message
-            await thinking_message.delete()
+            # Let the session system handle the message, showing typing meanwhile
+            async with messaging.responding(message.channel, "on_message"):
+                await session.process_message(message)
         except Exception as e:
-            await thinking_message.delete()
             print(f"Error in on_message: {e}")
 
     @tasks.loop(minutes=5)
@@ -638,82 +632,108 @@ class Tutor(commands.Cog):
             # Clean up inactive sessions across all session managers
             session_manager.cleanup_inactive_sessions()
 
-            # Your existing database cleanup logic here
-            now = datetime.datetime.utcnow()
-            for session in db.sessions_collection.find({"active": True}):
-                try:
-                    time_since_activity = now - session.get("last_activity", session["start_time"])
-                    user_id = session["user_id"]
+            # One aggregation sorts idle sessions into close / warn / remind server-side
+            due = await asyncio.to_thread(db.classify_inactive_sessions)
 
-                    # 30 minutes - close session
-                    if time_since_activity >= datetime.timedelta(minutes=30):
-                        db.end_session(user_id)
-                        try:
-                            user = await self.bot.fetch_user(int(user_id))
-                            await user.send("⏳ Your tutoring session has ended due to inactivity. Please provide feedback with `/feedback <1-5>`.")
-                        except (discord.NotFound, discord.Forbidden):
-                            pass
-
-                    # 15 minutes - send DM warning (only if not already sent)
-                    elif time_since_activity >= datetime.timedelta(minutes=15) and not session.get("dm_warning_sent", False):
-                        try:
-                            user = await self.bot.fetch_user(int(user_id))
-                            embed = discord.Embed(
-                                title="⚠️ Inactivity Warning",
-                                description="Your tutoring session will close in 15 minutes due to inactivity.",
-                                color=discord.Color.orange()
-                            )
-                            embed.add_field(
-                                name="💡 Keep your session active:",
-                                value="Send a message in your session thread to continue learning!",
-                                inline=False
-                            )
-                            await user.send(embed=embed)
-                            db.sessions_collection.update_one(
-                                {"user_id": user_id, "active": True},
-                                {"$set": {"dm_warning_sent": True}}
-                            )
-                        except (discord.NotFound, discord.Forbidden):
-                            pass
-
-                    # 5 minutes - send thread reminder (only if not already sent)
-                    elif time_since_activity >= datetime.timedelta(minutes=5) and not session.get("thread_reminder_sent", False):
-                        # Find the thread through session manager
-                        for thread_id, tutoring_session in session_manager.sessions.items():
-                            user_session = tutoring_session.get_user_session(int(user_id))
-                            if user_session:
-                                try:
-                                    embed = discord.Embed(
-                                        title="💤 Are you still there?",
-                                        description=f"<@{user_id}>, you've been inactive for 5 minutes.",
-                                        color=discord.Color.yellow()
-                                    )
-                                    embed.add_field(
-                                        name="⏰ Session will close in:",
-                                        value="25 minutes if no activity is detected",
-                                        inline=False
-                                    )
-                                    embed.add_field(
-                                        name="💬 To continue:",
-                                        value="Just send any message or question to keep your session active!",
-                                        inline=False
-                                    )
-                                    await tutoring_session.thread.send(embed=embed)
-                                    db.sessions_collection.update_one(
-                                        {"user_id": user_id, "active": True},
-                                        {"$set": {"thread_reminder_sent": True}}
-                                    )
-                                    break
-                                except discord.NotFound:
-                                    pass
+            # 30 minutes - close sessions, targeted by _id; only those still idle are closed
+            closed = await asyncio.to_thread(db.close_sessions, due["expired"])
+            for session in closed:
+                try:
+                    user = await self.resolve_user(session["user_id"])
+                    await user.send("⏳ Your tutoring session has ended due to inactivity. Please provide feedback with `/feedback <1-5>`.")
+                except (discord.NotFound, discord.Forbidden):
+                    pass
+                except Exception as e:
+                    print(f"Error closing session for user {session.get('user_id', 'unknown')}: {e}")
 
+            # 15 minutes - send DM warning (only if not already sent)
+            warned = []
+            for session in due["warn"]:
+                try:
+                    user = await self.resolve_user(session["user_id"])
+                    embed = discord.Embed(
+                        title="⚠️ Inactivity Warning",
+                        description="Your tutoring session will close in 15 minutes due to inactivity.",
+                        color=discord.Color.orange()
+                    )
+                    embed.add_field(
+                        name="💡 Keep your session active:",
+                        value="Send a message in your session thread to continue learning!",
+                        inline=False
+                    )
+                    await user.send(embed=embed)
+                    warned.append(session["_id"])
+                except (discord.NotFound, discord.Forbidden):
+                    pass
                 except Exception as e:
-                    print(f"Error processing session for user {session.get('user_id', 'unknown')}: {e}")
+                    print(f"Error warning user {session.get('user_id', 'unknown')}: {e}")
+
+            # 5 minutes - send thread reminder (only if not already sent)
+            reminded = []
+            for session in due["remind"]:
+                user_id = session["user_id"]
+                # Remind in the session's own thread, if it is loaded and the user is in it
+                try:
+                    tutoring_session = session_manager.sessions.get(int(session["thread_id"]))
+                except (KeyError, TypeError, ValueError):
                     continue
+                if not tutoring_session or not tutoring_session.get_user_session(int(user_id)):
+                    continue
+                try:
+                    embed = discord.Embed(
+                        title="💤 Are you still there?",
+                        description=f"<@{user_id}>, you've been inactive for 5 minutes.",
+                        color=discord.Color.yellow()
+                    )
+                    embed.add_field(
+                        name="⏰ Session will close in:",
+                        value="25 minutes if no activity is detected",
+                        inline=False
+                    )
+                    embed.add_field(
+                        name="💬 To continue:",
+                        value="Just send any message or question to keep your session active!",
+                        inline=False
+                    )
+                    await tutoring_session.thread.send(embed=embed)
+                    reminded.append(session["_id"])
+                except discord.NotFound:
+                    pass
+                except Exception as e:
+                    print(f"Error reminding user {user_id}: {e}")
+
+            await asyncio.to_thread(db.mark_sessions, warned, "dm_warning_sent")
+            await asyncio.to_thread(db.mark_sessions, reminded, "thread_reminder_sent")
 
         except Exception as e:
             print(f"Error in check_inactive_sessions: {e}")
 
+    async def resolve_user(self, user_id):
+        """Resolve a user from the client cache, falling back to the API."""
+        return self.bot.get_user(int(user_id)) or await self.bot.fetch_user(int(user_id))
+
+    @tasks.loop(seconds=30)
+    async def flush_guest_participation(self):
+        """Persist newly asked guests in one batch and drop expired entries."""
+        try:
+            self.guest_participation_asked.purge_expired()
+            await asyncio.to_thread(self.guest_participation_asked.flush)
+        except Exception as e:
+            print(f"Error in flush_guest_participation: {e}")
+
+    @tasks.loop(seconds=outbox.OUTBOX_POLL_SECONDS)
+    async def deliver_outbox(self):
+        """Retry replies whose first send failed, including ones left over from before a restart."""
+        try:
+            await outbox.reply_outbox.deliver_due(session_manager.resolve_channel)
+        except Exception as e:
+            print(f"Error delivering outbox replies: {e}")
+
+    @deliver_outbox.before_loop
+    async def before_deliver_outbox(self):
+        """Channels can only be resolved once the bot is connected."""
+        await self.bot.wait_until_ready()
+
     @check_inactive_sessions.before_loop
     async def before_check_inactive_sessions(self):
         """Wait until the bot is ready before starting the task."""
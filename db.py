@@ -1,7 +1,12 @@
 import os
+import time
 import datetime
-from pymongo import MongoClient
+import threading
+from bson import ObjectId
+from pymongo import MongoClient, ASCENDING, DESCENDING
 from dotenv import load_dotenv
+from db_monitor import command_monitor, pool_monitor
+from cache import TTLCache
 
 # Load environment variables
 load_dotenv()
@@ -15,28 +20,129 @@ mongo_db_name = os.getenv("MONGO_DB")
 if mongo_db_name is None:
     raise ValueError("MONGO_DB environment variable not set.")
 
-mongo_client = MongoClient(mongo_url)
-db = mongo_client[mongo_db_name]
-conversations = db.conversations
+def _env_int(name, default):
+    """Read an integer setting from the environment."""
+    value = os.getenv(name)
+    return int(value) if value else default
+
+# Connection pool and timeout settings. The timeouts are deliberately much
+# shorter than pymongo's 30s defaults so a Mongo hiccup fails fast instead of
+# hanging message handlers.
+MONGO_CLIENT_OPTIONS = {
+    "maxPoolSize": _env_int("MONGO_MAX_POOL_SIZE", 50),
+    "minPoolSize": _env_int("MONGO_MIN_POOL_SIZE", 0),
+    "serverSelectionTimeoutMS": _env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000),
+    "connectTimeoutMS": _env_int("MONGO_CONNECT_TIMEOUT_MS", 5000),
+    "socketTimeoutMS": _env_int("MONGO_SOCKET_TIMEOUT_MS", 10000),
+    "waitQueueTimeoutMS": _env_int("MONGO_WAIT_QUEUE_TIMEOUT_MS", 2000),
+}
+
+# The client is created on first use rather than at import time, so importing
+# this module never blocks on DNS/SRV resolution.
+_mongo_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Return the shared MongoClient, creating it on first use."""
+    global _mongo_client
+    if _mongo_client is None:
+        with _client_lock:
+            if _mongo_client is None:
+                _mongo_client = MongoClient(
+                    mongo_url,
+                    event_listeners=[command_monitor, pool_monitor],
+                    **MONGO_CLIENT_OPTIONS
+                )
+    return _mongo_client
+
+def get_database():
+    """Return the bot's database."""
+    return get_client()[mongo_db_name]
+
+def __getattr__(name):
+    # Keep `db.mongo_client` and `db.db` working for callers that predate lazy init
+    if name == "mongo_client":
+        return get_client()
+    if name == "db":
+        return get_database()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class LazyCollection:
+    """Collection proxy that resolves the real collection on first attribute access."""
+
+    def __init__(self, name):
+        self._name = name
+        self._collection = None
+
+    def __getattr__(self, attr):
+        if self._collection is None:
+            self._collection = get_database()[self._name]
+        return getattr(self._collection, attr)
+
+    def __repr__(self):
+        return f"LazyCollection({self._name!r})"
+
+def prewarm():
+    """Create the client and open a connection ahead of the first real query."""
+    ping()
 
 # Collections
-users_collection = db["users"]
-messages_collection = db["messages"]
-sessions_collection = db["sessions"]
-feedback_collection = db["feedback"]
+conversations = LazyCollection("conversations")  # legacy one-document-per-turn store, see migrate_conversations.py
+conversation_buckets = LazyCollection("conversation_buckets")
+users_collection = LazyCollection("users")
+messages_collection = LazyCollection("messages")
+sessions_collection = LazyCollection("sessions")
+feedback_collection = LazyCollection("feedback")
+bot_meta_collection = LazyCollection("bot_meta")
+guest_participation_collection = LazyCollection("guest_participation")
+reply_outbox_collection = LazyCollection("reply_outbox")
+
+# How long a guest stays "already asked" before the participation prompt is shown again
+GUEST_PROMPT_TTL_DAYS = _env_int("GUEST_PROMPT_TTL_DAYS", 30)
+
+# How long delivered or abandoned replies stay in the outbox for inspection
+OUTBOX_RETENTION_HOURS = _env_int("OUTBOX_RETENTION_HOURS", 72)
+
+# Per-user cache of the active session (or of its absence), kept in sync by the
+# session write functions below. Only fields that never change while a session
+# is active are cached; the TTL bounds staleness from writes made elsewhere.
+ACTIVE_SESSION_FIELDS = {"_id": 1, "user_id": 1, "username": 1, "thread_id": 1, "guild_id": 1, "start_time": 1}
+active_session_cache = TTLCache(
+    maxsize=_env_int("ACTIVE_SESSION_CACHE_SIZE", 10_000),
+    ttl=_env_int("ACTIVE_SESSION_CACHE_TTL", 300),
+)
+_NOT_CACHED = object()
+
+# Conversation turns are appended to per-user bucket documents of at most
+# CONVERSATION_BUCKET_SIZE turns; users.latest_bucket points at the newest one.
+# The pointer is cached per user so a write is usually a single update.
+CONVERSATION_BUCKET_SIZE = _env_int("CONVERSATION_BUCKET_SIZE", 50)
+# Rounds append_turns tries before giving up when other writers keep starting buckets
+APPEND_TURNS_ATTEMPTS = 5
+latest_bucket_cache = TTLCache(
+    maxsize=_env_int("LATEST_BUCKET_CACHE_SIZE", 10_000),
+    ttl=_env_int("LATEST_BUCKET_CACHE_TTL", 3600),
+)
+
+# Inactivity after which a session gets the thread reminder, the DM warning, and is closed
+SESSION_REMINDER_AFTER = datetime.timedelta(minutes=5)
+SESSION_WARNING_AFTER = datetime.timedelta(minutes=15)
+SESSION_CLOSE_AFTER = datetime.timedelta(minutes=30)
 
 def add_user(discord_id, username):
     """Add a user to the database if they don't exist."""
-    user = users_collection.find_one({"discord_id": str(discord_id)})
-    if not user:
-        users_collection.insert_one({"discord_id": str(discord_id), "username": username})
+    user = users_collection.find_one({"discord_id": str(discord_id)}, {"username": 1})
+    if not user or "username" not in user:
+        # Users first stored by their conversation bucket pointer have no username yet
+        users_collection.update_one({"discord_id": str(discord_id)}, {"$set": {"username": username}}, upsert=True)
         print(f"✅ User {username} added to database.")
 
 def log_message(user_id, message):
     """Log user messages for future tutoring assistance."""
     messages_collection.insert_one({
         "user_id": str(user_id),
-        "message": message
+        "message": message,
+        "timestamp": datetime.datetime.utcnow()
     })
     print(f"💾 Logged message from user {user_id}")
 
@@ -44,7 +150,77 @@ def get_messages(user_id, limit=10):
     """Retrieve the last N messages from a user."""
     return list(messages_collection.find({"user_id": str(user_id)}).sort("_id", -1).limit(limit))
 
-def start_session(user_id, username, thread_id=None):
+def _ensure_ttl_index(collection, field, seconds, name=None):
+    """Create a TTL index on field, or change its expiry in place if the configured TTL changed.
+
+    create_index refuses to change expireAfterSeconds on an existing index
+    (IndexOptionsConflict), so a changed TTL goes through collMod instead.
+    Returns True if the index was created or changed.
+    """
+    name = name or f"{field}_1"
+    existing = collection.index_information().get(name)
+    if existing is None:
+        collection.create_index([(field, ASCENDING)], name=name, expireAfterSeconds=seconds)
+    elif existing.get("expireAfterSeconds") != seconds:
+        get_database().command("collMod", collection.name, index={"name": name, "expireAfterSeconds": seconds})
+    else:
+        return False
+    return True
+
+def ensure_indexes():
+    """Create the indexes the feedback pipelines and hot read paths rely on (idempotent).
+
+    Every index is attempted even if an earlier one fails; returns the
+    descriptions of the ones that could not be created.
+    """
+    indexes = [
+        # Only ended sessions still waiting for feedback are indexed, so the
+        # pending-feedback pipeline never touches the bulk of the collection.
+        (sessions_collection, [("user_id", ASCENDING), ("end_time", DESCENDING)],
+         {"name": "pending_feedback", "partialFilterExpression": {"active": False, "feedback_given": False}}),
+        (sessions_collection, [("user_id", ASCENDING), ("active", ASCENDING)], {}),
+        # Small index over active sessions only; backs the /db_status active count.
+        (sessions_collection, [("active", ASCENDING)],
+         {"name": "active_sessions", "partialFilterExpression": {"active": True}}),
+        # Lets the inactivity sweep read only the idle part of the active sessions.
+        (sessions_collection, [("last_activity", ASCENDING)],
+         {"name": "active_by_last_activity", "partialFilterExpression": {"active": True}}),
+        (feedback_collection, [("timestamp", ASCENDING)], {}),
+        (feedback_collection, [("guild_id", ASCENDING), ("timestamp", ASCENDING)], {}),
+        (feedback_collection, [("session_id", ASCENDING)], {}),
+        # Backs walking a user's conversation buckets newest first; the legacy
+        # index is what migrate_conversations.py reads through.
+        (conversation_buckets, [("user_id", ASCENDING), ("_id", DESCENDING)], {}),
+        (conversations, [("user_id", ASCENDING), ("_id", DESCENDING)], {}),
+        # Latest-bucket pointer lookups
+        (users_collection, [("discord_id", ASCENDING)], {}),
+        # The outbox sender and its depth metrics only look at pending replies
+        (reply_outbox_collection, [("next_attempt", ASCENDING)],
+         {"name": "pending_replies", "partialFilterExpression": {"status": "pending"}}),
+    ]
+    # (collection, field, seconds) for indexes that expire documents
+    ttl_indexes = [
+        (guest_participation_collection, "asked_at", GUEST_PROMPT_TTL_DAYS * 86400),
+        # Delivered or abandoned replies
+        (reply_outbox_collection, "finished_at", OUTBOX_RETENTION_HOURS * 3600),
+    ]
+
+    failed = []
+    for collection, keys, options in indexes:
+        try:
+            collection.create_index(keys, **options)
+        except Exception as e:
+            failed.append(f"{collection.name} {options.get('name', keys)}")
+            print(f"Error creating index {options.get('name', keys)} on {collection.name}: {e}")
+    for collection, field, seconds in ttl_indexes:
+        try:
+            _ensure_ttl_index(collection, field, seconds)
+        except Exception as e:
+            failed.append(f"{collection.name} {field} TTL")
+            print(f"Error ensuring TTL index on {collection.name}.{field}: {e}")
+    return failed
+
+def start_session(user_id, username, thread_id=None, guild_id=None):
     """Starts a new tutoring session for a user."""
     now = datetime.datetime.utcnow()
     session_data = {
@@ -56,9 +232,11 @@ def start_session(user_id, username, thread_id=None):
         "thread_reminder_sent": False,
         "dm_warning_sent": False,
         "thread_id": str(thread_id) if thread_id else None,
+        "guild_id": str(guild_id) if guild_id else None,
         "feedback_given": False,
     }
     sessions_collection.insert_one(session_data)
+    active_session_cache.set(str(user_id), {field: session_data.get(field) for field in ACTIVE_SESSION_FIELDS})
     print(f"✅ Started session for {username} (ID: {user_id}) in thread {thread_id}")
 
 def end_session(user_id, thread_id=None):
@@ -73,54 +251,414 @@ def end_session(user_id, thread_id=None):
             {"user_id": str(user_id), "active": True}, 
             {"$set": {"active": False, "end_time": datetime.datetime.utcnow()}}
         )
+    active_session_cache.pop(str(user_id))
+
+def classify_inactive_sessions(now=None):
+    """Bucket idle active sessions by inactivity in one aggregation.
+
+    Returns {"expired": [...], "warn": [...], "remind": [...]} where expired
+    sessions are due to be closed, warn sessions are due the DM warning and
+    remind sessions the in-thread reminder. Each entry only carries _id,
+    user_id and thread_id.
+    """
+    now = now or datetime.datetime.utcnow()
+    close_cutoff = now - SESSION_CLOSE_AFTER
+    warn_cutoff = now - SESSION_WARNING_AFTER
+    remind_cutoff = now - SESSION_REMINDER_AFTER
+    ref = {"user_id": 1, "thread_id": 1}
+    pipeline = [
+        {"$match": {
+            "active": True,
+            "$or": [
+                {"last_activity": {"$lte": remind_cutoff}},
+                {"last_activity": {"$exists": False}, "start_time": {"$lte": remind_cutoff}},
+            ],
+        }},
+        {"$project": {
+            **ref,
+            "dm_warning_sent": 1,
+            "thread_reminder_sent": 1,
+            "idle_since": {"$ifNull": ["$last_activity", "$start_time"]},
+        }},
+        {"$facet": {
+            "expired": [
+                {"$match": {"idle_since": {"$lte": close_cutoff}}},
+                {"$project": ref},
+            ],
+            "warn": [
+                {"$match": {"idle_since": {"$gt": close_cutoff, "$lte": warn_cutoff},
+                            "dm_warning_sent": {"$ne": True}}},
+                {"$project": ref},
+            ],
+            "remind": [
+                # As before, sessions already warned still get a missed reminder
+                {"$match": {"idle_since": {"$gt": close_cutoff, "$lte": remind_cutoff},
+                            "thread_reminder_sent": {"$ne": True},
+                            "$or": [{"idle_since": {"$gt": warn_cutoff}}, {"dm_warning_sent": True}]}},
+                {"$project": ref},
+            ],
+        }},
+    ]
+    result = next(sessions_collection.aggregate(pipeline), None)
+    return result or {"expired": [], "warn": [], "remind": []}
+
+def close_sessions(sessions):
+    """End the given sessions (documents with _id and user_id) with a single update.
+
+    Sessions that saw activity since they were classified are left open.
+    Returns the sessions that were closed.
+    """
+    if not sessions:
+        return []
+    now = datetime.datetime.utcnow()
+    close_cutoff = now - SESSION_CLOSE_AFTER
+    ids = [session["_id"] for session in sessions]
+    sessions_collection.update_many(
+        {
+            "_id": {"$in": ids},
+            "active": True,
+            "$or": [
+                {"last_activity": {"$lte": close_cutoff}},
+                {"last_activity": {"$exists": False}, "start_time": {"$lte": close_cutoff}},
+            ],
+        },
+        {"$set": {"active": False, "end_time": now}}
+    )
+    for session in sessions:
+        active_session_cache.pop(str(session["user_id"]))
+    # end_time is shared by everything this update closed
+    return list(sessions_collection.find({"_id": {"$in": ids}, "end_time": now}, {"user_id": 1, "thread_id": 1}))
+
+def mark_sessions(session_ids, flag):
+    """Set a reminder flag (dm_warning_sent / thread_reminder_sent) on the given sessions."""
+    if not session_ids:
+        return 0
+    return sessions_collection.update_many(
+        {"_id": {"$in": list(session_ids)}},
+        {"$set": {flag: True}}
+    ).modified_count
+
+def reactivate_session(user_id, session_id):
+    """Reopen an ended session, e.g. from /resume_session."""
+    sessions_collection.update_one(
+        {"user_id": str(user_id), "_id": session_id},
+        {
+            "$set": {
+                "active": True,
+                "last_activity": datetime.datetime.utcnow(),
+                "dm_warning_sent": False,
+                "thread_reminder_sent": False
+            },
+            # A reopened session must not be picked up by the ended-session TTL
+            "$unset": {"end_time": ""}
+        }
+    )
+    active_session_cache.pop(str(user_id))
+
 def get_active_session(user_id, thread_id=None):
-    """Get active session for a user, optionally filtered by thread."""
-    query = {"user_id": str(user_id), "active": True}
-    if thread_id:
-        query["thread_id"] = str(thread_id)
-    return sessions_collection.find_one(query)
+    """Get active session for a user, optionally filtered by thread.
+
+    Served from active_session_cache when possible, so the returned document
+    only carries ACTIVE_SESSION_FIELDS.
+    """
+    key = str(user_id)
+    session = active_session_cache.get(key, _NOT_CACHED)
+    if session is _NOT_CACHED:
+        session = sessions_collection.find_one({"user_id": key, "active": True}, ACTIVE_SESSION_FIELDS)
+        active_session_cache.set(key, session)
+    if session and thread_id and session.get("thread_id") != str(thread_id):
+        # Rare: the user has another active session in a different thread
+        return sessions_collection.find_one(
+            {"user_id": key, "thread_id": str(thread_id), "active": True}, ACTIVE_SESSION_FIELDS
+        )
+    return dict(session) if session else None
+
+def get_active_thread_ids():
+    """Get the thread IDs of all active sessions."""
+    return [thread_id for thread_id in sessions_collection.distinct("thread_id", {"active": True}) if thread_id]
 
 def get_session_by_thread(thread_id):
     """Get all active sessions in a specific thread."""
     return list(sessions_collection.find({"thread_id": str(thread_id), "active": True}))
 
 def update_session_activity(user_id, thread_id=None):
-    """Update the last activity time for a session."""
+    """Update the last activity time for a session and reset its inactivity reminders.
+
+    Skips the write entirely when the cache knows the user has no active session.
+    """
+    if get_active_session(user_id) is None:
+        return
     query = {"user_id": str(user_id), "active": True}
     if thread_id:
         query["thread_id"] = str(thread_id)
     
     sessions_collection.update_one(
         query,
-        {"$set": {"last_activity": datetime.datetime.utcnow()}}
+        {"$set": {
+            "last_activity": datetime.datetime.utcnow(),
+            "dm_warning_sent": False,
+            "thread_reminder_sent": False
+        }}
     )
 
-def log_feedback(user_id, rating):
-    """Store feedback rating."""
+def log_feedback(user_id, rating, guild_id=None):
+    """Store feedback rating, linked to the user's most recent ended session awaiting feedback.
+
+    Returns the linked session document, or None if there was nothing pending.
+    """
+    session = sessions_collection.find_one_and_update(
+        {"user_id": str(user_id), "active": False, "feedback_given": False},
+        {"$set": {"feedback_given": True}},
+        sort=[("end_time", DESCENDING)],
+        projection={"_id": 1, "guild_id": 1, "thread_id": 1},
+    )
+    if session and session.get("guild_id"):
+        guild_id = session["guild_id"]
     feedback_collection.insert_one({
         "user_id": str(user_id),
         "rating": rating,
+        "session_id": session["_id"] if session else None,
+        "thread_id": session.get("thread_id") if session else None,
+        "guild_id": str(guild_id) if guild_id else None,
         "timestamp": datetime.datetime.utcnow()
     })
-    sessions_collection.update_one({"user_id": str(user_id)}, {"$set": {"feedback_given": True}})
+    return session
+
+def get_pending_feedback(page=0, page_size=20):
+    """Get one page of users who haven't submitted feedback, deduplicated per user.
+
+    Returns a dict with the total number of pending users and the requested page,
+    newest session end first. Each entry has user_id, username, pending_sessions
+    and last_end.
+    """
+    pipeline = [
+        {"$match": {"active": False, "feedback_given": False}},
+        {"$sort": {"user_id": 1, "end_time": -1}},
+        {"$group": {
+            "_id": "$user_id",
+            "username": {"$first": "$username"},
+            "pending_sessions": {"$sum": 1},
+            "last_end": {"$first": "$end_time"},
+        }},
+        {"$sort": {"last_end": -1, "_id": 1}},
+        {"$facet": {
+            "total": [{"$count": "count"}],
+            "users": [
+                {"$skip": page * page_size},
+                {"$limit": page_size},
+                {"$project": {
+                    "_id": 0,
+                    "user_id": "$_id",
+                    "username": 1,
+                    "pending_sessions": 1,
+                    "last_end": 1,
+                }},
+            ],
+        }},
+    ]
+    result = next(sessions_collection.aggregate(pipeline, allowDiskUse=True), None) or {}
+    total = result.get("total") or [{"count": 0}]
+    return {"total": total[0]["count"], "users": result.get("users", [])}
+
+def iter_pending_feedback_sessions():
+    """Iterate ended sessions without feedback, with only the fields reminders need."""
+    return sessions_collection.find(
+        {"active": False, "feedback_given": False},
+        {"user_id": 1, "username": 1, "reminder_sent": 1},
+    )
 
-def get_pending_feedback():
-    """Get list of users who haven't submitted feedback."""
-    return sessions_collection.find({"active": False, "feedback_given": False})
+def get_feedback_stats(group_by="day", days=30, guild_id=None):
+    """Average rating per day or per guild over the last N days, computed server-side."""
+    match = {"timestamp": {"$gte": datetime.datetime.utcnow() - datetime.timedelta(days=days)}}
+    if guild_id:
+        match["guild_id"] = str(guild_id)
+
+    if group_by == "guild":
+        key = "$guild_id"
+    elif group_by == "day":
+        key = {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}}
+    else:
+        raise ValueError(f"Unsupported group_by: {group_by}")
+
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": key, "average": {"$avg": "$rating"}, "count": {"$sum": 1}}},
+        {"$sort": {"_id": 1}},
+    ]
+    return [
+        {"key": row["_id"], "average": row["average"], "count": row["count"]}
+        for row in feedback_collection.aggregate(pipeline)
+    ]
+
+def get_bot_meta(key):
+    """Get a bot-wide metadata value (e.g. the last synced command tree hash)."""
+    doc = bot_meta_collection.find_one({"_id": key})
+    return doc.get("value") if doc else None
+
+def set_bot_meta(key, value):
+    """Store a bot-wide metadata value."""
+    bot_meta_collection.update_one(
+        {"_id": key},
+        {"$set": {"value": value, "updated_at": datetime.datetime.utcnow()}},
+        upsert=True
+    )
+
+def ping():
+    """Ping the server and return the round-trip latency in milliseconds."""
+    start = time.perf_counter()
+    get_client().admin.command("ping")
+    return (time.perf_counter() - start) * 1000
+
+def get_pool_usage():
+    """Connection pool usage: open and in-use connections, and the configured maximum."""
+    usage = pool_monitor.snapshot()
+    usage["max"] = get_client().options.pool_options.max_pool_size
+    return usage
+
+def get_health():
+    """Ping the server and summarize rolling command latency and pool-wait statistics."""
+    try:
+        ping_ms = ping()
+        error = None
+    except Exception as e:
+        ping_ms = None
+        error = str(e)
+    return {
+        "ok": error is None,
+        "error": error,
+        "ping_ms": ping_ms,
+        "commands": command_monitor.latency_ms.summary(),
+        "command_error_rate": command_monitor.outcomes.error_rate(),
+        "pool_wait": pool_monitor.wait_ms.summary(),
+        "pool": get_pool_usage(),
+    }
+
+def count_active_sessions():
+    """Count active sessions using the partial active-session index."""
+    try:
+        return sessions_collection.count_documents({"active": True}, hint="active_sessions")
+    except Exception:
+        # Index not built yet; fall back to an unhinted count.
+        return sessions_collection.count_documents({"active": True})
+
+def get_collection_stats():
+    """Cheap collection statistics from metadata counts, without scanning documents."""
+    return {
+        "users": users_collection.estimated_document_count(),
+        "messages": messages_collection.estimated_document_count(),
+        "sessions": sessions_collection.estimated_document_count(),
+        "active_sessions": count_active_sessions(),
+        "feedback": feedback_collection.estimated_document_count(),
+        "conversation_buckets": conversation_buckets.estimated_document_count(),
+    }
+
+def _turn(role, message, timestamp):
+    return {"_id": ObjectId(), "role": role, "message": message, "timestamp": timestamp}
+
+def _read_latest_bucket_id(user_id):
+    user = users_collection.find_one({"discord_id": user_id}, {"_id": 0, "latest_bucket": 1})
+    return user.get("latest_bucket") if user else None
+
+def _latest_bucket_id(user_id):
+    """The user's newest conversation bucket _id, or None if they have none."""
+    bucket_id = latest_bucket_cache.get(user_id, _NOT_CACHED)
+    if bucket_id is _NOT_CACHED:
+        bucket_id = _read_latest_bucket_id(user_id)
+        latest_bucket_cache.set(user_id, bucket_id)
+    return bucket_id
+
+def _move_latest_bucket(user_id, previous, bucket_id):
+    """Point the user at bucket_id if their pointer is still `previous`; False if another writer moved it first."""
+    if previous is None:
+        users_collection.update_one({"discord_id": user_id}, {"$setOnInsert": {"discord_id": user_id}}, upsert=True)
+    # {"latest_bucket": None} also matches a user without a pointer
+    result = users_collection.update_one(
+        {"discord_id": user_id, "latest_bucket": previous},
+        {"$set": {"latest_bucket": bucket_id}}
+    )
+    return result.modified_count == 1
+
+def append_turns(user_id, turns):
+    """Append turns to the user's latest bucket, starting a new bucket when it is full.
+
+    Concurrent writers can both find the bucket full. Each inserts a bucket,
+    but only one moves the pointer, conditioned on its previous value; the
+    other deletes its bucket and appends to the winner's instead.
+    """
+    user_id = str(user_id)
+    end = turns[-1]["timestamp"]
+    bucket_id = _latest_bucket_id(user_id)
+    for _ in range(APPEND_TURNS_ATTEMPTS):
+        if bucket_id is not None:
+            result = conversation_buckets.update_one(
+                {"_id": bucket_id, "count": {"$lte": CONVERSATION_BUCKET_SIZE - len(turns)}},
+                {"$push": {"turns": {"$each": turns}}, "$inc": {"count": len(turns)}, "$set": {"end": end}}
+            )
+            if result.matched_count:
+                return
+        new_bucket_id = conversation_buckets.insert_one({
+            "user_id": user_id,
+            "count": len(turns),
+            "start": turns[0]["timestamp"],
+            "end": end,
+            "turns": turns,
+        }).inserted_id
+        if _move_latest_bucket(user_id, bucket_id, new_bucket_id):
+            latest_bucket_cache.set(user_id, new_bucket_id)
+            return
+        conversation_buckets.delete_one({"_id": new_bucket_id})
+        bucket_id = _read_latest_bucket_id(user_id)
+        latest_bucket_cache.set(user_id, bucket_id)
+    raise RuntimeError(f"Could not append conversation turns for user {user_id}: latest bucket kept moving")
+
+def get_recent_turns(user_id, limit):
+    """The user's last `limit` turns, oldest first.
+
+    Usually a single read of the latest bucket; older buckets are only read
+    when it holds fewer than `limit` turns.
+    """
+    user_id = str(user_id)
+    bucket_id = _latest_bucket_id(user_id)
+    if bucket_id is None or limit <= 0:
+        return []
+    latest = conversation_buckets.find_one({"_id": bucket_id}, {"turns": {"$slice": -limit}})
+    turns = latest["turns"] if latest else []
+    if len(turns) < limit:
+        older = conversation_buckets.find(
+            {"user_id": user_id, "_id": {"$lt": bucket_id}}, {"turns": 1}
+        ).sort("_id", -1)
+        for bucket in older:
+            turns = bucket["turns"][-(limit - len(turns)):] + turns
+            if len(turns) >= limit:
+                break
+    return turns
 
 def add_message(user_id, message, role="user"):
     """Save a user or AI message to the conversation memory."""
-    conversations.insert_one({
-        "user_id": user_id,
-        "message": message,
-        "role": role
-    })
+    append_turns(user_id, [_turn(role, message, datetime.datetime.utcnow())])
 
 def get_conversation(user_id, limit=10):
     """Retrieve recent messages for context."""
-    msgs = list(conversations.find({"user_id": user_id}).sort("_id", -1).limit(limit))
-    return [{"role": msg["role"], "message": msg["message"]} for msg in reversed(msgs)]
+    return [{"role": turn["role"], "message": turn["message"]} for turn in get_recent_turns(user_id, limit)]
+
+def add_exchange(user_id, question, answer):
+    """Save a question and its answer to the conversation memory in one write."""
+    now = datetime.datetime.utcnow()
+    append_turns(user_id, [_turn("user", question, now), _turn("assistant", answer, now)])
+
+def get_conversation_exchanges(user_id, limit=2000):
+    """Return up to `limit` of the user's most recent (question, answer) pairs, oldest first."""
+    turns = get_recent_turns(user_id, limit * 2)
+    exchanges = []
+    for question, answer in zip(turns, turns[1:]):
+        if question["role"] == "user" and answer["role"] != "user":
+            exchanges.append((question["message"], answer["message"]))
+    return exchanges
 
 def clear_conversation(user_id):
     """Clear the conversation memory."""
-    conversations.delete_many({"user_id": user_id})
\ No newline at end of file
+    user_id = str(user_id)
+    conversation_buckets.delete_many({"user_id": user_id})
+    conversations.delete_many({"user_id": user_id})
+    users_collection.update_one({"discord_id": user_id}, {"$unset": {"latest_bucket": ""}})
+    latest_bucket_cache.pop(user_id)
\ No newline at end of file
@@ -0,0 +1,97 @@
+import time
+import threading
+from pymongo import monitoring
+from metrics import RollingWindow, OutcomeWindow
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """Keeps rolling latency and failure statistics for every Mongo command."""
+
+    def __init__(self, window: int = 1000):
+        self.latency_ms = RollingWindow(window)
+        self.outcomes = OutcomeWindow(window)
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.latency_ms.record(event.duration_micros / 1000)
+        self.outcomes.success()
+
+    def failed(self, event):
+        self.latency_ms.record(event.duration_micros / 1000)
+        self.outcomes.failure(f"{event.command_name}: {event.failure}")
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Tracks open and checked-out connections and how long check-outs wait."""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._waits = threading.local()  # check-out start time, per requesting thread
+        self.open_connections = 0
+        self.checked_out = 0
+        self.checkout_failures = 0
+        self.clears = 0
+        self.wait_ms = RollingWindow(window)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections = max(0, self.open_connections - 1)
+
+    def connection_check_out_started(self, event):
+        self._waits.started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        self._record_wait()
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        self._record_wait()
+        with self._lock:
+            self.checked_out += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def _record_wait(self):
+        started = getattr(self._waits, "started", None)
+        if started is not None:
+            self.wait_ms.record((time.perf_counter() - started) * 1000)
+            self._waits.started = None
+
+    def snapshot(self):
+        """Return current pool usage as a dict."""
+        with self._lock:
+            return {
+                "open": self.open_connections,
+                "in_use": self.checked_out,
+                "checkout_failures": self.checkout_failures,
+                "clears": self.clears,
+            }
+
+
+command_monitor = CommandMonitor()
+pool_monitor = PoolMonitor()
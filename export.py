@@ -0,0 +1,239 @@
+"""Streaming export of sessions, conversations and feedback for analytics.
+
+Documents are read through a batched cursor with a projection, in _id
+order, and written out as they arrive, so memory use does not depend on
+collection size. Each run records the last exported _id per collection
+(the watermark) so the next run with --incremental only exports what is
+new. Watermarks follow insertion order: a session that ends after it was
+exported is not exported again.
+
+Conversations are exported one row per turn, unwound from the
+conversation_buckets collection; turns keep their own _id, which is what
+the watermark tracks. Run migrate_conversations.py first if turns are
+still in the legacy conversations collection.
+
+Formats:
+    jsonl    one JSON object per line (add --gzip to compress)
+    csv      one column per exported field
+    parquet  columnar; requires pyarrow, written one row group per batch
+
+Usage:
+    python export.py sessions feedback --format parquet --out exports/
+    python export.py conversations --incremental
+    python export.py sessions --since 2025-01-01
+"""
+import os
+import csv
+import gzip
+import json
+import time
+import argparse
+import datetime
+from typing import Dict, Iterator, List, Optional
+
+from bson import ObjectId
+
+import db
+
+# Fields exported per collection; everything else stays in the database
+EXPORT_FIELDS = {
+    "sessions": ["_id", "user_id", "guild_id", "thread_id", "start_time", "end_time",
+                 "last_activity", "active", "feedback_given"],
+    "conversations": ["_id", "user_id", "role", "message", "timestamp"],
+    "feedback": ["_id", "user_id", "session_id", "guild_id", "thread_id", "rating", "timestamp"],
+}
+
+EXPORT_BATCH_SIZE = 5000
+WATERMARK_FILE = os.getenv("EXPORT_WATERMARK_FILE", "export_watermarks.json")
+
+
+def load_watermarks(path: str = WATERMARK_FILE) -> Dict[str, str]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_watermarks(watermarks: Dict[str, str], path: str = WATERMARK_FILE):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(watermarks, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _plain(value):
+    """Convert BSON types to values JSON, CSV and Parquet writers accept."""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def iter_batches(collection: str, after_id: Optional[ObjectId] = None,
+                 batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[List[Dict]]:
+    """Yield lists of projected documents in _id order, at most batch_size at a time."""
+    fields = EXPORT_FIELDS[collection]
+    if collection == "conversations":
+        cursor = _conversation_turns(after_id, batch_size)
+    else:
+        query = {"_id": {"$gt": after_id}} if after_id else {}
+        cursor = db.get_database()[collection].find(
+            query, {field: 1 for field in fields}, batch_size=batch_size
+        ).sort("_id", 1)
+    batch = []
+    try:
+        for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        cursor.close()
+
+
+def _conversation_turns(after_id: Optional[ObjectId], batch_size: int):
+    """Cursor over conversation bucket turns as flat documents, in turn _id order."""
+    pipeline = []
+    if after_id:
+        # Buckets whose last turn predates the watermark cannot hold newer turns
+        since = after_id.generation_time.replace(tzinfo=None)
+        pipeline.append({"$match": {"end": {"$gte": since}}})
+    pipeline += [
+        {"$unwind": "$turns"},
+        {"$project": {"_id": "$turns._id", "user_id": 1, "role": "$turns.role",
+                      "message": "$turns.message", "timestamp": "$turns.timestamp"}},
+    ]
+    if after_id:
+        pipeline.append({"$match": {"_id": {"$gt": after_id}}})
+    pipeline.append({"$sort": {"_id": 1}})
+    return db.conversation_buckets.aggregate(pipeline, allowDiskUse=True, batchSize=batch_size)
+
+
+class _JsonlWriter:
+    def __init__(self, path, fields, compress):
+        self.fields = fields
+        self._file = gzip.open(path, "wt", encoding="utf-8") if compress else open(path, "w", encoding="utf-8")
+
+    def write_batch(self, docs):
+        for doc in docs:
+            self._file.write(json.dumps({f: _plain(doc.get(f)) for f in self.fields}, ensure_ascii=False))
+            self._file.write("\n")
+
+    def close(self):
+        self._file.close()
+
+
+class _CsvWriter:
+    def __init__(self, path, fields, compress):
+        self.fields = fields
+        self._file = gzip.open(path, "wt", encoding="utf-8", newline="") if compress else open(path, "w", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(fields)
+
+    def write_batch(self, docs):
+        self._writer.writerows([_plain(doc.get(f)) for f in self.fields] for doc in docs)
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path, fields, compress):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit("Parquet export requires pyarrow: pip install pyarrow")
+        self._pa = pyarrow
+        self.fields = fields
+        self._schema = pyarrow.schema([(f, pyarrow.string()) for f in fields])
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema, compression="zstd")
+
+    def write_batch(self, docs):
+        columns = {
+            f: [None if doc.get(f) is None else str(_plain(doc.get(f))) for doc in docs]
+            for f in self.fields
+        }
+        self._writer.write_table(self._pa.Table.from_pydict(columns, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+WRITERS = {"jsonl": _JsonlWriter, "csv": _CsvWriter, "parquet": _ParquetWriter}
+
+
+def export_collection(collection: str, out_dir: str, fmt: str = "jsonl", compress: bool = False,
+                      after_id: Optional[ObjectId] = None, batch_size: int = EXPORT_BATCH_SIZE) -> Dict:
+    """Export one collection to a new file in out_dir; returns counts, throughput and the last _id."""
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    extension = fmt + (".gz" if compress and fmt != "parquet" else "")
+    path = os.path.join(out_dir, f"{collection}-{stamp}.{extension}")
+
+    writer = WRITERS[fmt](path, EXPORT_FIELDS[collection], compress)
+    exported = 0
+    last_id = None
+    started = time.perf_counter()
+    try:
+        for batch in iter_batches(collection, after_id, batch_size):
+            writer.write_batch(batch)
+            exported += len(batch)
+            last_id = batch[-1]["_id"]
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - started
+
+    if not exported:
+        os.remove(path)
+        path = None
+    size = os.path.getsize(path) if path else 0
+    return {
+        "collection": collection,
+        "path": path,
+        "documents": exported,
+        "seconds": elapsed,
+        "docs_per_second": exported / elapsed if elapsed else 0.0,
+        "mb_per_second": size / 2 ** 20 / elapsed if elapsed else 0.0,
+        "last_id": last_id,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export Schrödy data for analytics")
+    parser.add_argument("collections", nargs="+", choices=sorted(EXPORT_FIELDS))
+    parser.add_argument("--format", choices=sorted(WRITERS), default="jsonl")
+    parser.add_argument("--gzip", action="store_true", help="Compress jsonl/csv output")
+    parser.add_argument("--out", default="exports")
+    parser.add_argument("--incremental", action="store_true", help="Only export documents after the stored watermark")
+    parser.add_argument("--since", help="Only export documents created on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    parser.add_argument("--watermarks", default=WATERMARK_FILE)
+    args = parser.parse_args()
+
+    watermarks = load_watermarks(args.watermarks)
+    for collection in args.collections:
+        after_id = None
+        if args.incremental and collection in watermarks:
+            after_id = ObjectId(watermarks[collection])
+        elif args.since:
+            since = datetime.datetime.strptime(args.since, "%Y-%m-%d")
+            # ObjectIds created at `since` sort after this one
+            after_id = ObjectId.from_datetime(since - datetime.timedelta(seconds=1))
+
+        result = export_collection(collection, args.out, args.format, args.gzip, after_id, args.batch_size)
+        if result["last_id"] is not None:
+            watermarks[collection] = str(result["last_id"])
+            save_watermarks(watermarks, args.watermarks)
+
+        print(f"{collection}: {result['documents']:,} documents in {result['seconds']:.1f}s "
+              f"({result['docs_per_second']:,.0f} docs/s, {result['mb_per_second']:.1f} MB/s)"
+              + (f" -> {result['path']}" if result["path"] else ""))
+
+
+if __name__ == "__main__":
+    main()
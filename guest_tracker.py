@@ -0,0 +1,89 @@
+import time
+import datetime
+import threading
+from pymongo import UpdateOne
+import db
+from cache import TTLCache
+
+# Upper bound on guests remembered in memory; older ones fall back to being re-asked
+GUEST_CACHE_SIZE = 100_000
+
+
+class GuestParticipationTracker:
+    """Remembers which guests have already seen the participation prompt.
+
+    Lookups are answered from a bounded in-memory TTL cache. New entries are
+    queued and written to the guest_participation collection in batches by
+    flush(); a TTL index on asked_at expires them in Mongo on the same
+    schedule as the cache, so neither side grows without bound.
+    """
+
+    def __init__(self, collection=None, maxsize: int = GUEST_CACHE_SIZE,
+                 ttl_days: float = db.GUEST_PROMPT_TTL_DAYS, clock=time.time):
+        self.collection = collection if collection is not None else db.guest_participation_collection
+        self.ttl = ttl_days * 86400
+        self._clock = clock
+        self._asked = TTLCache(maxsize, self.ttl, clock=clock)
+        self._pending = {}  # user_id -> asked_at, waiting for the next flush
+        self._lock = threading.Lock()
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._asked
+
+    def __len__(self) -> int:
+        return len(self._asked)
+
+    def add(self, user_id: int):
+        """Mark a guest as asked; persisted on the next flush()."""
+        self._asked.set(user_id, True)
+        with self._lock:
+            self._pending[user_id] = self._clock()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self) -> int:
+        """Write queued entries to Mongo in one bulk upsert; returns how many were written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        operations = [
+            UpdateOne(
+                {"_id": str(user_id)},
+                {"$set": {"asked_at": datetime.datetime.utcfromtimestamp(asked_at)}},
+                upsert=True,
+            )
+            for user_id, asked_at in pending.items()
+        ]
+        try:
+            self.collection.bulk_write(operations, ordered=False)
+        except Exception:
+            # Put entries back so the next flush retries them
+            with self._lock:
+                for user_id, asked_at in pending.items():
+                    self._pending.setdefault(user_id, asked_at)
+            raise
+        return len(operations)
+
+    def load(self) -> int:
+        """Fill the cache with the most recent unexpired entries from Mongo."""
+        now = self._clock()
+        since = datetime.datetime.utcfromtimestamp(now - self.ttl)
+        cursor = (
+            self.collection.find({"asked_at": {"$gte": since}}, {"asked_at": 1})
+            .sort("asked_at", -1)
+            .limit(self._asked.maxsize)
+        )
+        loaded = []
+        for doc in cursor:
+            asked_at = doc["asked_at"].replace(tzinfo=datetime.timezone.utc).timestamp()
+            loaded.append((int(doc["_id"]), asked_at))
+        # Insert oldest first so the newest end up most recently used
+        for user_id, asked_at in reversed(loaded):
+            self._asked.set(user_id, True, ttl=asked_at + self.ttl - now)
+        return len(loaded)
+
+    def purge_expired(self) -> int:
+        return self._asked.purge_expired()
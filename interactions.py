@@ -0,0 +1,105 @@
+import time
+import logging
+from collections import Counter
+from typing import Dict, Optional
+
+import discord
+
+from metrics import RollingWindow
+
+logger = logging.getLogger(__name__)
+
+# Discord drops an interaction that is not acknowledged within 3 seconds
+ACK_DEADLINE_MS = 3000
+# Acks slower than this are logged: they are one slow call away from missing
+ACK_WARN_MS = 2000
+
+# Error code Discord returns for an interaction whose token has expired
+UNKNOWN_INTERACTION = 10062
+
+
+def _command_name(interaction) -> str:
+    command = getattr(interaction, "command", None)
+    return command.qualified_name if command else "unknown"
+
+
+def _age_ms(interaction) -> float:
+    """Milliseconds since Discord created the interaction (includes gateway delay)."""
+    return (discord.utils.utcnow() - interaction.created_at).total_seconds() * 1000
+
+
+class AckStats:
+    """Time-to-ack of slash commands, and acks that came too late."""
+
+    def __init__(self, size: int = 500):
+        self.latency = RollingWindow(size)
+        self.by_command: Dict[str, RollingWindow] = {}
+        self.acked = Counter()
+        self.missed = Counter()
+        self.size = size
+
+    def record_ack(self, command: str, age_ms: float, call_ms: float):
+        self.latency.record(age_ms)
+        if command not in self.by_command:
+            self.by_command[command] = RollingWindow(self.size)
+        self.by_command[command].record(age_ms)
+        self.acked[command] += 1
+        if age_ms > ACK_WARN_MS:
+            logger.warning(f"/{command} acknowledged after {age_ms:.0f}ms (ack call {call_ms:.0f}ms)")
+
+    def record_miss(self, command: str, age_ms: float):
+        self.missed[command] += 1
+        logger.warning(f"/{command} missed its acknowledgement window ({age_ms:.0f}ms old)")
+
+    def summary(self) -> Dict:
+        return {
+            "acked": sum(self.acked.values()),
+            "missed": sum(self.missed.values()),
+            "latency": self.latency.summary(),
+            "commands": {
+                name: {"acked": self.acked[name], "missed": self.missed[name],
+                       "latency": window.summary()}
+                for name, window in self.by_command.items()
+            },
+            "missed_by_command": dict(self.missed),
+        }
+
+
+ack_stats = AckStats()
+
+
+async def _ack(interaction, send, **kwargs) -> bool:
+    command = _command_name(interaction)
+    started = time.perf_counter()
+    try:
+        await send(**kwargs)
+    except discord.NotFound as e:
+        if e.code != UNKNOWN_INTERACTION:
+            raise
+        ack_stats.record_miss(command, _age_ms(interaction))
+        return False
+    ack_stats.record_ack(command, _age_ms(interaction), (time.perf_counter() - started) * 1000)
+    return True
+
+
+async def acknowledge(interaction: discord.Interaction, *, ephemeral: bool = False, thinking: bool = False) -> bool:
+    """Defer the interaction unless it is already acknowledged.
+
+    Call it before any database, Gemini or Discord work so the 3-second
+    window cannot run out; reply afterwards with respond() or
+    interaction.followup. Returns False when the window had already passed.
+    """
+    if interaction.response.is_done():
+        return True
+    return await _ack(interaction, interaction.response.defer, ephemeral=ephemeral, thinking=thinking)
+
+
+async def respond(interaction: discord.Interaction, content: Optional[str] = None, **kwargs):
+    """Reply to an interaction: as its initial response if it has not been
+    acknowledged yet (which counts as the ack), otherwise as a followup."""
+    if content is not None:
+        kwargs["content"] = content
+    if interaction.response.is_done():
+        await interaction.followup.send(**kwargs)
+    else:
+        await _ack(interaction, interaction.response.send_message, **kwargs)
@@ -1,7 +1,12 @@
 import os
-import google.generativeai as genai
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from typing import Optional, List, Dict
+from metrics import RollingWindow, OutcomeWindow
+from model_router import router
 
 # Load API keys
 load_dotenv()
@@ -10,8 +15,120 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
     raise Exception("Missing GEMINI_API_KEY. Please add it to your .env file.")
 
-# Configure Gemini
-genai.configure(api_key=GEMINI_API_KEY)
+# google.generativeai is slow to import, so it is imported and configured on
+# first use (or by prewarm() in the background) instead of at module import.
+genai = None
+_genai_lock = threading.Lock()
+
+def get_genai():
+    """Import and configure the Gemini SDK on first use."""
+    global genai
+    if genai is None:
+        with _genai_lock:
+            if genai is None:
+                import google.generativeai as sdk
+                sdk.configure(api_key=GEMINI_API_KEY)
+                genai = sdk
+    return genai
+
+def prewarm():
+    """Import and configure the Gemini SDK ahead of the first question."""
+    get_genai()
+
+# Rolling health statistics for Gemini calls, surfaced by /ping
+gemini_latency_ms = RollingWindow(500)
+gemini_outcomes = OutcomeWindow(200)
+
+def get_health() -> Dict:
+    """Summarize recent Gemini call latency and error rate."""
+    return {
+        "latency": gemini_latency_ms.summary(),
+        "error_rate": gemini_outcomes.error_rate(),
+        "calls": gemini_latency_ms.total,
+        "last_error": gemini_outcomes.last_error,
+        "hedging": hedge_stats.summary(),
+        "routing": router.enabled,
+        "tiers": router.stats(),
+    }
+
+# Each Gemini call blocks a worker thread for seconds, so the async path uses
+# its own pool and cannot starve the default executor that runs Mongo calls
+GEMINI_MAX_WORKERS = int(os.getenv("GEMINI_MAX_WORKERS", "32"))
+_executor = ThreadPoolExecutor(max_workers=GEMINI_MAX_WORKERS, thread_name_prefix="gemini")
+
+def _in_thread(func, *args) -> asyncio.Future:
+    return asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+
+# Hedged requests (opt-in): if a Gemini call has not answered by HEDGE_PERCENTILE
+# of recent latencies, one duplicate is sent and the first answer wins.
+# At most HEDGE_MAX_FRACTION of requests are hedged.
+HEDGE_REQUESTS = os.getenv("HEDGE_REQUESTS", "").lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_MAX_FRACTION = float(os.getenv("HEDGE_MAX_FRACTION", "0.05"))
+HEDGE_MIN_DELAY_MS = 1000
+HEDGE_MIN_SAMPLES = 50
+
+def hedge_deadline_ms(model_name: str) -> Optional[float]:
+    """Delay before hedging a call to model_name, or None until enough latencies are known."""
+    tier = router.tier_for(model_name)
+    window = tier.latency_ms if tier else gemini_latency_ms
+    if len(window) < HEDGE_MIN_SAMPLES:
+        return None
+    return max(window.percentile(HEDGE_PERCENTILE), HEDGE_MIN_DELAY_MS)
+
+class _Attempt:
+    """Runs one Gemini call in a worker thread and reports when it finishes, even after cancellation."""
+
+    def __init__(self):
+        self.on_finish = None
+
+    def run(self, func, *args):
+        try:
+            return func(*args)
+        finally:
+            callback = self.on_finish
+            if callback is not None:
+                callback(time.perf_counter())
+
+class HedgeStats:
+    """How often requests are hedged, how often the hedge wins and how much time that saves."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.latency_ms = RollingWindow(500)   # answer time of hedged requests
+        self.saved_ms = RollingWindow(500)     # losing original's finish minus the winning hedge's
+
+    def request(self):
+        with self._lock:
+            self.requests += 1
+
+    def try_hedge(self) -> bool:
+        """Reserve a hedge unless that would exceed HEDGE_MAX_FRACTION of requests."""
+        with self._lock:
+            if self.hedged + 1 > HEDGE_MAX_FRACTION * self.requests:
+                return False
+            self.hedged += 1
+            return True
+
+    def hedge_won(self, primary_attempt: _Attempt, won_at: float):
+        with self._lock:
+            self.hedge_wins += 1
+        primary_attempt.on_finish = lambda finished_at: self.saved_ms.record((finished_at - won_at) * 1000)
+
+    def summary(self) -> Dict:
+        return {
+            "enabled": HEDGE_REQUESTS,
+            "requests": self.requests,
+            "hedge_rate": self.hedged / self.requests if self.requests else 0.0,
+            "hedge_win_rate": self.hedge_wins / self.hedged if self.hedged else 0.0,
+            "hedged_latency_ms": self.latency_ms.summary(),
+            "saved_ms": self.saved_ms.summary(),
+        }
+
+hedge_stats = HedgeStats()
 
 # Shared system prompt for the tutor
 TUTOR_SYSTEM_PROMPT = """You are Schrödy, a friendly and supportive tutor with access to current information through web search. Your goal is to help students understand concepts by guiding them through a topic, not by giving them the answer directly.
@@ -80,12 +197,13 @@ class LearnLMTutor:
     def __init__(self, model_name: str = 'gemini-2.5-flash'):
         """Initialize the tutor with a specific model."""
         self.model_name = model_name
-        self.model = genai.GenerativeModel(model_name)
+        self.model = get_genai().GenerativeModel(model_name)
         self.conversation_history = []
 
-    def _should_search(self, prompt: str) -> bool:
+    @classmethod
+    def _should_search(cls, prompt: str) -> bool:
         """Determine if search should be enabled based on prompt content."""
-        return any(keyword in prompt.lower() for keyword in self.SEARCH_KEYWORDS)
+        return any(keyword in prompt.lower() for keyword in cls.SEARCH_KEYWORDS)
 
     def _build_context(self, max_history: int = 3) -> str:
         """Build conversation context from history."""
@@ -97,6 +215,56 @@ class LearnLMTutor:
             context += f"Student: {entry['question']}\nTutor: {entry['answer']}\n\n"
         return context
 
+    def _prepare(self, prompt: str, use_search: Optional[bool], remember_context: bool):
+        """Return the full prompt, the tools to enable and whether search is used."""
+        # Auto-determine search if not specified
+        if use_search is None:
+            use_search = self._should_search(prompt)
+
+        # Build context from conversation history
+        context = self._build_context() if remember_context else ""
+
+        # Build full prompt
+        full_prompt = f"{TUTOR_SYSTEM_PROMPT}\n\n{context}Student: {prompt}\n\nTutor:"
+
+        # Generate response with or without grounding
+        tools = [self.SEARCH_CONFIG] if use_search else []
+        return full_prompt, tools, use_search
+
+    def _generate(self, full_prompt: str, tools: List):
+        """Call Gemini once (blocking) and record latency and outcome."""
+        started = time.perf_counter()
+        try:
+            response = self.model.generate_content(full_prompt, tools=tools)
+        except Exception as e:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            gemini_latency_ms.record(elapsed_ms)
+            gemini_outcomes.failure(e)
+            router.record(self.model_name, elapsed_ms, ok=False, error=e)
+            raise
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        gemini_latency_ms.record(elapsed_ms)
+        gemini_outcomes.success()
+        answer_chars = len(response.text) if response and response.text else 0
+        router.record(self.model_name, elapsed_ms, ok=True, prompt_chars=len(full_prompt), answer_chars=answer_chars)
+        return response
+
+    def _finish(self, prompt: str, response, use_search: bool, remember_context: bool) -> str:
+        if response and response.text:
+            answer = response.text
+
+            # Store in conversation history
+            if remember_context:
+                self.conversation_history.append({
+                    'question': prompt,
+                    'answer': answer,
+                    'used_search': use_search
+                })
+
+            return answer
+        else:
+            return "❌ I received an empty response. Please try rephrasing your question."
+
     def ask(self, prompt: str, use_search: Optional[bool] = None, remember_context: bool = True) -> str:
         """
         Ask a question to the tutor.
@@ -107,39 +275,61 @@ class LearnLMTutor:
             remember_context: Whether to remember this exchange in conversation history
         """
         try:
-            # Auto-determine search if not specified
-            if use_search is None:
-                use_search = self._should_search(prompt)
-
-            # Build context from conversation history
-            context = self._build_context() if remember_context else ""
-
-            # Build full prompt
-            full_prompt = f"{TUTOR_SYSTEM_PROMPT}\n\n{context}Student: {prompt}\n\nTutor:"
-
-            # Generate response with or without grounding
-            tools = [self.SEARCH_CONFIG] if use_search else []
-            response = self.model.generate_content(full_prompt, tools=tools)
-
-            if response and response.text:
-                answer = response.text
-
-                # Store in conversation history
-                if remember_context:
-                    self.conversation_history.append({
-                        'question': prompt,
-                        'answer': answer,
-                        'used_search': use_search
-                    })
+            full_prompt, tools, use_search = self._prepare(prompt, use_search, remember_context)
+            response = self._generate(full_prompt, tools)
+            return self._finish(prompt, response, use_search, remember_context)
+        except Exception as e:
+            print(f"Error with Gemini API: {e}")
+            return f"❌ Sorry, I encountered an error while processing your request: {str(e)} Please try again."
 
-                return answer
+    async def ask_async(self, prompt: str, use_search: Optional[bool] = None, remember_context: bool = True) -> str:
+        """Like ask(), but runs the Gemini call in a worker thread, hedging it if HEDGE_REQUESTS is on."""
+        try:
+            full_prompt, tools, use_search = self._prepare(prompt, use_search, remember_context)
+            if HEDGE_REQUESTS:
+                response = await self._generate_hedged(full_prompt, tools)
             else:
-                return "❌ I received an empty response. Please try rephrasing your question."
-
+                response = await _in_thread(self._generate, full_prompt, tools)
+            return self._finish(prompt, response, use_search, remember_context)
         except Exception as e:
             print(f"Error with Gemini API: {e}")
             return f"❌ Sorry, I encountered an error while processing your request: {str(e)} Please try again."
 
+    async def _generate_hedged(self, full_prompt: str, tools: List):
+        """Send one duplicate request if the first has not answered by the hedge deadline.
+
+        The first successful answer wins and the other request is cancelled.
+        The synchronous SDK call itself cannot be interrupted, so a cancelled
+        request's thread finishes in the background and its result is dropped.
+        """
+        started = time.perf_counter()
+        primary_attempt = _Attempt()
+        primary = _in_thread(primary_attempt.run, self._generate, full_prompt, tools)
+        deadline = hedge_deadline_ms(self.model_name)
+        hedge_stats.request()
+        if deadline is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=deadline / 1000)
+        if done or not hedge_stats.try_hedge():
+            return await primary
+
+        hedge = _in_thread(_Attempt().run, self._generate, full_prompt, tools)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    won_at = time.perf_counter()
+                    if task is hedge:
+                        hedge_stats.hedge_won(primary_attempt, won_at)
+                    hedge_stats.latency_ms.record((won_at - started) * 1000)
+                    return task.result()
+        # Both failed: surface the original request's error
+        return primary.result()
+
     def ask_with_search(self, prompt: str) -> str:
         """Ask a question with search explicitly enabled."""
         return self.ask(prompt, use_search=True)
@@ -159,7 +349,7 @@ class LearnLMTutor:
     def list_models(self) -> str:
         """List all available Gemini models."""
         try:
-            models = genai.list_models()
+            models = get_genai().list_models()
             model_list = []
             for model in models:
                 model_list.append(f"• **{model.name}** - {model.description}")
@@ -167,12 +357,27 @@ class LearnLMTutor:
         except Exception as e:
             return f"❌ Error listing models: {str(e)}"
 
+def _route(prompt: str, question: Optional[str], search_enabled: bool, session_depth: int):
+    """Pick a tier from the student's own message (question), not the prompt with its context."""
+    question = prompt if question is None else question
+    needs_search = search_enabled or LearnLMTutor._should_search(question)
+    return router.choose(question, needs_search=needs_search, session_depth=session_depth)
+
 # Convenience functions for backwards compatibility
-def ask_learnlm(prompt: str, search_enabled: bool = False) -> str:
-    """Legacy function wrapper for backwards compatibility."""
-    tutor = LearnLMTutor()
+def ask_learnlm(prompt: str, search_enabled: bool = False, session_depth: int = 0,
+                question: Optional[str] = None) -> str:
+    """Legacy function wrapper for backwards compatibility; the model is picked by model_router."""
+    tier = _route(prompt, question, search_enabled, session_depth)
+    tutor = LearnLMTutor(tier.model)
     return tutor.ask(prompt, use_search=search_enabled, remember_context=False)
 
+async def ask_learnlm_async(prompt: str, search_enabled: bool = False, session_depth: int = 0,
+                            question: Optional[str] = None) -> str:
+    """ask_learnlm without blocking the event loop; hedged when HEDGE_REQUESTS is on."""
+    tier = _route(prompt, question, search_enabled, session_depth)
+    tutor = LearnLMTutor(tier.model)
+    return await tutor.ask_async(prompt, use_search=search_enabled, remember_context=False)
+
 def ask_learnlm_with_search(prompt: str) -> str:
     """Legacy function wrapper with search enabled."""
     tutor = LearnLMTutor()
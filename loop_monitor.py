@@ -0,0 +1,151 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from bisect import bisect_left
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# How often the probe task wakes up, and the lag at which the watchdog reports a stall
+LOOP_MONITOR = os.getenv("LOOP_MONITOR", "true").lower() not in ("0", "false", "no")
+LOOP_PROBE_INTERVAL = float(os.getenv("LOOP_PROBE_INTERVAL", "0.1"))
+LOOP_STALL_THRESHOLD = float(os.getenv("LOOP_STALL_THRESHOLD", "0.5"))
+
+# Histogram bucket upper bounds in milliseconds; the last bucket is open-ended
+LAG_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class LagHistogram:
+    """Cumulative histogram of event loop lag samples, in milliseconds."""
+
+    def __init__(self, buckets=LAG_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, lag_ms: float):
+        self.counts[bisect_left(self.buckets, lag_ms)] += 1
+        self.total += 1
+        self.sum_ms += lag_ms
+        self.max_ms = max(self.max_ms, lag_ms)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Upper bound of the bucket holding the given percentile (None if empty or beyond the last bound)."""
+        if not self.total:
+            return None
+        rank = pct / 100 * self.total
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def snapshot(self) -> Dict:
+        labels = [f"<={bound}ms" for bound in self.buckets] + [f">{self.buckets[-1]}ms"]
+        return {
+            "count": self.total,
+            "mean_ms": self.sum_ms / self.total if self.total else None,
+            "max_ms": self.max_ms,
+            "p99_ms": self.percentile(99),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class LoopMonitor:
+    """Measures event loop scheduling lag and reports what is blocking the loop.
+
+    A probe task sleeps for `interval` and records how late it wakes up. A
+    watchdog thread checks the probe's heartbeat; when the loop has not run
+    the probe for longer than `threshold`, it captures the loop thread's
+    stack and the task that is currently running, and logs them once per
+    stall.
+    """
+
+    def __init__(self, interval: float = LOOP_PROBE_INTERVAL, threshold: float = LOOP_STALL_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.histogram = LagHistogram()
+        self.stalls: List[Dict] = []          # most recent stall reports, newest last
+        self.max_stall_reports = 20
+        self.stall_count = 0
+        self._loop = None
+        self._loop_thread_id = None
+        self._heartbeat = time.monotonic()
+        self._probe_task = None
+        self._watchdog = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Start the probe task on the running loop and the watchdog thread; call from the loop."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._probe_task = self._loop.create_task(self._probe(), name="loop-monitor-probe")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join, self.interval * 2)
+
+    async def _probe(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self._heartbeat = time.monotonic()
+            self.histogram.record(max(0.0, loop.time() - expected) * 1000)
+
+    def _watch(self):
+        reported = False
+        while not self._stop.wait(self.interval):
+            stalled_for = time.monotonic() - self._heartbeat
+            if stalled_for < self.threshold + self.interval:
+                reported = False
+                continue
+            if not reported:
+                reported = True
+                self._report(stalled_for)
+
+    def _report(self, stalled_for: float):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else "<unavailable>"
+        task = None
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            pass
+        coroutine = None
+        if task is not None:
+            coro = task.get_coro()
+            coroutine = f"{task.get_name()} ({getattr(coro, '__qualname__', coro)})"
+
+        self.stall_count += 1
+        self.stalls.append({"at": time.time(), "stalled_ms": stalled_for * 1000, "task": coroutine, "stack": stack})
+        del self.stalls[:-self.max_stall_reports]
+        logger.warning(
+            f"Event loop blocked for {stalled_for * 1000:.0f}ms+ in task {coroutine or '<none>'}; "
+            f"loop thread stack:\n{stack}"
+        )
+
+    def snapshot(self) -> Dict:
+        """Lag histogram plus the number of stalls reported so far."""
+        return {**self.histogram.snapshot(), "stalls": self.stall_count}
+
+
+loop_monitor = LoopMonitor()
@@ -0,0 +1,269 @@
+import re
+import asyncio
+import contextlib
+import contextvars
+import unicodedata
+import discord
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+# Discord rejects messages longer than this
+DISCORD_MESSAGE_LIMIT = 2000
+
+# Retries for a single chunk when Discord rate-limits us or returns a 5xx
+SEND_RETRIES = 3
+
+# Discord shows a typing indicator for about 10 seconds per trigger
+TYPING_REFRESH_SECONDS = 8
+
+# Fenced code blocks; an unterminated fence runs to the end of the text
+CODE_BLOCK_RE = re.compile(r"```.*?(?:```|\Z)", re.S)
+
+# ASCII characters that act as operators inside math expressions
+ASCII_OPERATORS = set("+-=/^<>")
+
+
+def _is_math_char(char: str) -> bool:
+    """True for math symbols and super/subscript characters (×, ≤, √, ², ₁, ...)."""
+    if char in ASCII_OPERATORS:
+        return True
+    if unicodedata.category(char) == "Sm":
+        return True
+    name = unicodedata.name(char, "")
+    return "SUPERSCRIPT" in name or "SUBSCRIPT" in name
+
+
+def _is_safe_cut(text: str, cut: int, check_math: bool = True) -> bool:
+    """Check that cutting text at index `cut` does not break a math sequence,
+    an inline code span or a combining character sequence."""
+    if cut <= 0 or cut >= len(text):
+        return True
+    if unicodedata.category(text[cut])[0] == "M" or text[cut] == "\u200d" or text[cut - 1] == "\u200d":
+        return False
+    if text[:cut].count("`") % 2:
+        return False
+
+    if not check_math:
+        return True
+
+    # Nearest non-space characters on either side of the cut
+    left = text[:cut].rstrip()
+    right = text[cut:].lstrip()
+    if not left or not right:
+        return True
+    return not (_is_math_char(left[-1]) or _is_math_char(right[0]))
+
+
+def _find_cut(text: str, limit: int) -> int:
+    """Find the best place to split text so that the first part fits in limit."""
+    window = text[:limit + 1]
+    floor = limit // 4  # avoid producing tiny chunks when a separator appears early
+
+    for separator in ("\n\n", "\n", ". ", " "):
+        position = window.rfind(separator)
+        while position > floor:
+            cut = position + (1 if separator == ". " else 0)
+            # Math sequences do not span lines, so only word breaks need the math check
+            if cut <= limit and _is_safe_cut(text, cut, check_math=separator in (". ", " ")):
+                return cut
+            position = window.rfind(separator, 0, position)
+
+    # No usable separator: hard cut, stepping back off combining marks and joiners
+    cut = limit
+    while cut > floor and not _is_safe_cut(text, cut):
+        cut -= 1
+    return cut if cut > floor else limit
+
+
+def _split_text(text: str, limit: int) -> List[str]:
+    """Split prose into pieces of at most limit characters."""
+    parts = []
+    while len(text) > limit:
+        cut = _find_cut(text, limit)
+        part = text[:cut].rstrip()
+        if part:
+            parts.append(part)
+        text = text[cut:].lstrip()
+    if text.strip():
+        parts.append(text)
+    return parts
+
+
+def _split_code_block(block: str, limit: int) -> List[str]:
+    """Split an oversized code block by lines, re-opening the fence in every piece."""
+    header, _, body = block.partition("\n")
+    if body.endswith("```"):
+        body = body[:-3]
+    body = body.rstrip("\n")
+    closing = "\n```"
+    room = limit - len(header) - 1 - len(closing)
+    if room < 1:
+        # The fence line alone does not fit, so it cannot be re-opened per piece
+        return _split_text(block, limit)
+
+    pieces = []
+    current = ""
+    for line in body.split("\n"):
+        while len(line) > room:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(line[:room])
+            line = line[room:]
+        candidate = f"{current}\n{line}" if current else line
+        if len(candidate) > room:
+            pieces.append(current)
+            current = line
+        else:
+            current = candidate
+    if current or not pieces:
+        pieces.append(current)
+    return [f"{header}\n{piece}{closing}" for piece in pieces]
+
+
+def split_message(text: str, limit: int = DISCORD_MESSAGE_LIMIT) -> List[str]:
+    """Split a Markdown message into chunks that each fit in a Discord message.
+
+    Code blocks are kept whole when they fit and otherwise split on line
+    boundaries with the fence re-opened in each chunk. Prose is split on
+    paragraph, line, sentence and word boundaries, in that order, but never
+    inside inline code or a Unicode math sequence such as `a² + b² = c²`.
+    """
+    if len(text) <= limit:
+        return [text]
+
+    # Break the text into prose and code block segments
+    segments = []
+    position = 0
+    for match in CODE_BLOCK_RE.finditer(text):
+        if match.start() > position:
+            segments.append((False, text[position:match.start()]))
+        block = match.group(0)
+        if not block.endswith("```") or len(block) < 6:
+            block += "\n```"
+        segments.append((True, block))
+        position = match.end()
+    if position < len(text):
+        segments.append((False, text[position:]))
+
+    chunks = []
+    current = ""
+    for is_code, segment in segments:
+        if len(current) + len(segment) <= limit:
+            current += segment
+            continue
+
+        if is_code:
+            pieces = [segment] if len(segment) <= limit else _split_code_block(segment, limit)
+        elif "```" in current:
+            # Never re-split a chunk that already holds a code block
+            pieces = _split_text(segment, limit)
+        else:
+            # Fill the current chunk before starting new ones
+            pieces = _split_text(current + segment, limit)
+            current = ""
+
+        if current.strip():
+            chunks.append(current.strip("\n"))
+        chunks.extend(piece.strip("\n") for piece in pieces[:-1])
+        current = pieces[-1] if pieces else ""
+
+    if current.strip():
+        chunks.append(current.strip("\n"))
+    return chunks
+
+
+async def send_chunks(channel, chunks: List[str], **kwargs) -> List[discord.Message]:
+    """Send chunks to a channel one at a time, in order.
+
+    discord.py already waits out per-route rate limits; this additionally
+    retries a chunk with backoff when Discord still answers 429 or a 5xx, so
+    a long answer is not lost halfway through.
+    """
+    sent = []
+    for chunk in chunks:
+        for attempt in range(SEND_RETRIES + 1):
+            try:
+                count_rest_call("send")
+                sent.append(await channel.send(chunk, **kwargs))
+                break
+            except discord.HTTPException as e:
+                if attempt == SEND_RETRIES or not (e.status == 429 or e.status >= 500):
+                    raise
+                retry_after = getattr(e, "retry_after", None) or 2 ** attempt
+                await asyncio.sleep(retry_after)
+    return sent
+
+
+async def send_long_message(channel, content: str, **kwargs) -> List[discord.Message]:
+    """Split content with split_message and send it with send_chunks."""
+    return await send_chunks(channel, split_message(content), **kwargs)
+
+
+class DeliveryStats:
+    """REST calls spent per handled message, by route and by kind of call."""
+
+    def __init__(self):
+        self.handled = Counter()
+        self.calls = defaultdict(Counter)
+
+    def record(self, route: str, calls: Counter):
+        self.handled[route] += 1
+        self.calls[route].update(calls)
+
+    def summary(self) -> Dict[str, dict]:
+        """Per route: messages handled, average REST calls per message, and the average per kind."""
+        result = {}
+        for route, handled in self.handled.items():
+            calls = self.calls[route]
+            result[route] = {
+                "handled": handled,
+                "per_message": sum(calls.values()) / handled,
+                "by_kind": {kind: count / handled for kind, count in calls.items()},
+            }
+        return result
+
+
+delivery_stats = DeliveryStats()
+
+# Counter of REST calls for the message currently being answered, if any
+_rest_calls: contextvars.ContextVar = contextvars.ContextVar("rest_calls", default=None)
+
+
+def count_rest_call(kind: str):
+    """Attribute one REST call to the message currently being answered."""
+    calls = _rest_calls.get()
+    if calls is not None:
+        calls[kind] += 1
+
+
+async def _keep_typing(channel):
+    while True:
+        count_rest_call("typing")
+        try:
+            await channel.typing()
+        except discord.HTTPException:
+            pass
+        await asyncio.sleep(TYPING_REFRESH_SECONDS)
+
+
+@contextlib.asynccontextmanager
+async def responding(channel, route: str):
+    """Show a typing indicator in channel while an answer is generated and sent.
+
+    Replaces posting and deleting a "thinking" placeholder: the indicator is
+    re-triggered every TYPING_REFRESH_SECONDS until the block exits, and every
+    REST call made inside the block is recorded under route in delivery_stats.
+    A typical answer costs two calls, the typing trigger and the send. The
+    indicator only shows if the block awaits its slow work instead of blocking
+    the event loop, so the typing task gets to run.
+    """
+    calls = Counter()
+    token = _rest_calls.set(calls)
+    typing_task = asyncio.create_task(_keep_typing(channel))
+    try:
+        yield
+    finally:
+        typing_task.cancel()
+        _rest_calls.reset(token)
+        delivery_stats.record(route, calls)
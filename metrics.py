@@ -0,0 +1,79 @@
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+
+def nearest_rank(ordered, pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted sequence, or None if it is empty."""
+    if not ordered:
+        return None
+    return ordered[max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))]
+
+
+class RollingWindow:
+    """Thread-safe window over the last N samples (e.g. latencies in milliseconds)."""
+
+    def __init__(self, size: int = 500):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.total = 0  # samples ever recorded, not just those in the window
+
+    def record(self, value: float):
+        with self._lock:
+            self._samples.append(value)
+            self.total += 1
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Nearest-rank percentile of the window, or None if it is empty."""
+        with self._lock:
+            ordered = sorted(self._samples)
+        return nearest_rank(ordered, pct)
+
+    def mean(self) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            return sum(self._samples) / len(self._samples)
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        """Count, mean and p50/p95/p99 of the window."""
+        with self._lock:
+            ordered = sorted(self._samples)
+        return {
+            "count": len(ordered),
+            "mean": sum(ordered) / len(ordered) if ordered else None,
+            "p50": nearest_rank(ordered, 50),
+            "p95": nearest_rank(ordered, 95),
+            "p99": nearest_rank(ordered, 99),
+        }
+
+
+class OutcomeWindow:
+    """Thread-safe success/failure record over the last N operations."""
+
+    def __init__(self, size: int = 200):
+        self._outcomes = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.last_error: Optional[str] = None
+
+    def success(self):
+        with self._lock:
+            self._outcomes.append(True)
+
+    def failure(self, error=None):
+        with self._lock:
+            self._outcomes.append(False)
+            if error is not None:
+                self.last_error = str(error)
+
+    def __len__(self):
+        return len(self._outcomes)
+
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self._outcomes:
+                return 0.0
+            return self._outcomes.count(False) / len(self._outcomes)
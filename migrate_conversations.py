@@ -0,0 +1,135 @@
+"""Migrate conversation history from one document per turn into buckets.
+
+Reads the legacy `conversations` collection in (user_id, _id) order and
+writes each user's turns into `conversation_buckets` documents of
+CONVERSATION_BUCKET_SIZE turns, the layout db.add_message and
+db.add_exchange now write.
+
+Every turn keeps its original _id and every bucket takes the _id of its
+first turn, so migrated buckets sort before anything the bot has written
+since, export watermarks stay valid, and running the migration again
+rewrites the same buckets instead of duplicating them. A user's
+latest_bucket pointer is only set when the bot has not created one yet.
+
+Run it before starting the bot on the bucketed store (or restart the bot
+afterwards: it caches users' latest-bucket pointers, including "none").
+Legacy documents are kept unless --delete is given, which removes each
+user's documents once their buckets are written.
+
+Usage:
+    python migrate_conversations.py --dry-run
+    python migrate_conversations.py
+    python migrate_conversations.py --user 123456789 --delete
+"""
+import time
+import argparse
+from typing import Dict, Iterator, List, Tuple
+
+from pymongo import ReplaceOne, UpdateOne
+
+import db
+
+MIGRATION_BATCH_SIZE = 1000  # buckets per bulk write
+
+
+def iter_users(query: Dict) -> Iterator[Tuple[str, List[Dict]]]:
+    """Yield (user_id, turns) per user from the legacy collection, turns oldest first."""
+    cursor = db.conversations.find(
+        query, {"user_id": 1, "role": 1, "message": 1, "timestamp": 1}
+    ).sort([("user_id", 1), ("_id", 1)])
+    current, turns = None, []
+    try:
+        for doc in cursor:
+            if doc["user_id"] != current:
+                if turns:
+                    yield str(current), turns
+                current, turns = doc["user_id"], []
+            turns.append({
+                "_id": doc["_id"],
+                "role": doc.get("role", "user"),
+                "message": doc.get("message", ""),
+                "timestamp": doc.get("timestamp") or doc["_id"].generation_time.replace(tzinfo=None),
+            })
+        if turns:
+            yield str(current), turns
+    finally:
+        cursor.close()
+
+
+def build_buckets(user_id: str, turns: List[Dict], size: int) -> List[Dict]:
+    return [
+        {
+            "_id": chunk[0]["_id"],
+            "user_id": user_id,
+            "count": len(chunk),
+            "start": chunk[0]["timestamp"],
+            "end": chunk[-1]["timestamp"],
+            "turns": chunk,
+        }
+        for chunk in (turns[i:i + size] for i in range(0, len(turns), size))
+    ]
+
+
+def migrate(query: Dict, size: int = db.CONVERSATION_BUCKET_SIZE, delete: bool = False,
+            dry_run: bool = False) -> Dict:
+    """Migrate every legacy document matching query; returns counts."""
+    bucket_ops, pointer_ops, migrated_ids = [], [], []
+    counts = {"users": 0, "turns": 0, "buckets": 0, "deleted": 0}
+
+    def flush():
+        if not dry_run:
+            # Buckets first: a pointer must never name a bucket that is not there yet
+            if bucket_ops:
+                db.conversation_buckets.bulk_write(bucket_ops, ordered=False)
+            if pointer_ops:
+                db.users_collection.bulk_write(pointer_ops, ordered=True)
+            if delete and migrated_ids:
+                counts["deleted"] += db.conversations.delete_many({"_id": {"$in": migrated_ids}}).deleted_count
+        bucket_ops.clear()
+        pointer_ops.clear()
+        migrated_ids.clear()
+
+    for user_id, turns in iter_users(query):
+        buckets = build_buckets(user_id, turns, size)
+        bucket_ops.extend(ReplaceOne({"_id": bucket["_id"]}, bucket, upsert=True) for bucket in buckets)
+        latest = buckets[-1]["_id"]
+        pointer_ops.extend([
+            UpdateOne({"discord_id": user_id}, {"$setOnInsert": {"latest_bucket": latest}}, upsert=True),
+            UpdateOne({"discord_id": user_id, "latest_bucket": {"$exists": False}},
+                      {"$set": {"latest_bucket": latest}}),
+        ])
+        if delete:
+            migrated_ids.extend(turn["_id"] for turn in turns)
+        counts["users"] += 1
+        counts["turns"] += len(turns)
+        counts["buckets"] += len(buckets)
+        if len(bucket_ops) >= MIGRATION_BATCH_SIZE:
+            flush()
+            print(f"  {counts['users']:,} users, {counts['turns']:,} turns", end="\r")
+    flush()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move legacy conversation documents into buckets")
+    parser.add_argument("--user", help="Only migrate this user's conversation")
+    parser.add_argument("--bucket-size", type=int, default=db.CONVERSATION_BUCKET_SIZE)
+    parser.add_argument("--delete", action="store_true", help="Delete legacy documents once migrated")
+    parser.add_argument("--dry-run", action="store_true", help="Count what would be migrated without writing")
+    args = parser.parse_args()
+
+    query = {}
+    if args.user:
+        # Older documents may hold the id as an int
+        query = {"user_id": {"$in": [args.user, int(args.user)] if args.user.isdigit() else [args.user]}}
+    db.ensure_indexes()
+    started = time.perf_counter()
+    counts = migrate(query, args.bucket_size, args.delete, args.dry_run)
+    elapsed = time.perf_counter() - started
+    print(f"{'Would migrate' if args.dry_run else 'Migrated'} {counts['turns']:,} turns of {counts['users']:,} users "
+          f"into {counts['buckets']:,} buckets in {elapsed:.1f}s"
+          + (f", deleted {counts['deleted']:,} legacy documents" if counts["deleted"] else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from metrics import RollingWindow, OutcomeWindow
+
+# Routing is opt-in; when off every request goes to the standard tier as before
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "").lower() in ("1", "true", "yes")
+
+# Features of the student's own message (not the prompt built around it) that decide the tier
+SHORT_PROMPT_CHARS = int(os.getenv("ROUTER_SHORT_PROMPT_CHARS", "200"))
+LONG_PROMPT_CHARS = int(os.getenv("ROUTER_LONG_PROMPT_CHARS", "1500"))
+# From this many turns of history the prompt carries enough context to stay off the fast tier
+LONG_SESSION_TURNS = int(os.getenv("ROUTER_LONG_SESSION_TURNS", "6"))
+
+# A tier is skipped while its recent p95 latency or error rate is above these;
+# the deep tier is expected to be slower and gets its own latency threshold
+FALLBACK_P95_MS = float(os.getenv("ROUTER_FALLBACK_P95_MS", "20000"))
+DEEP_FALLBACK_P95_MS = float(os.getenv("ROUTER_DEEP_FALLBACK_P95_MS", "60000"))
+FALLBACK_ERROR_RATE = float(os.getenv("ROUTER_FALLBACK_ERROR_RATE", "0.2"))
+MIN_SAMPLES = 20
+
+# Every Nth request a degraded tier still gets through, so it can recover
+PROBE_EVERY = 20
+
+# Rough token estimate for cost accounting
+CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class ModelTier:
+    """One model and its price in USD per million input/output tokens."""
+
+    name: str
+    model: str
+    input_cost: float
+    output_cost: float
+    max_p95_ms: float = FALLBACK_P95_MS
+    latency_ms: RollingWindow = field(default_factory=lambda: RollingWindow(200), repr=False)
+    cost_usd: RollingWindow = field(default_factory=lambda: RollingWindow(200), repr=False)
+    outcomes: OutcomeWindow = field(default_factory=lambda: OutcomeWindow(200), repr=False)
+    routed: int = 0
+    fallbacks: int = 0
+    total_cost_usd: float = 0.0
+
+    def is_degraded(self) -> bool:
+        if len(self.latency_ms) < MIN_SAMPLES:
+            return False
+        return (self.latency_ms.percentile(95) > self.max_p95_ms
+                or self.outcomes.error_rate() > FALLBACK_ERROR_RATE)
+
+    def estimate_cost(self, prompt_chars: int, answer_chars: int) -> float:
+        return (prompt_chars * self.input_cost + answer_chars * self.output_cost) / CHARS_PER_TOKEN / 1_000_000
+
+
+def default_tiers() -> List[ModelTier]:
+    """Tiers from fastest to most capable, overridable through the environment."""
+    return [
+        ModelTier("fast", os.getenv("MODEL_TIER_FAST", "gemini-2.5-flash-lite"), 0.10, 0.40),
+        ModelTier("standard", os.getenv("MODEL_TIER_STANDARD", "gemini-2.5-flash"), 0.30, 2.50),
+        ModelTier("deep", os.getenv("MODEL_TIER_DEEP", "gemini-2.5-pro"), 1.25, 10.00, DEEP_FALLBACK_P95_MS),
+    ]
+
+
+class ModelRouter:
+    """Picks a model tier per request and steps down to faster tiers when one degrades."""
+
+    def __init__(self, tiers: Optional[List[ModelTier]] = None, enabled: bool = MODEL_ROUTING):
+        self.tiers = tiers or default_tiers()
+        self.enabled = enabled
+        self._by_model = {tier.model: tier for tier in self.tiers}
+        self._lock = threading.Lock()
+        self._requests = 0
+
+    def preferred_tier(self, question: str, needs_search: bool = False, session_depth: int = 0) -> int:
+        """Index of the tier the student's message calls for, before health checks.
+
+        Only a long message goes to the deep tier. Session depth never goes
+        down during a session, so it only keeps a request off the fast tier.
+        """
+        standard = min(1, len(self.tiers) - 1)
+        if not self.enabled:
+            return standard
+        if len(question) >= LONG_PROMPT_CHARS:
+            return len(self.tiers) - 1
+        if len(question) <= SHORT_PROMPT_CHARS and not needs_search and session_depth < LONG_SESSION_TURNS:
+            return 0
+        return standard
+
+    def choose(self, question: str, needs_search: bool = False, session_depth: int = 0) -> ModelTier:
+        """Return the tier to use, skipping degraded tiers in favour of faster ones."""
+        index = self.preferred_tier(question, needs_search, session_depth)
+        with self._lock:
+            self._requests += 1
+            probe = self._requests % PROBE_EVERY == 0
+        chosen = self.tiers[index]
+        if self.enabled and not probe:
+            while index > 0 and self.tiers[index].is_degraded():
+                index -= 1
+            if self.tiers[index] is not chosen:
+                chosen.fallbacks += 1
+                chosen = self.tiers[index]
+        chosen.routed += 1
+        return chosen
+
+    def tier_for(self, model: str) -> Optional[ModelTier]:
+        return self._by_model.get(model)
+
+    def record(self, model: str, latency_ms: float, ok: bool, prompt_chars: int = 0,
+               answer_chars: int = 0, error=None):
+        """Record the outcome of one call to a model; unknown models are ignored."""
+        tier = self.tier_for(model)
+        if tier is None:
+            return
+        tier.latency_ms.record(latency_ms)
+        if ok:
+            tier.outcomes.success()
+            cost = tier.estimate_cost(prompt_chars, answer_chars)
+            tier.cost_usd.record(cost)
+            with self._lock:
+                tier.total_cost_usd += cost
+        else:
+            tier.outcomes.failure(error)
+
+    def stats(self) -> Dict[str, dict]:
+        """Per tier: model, requests routed, fallbacks away from it, latency and cost distributions."""
+        return {
+            tier.name: {
+                "model": tier.model,
+                "routed": tier.routed,
+                "fallbacks": tier.fallbacks,
+                "degraded": tier.is_degraded(),
+                "latency_ms": tier.latency_ms.summary(),
+                "error_rate": tier.outcomes.error_rate(),
+                "cost_usd": tier.cost_usd.summary(),
+                "total_cost_usd": tier.total_cost_usd,
+            }
+            for tier in self.tiers
+        }
+
+
+router = ModelRouter()
@@ -0,0 +1,208 @@
+import os
+import asyncio
+import logging
+import datetime
+from typing import Callable, Dict, List, Optional
+
+import discord
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+import db
+import messaging
+
+logger = logging.getLogger(__name__)
+
+# How often the background sender looks for replies that are due
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "5"))
+# Delivery attempts before a reply is given up on, and the retry backoff
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "5"))
+OUTBOX_RETRY_MAX_SECONDS = float(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "600"))
+# A reply being delivered is hidden from the sender for this long, renewed after
+# every chunk; if the bot dies mid-delivery the reply becomes due again once the
+# lease runs out
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "60"))
+OUTBOX_BATCH_SIZE = 20
+
+
+def _retryable(error: Exception) -> bool:
+    """Rate limits, Discord 5xx and network errors are worth retrying; other 4xx are not."""
+    if isinstance(error, discord.HTTPException):
+        return error.status == 429 or error.status >= 500
+    return True
+
+
+def retry_delay(attempts: int) -> float:
+    return min(OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1), OUTBOX_RETRY_MAX_SECONDS)
+
+
+class ReplyOutbox:
+    """Durable queue of generated replies, stored in Mongo until Discord has them.
+
+    A reply is split into chunks and persisted before its first send attempt.
+    The first attempt happens right away; if it fails the entry stays pending
+    with a backoff and the background sender (deliver_due) retries it, also
+    after a restart. Entries remember how many chunks went out, so a retry
+    continues a long answer where it stopped instead of repeating it.
+
+    Whoever delivers an entry holds its lease token. Progress, completion and
+    rescheduling are only written while the token is still current, and a
+    deliverer that finds its lease taken over stops sending.
+    """
+
+    def __init__(self, collection=None, max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+                 lease_seconds: float = OUTBOX_LEASE_SECONDS):
+        self.collection = collection if collection is not None else db.reply_outbox_collection
+        self.max_attempts = max_attempts
+        self.lease = datetime.timedelta(seconds=lease_seconds)
+        # Counters since startup
+        self.delivered = 0
+        self.redelivered = 0
+        self.retried = 0
+        self.failed = 0
+
+    def add(self, thread_id, user_id, chunks: List[str]) -> Dict:
+        """Persist a reply, leased to the caller that is about to send it."""
+        now = datetime.datetime.utcnow()
+        entry = {
+            "thread_id": str(thread_id),
+            "user_id": str(user_id),
+            "chunks": chunks,
+            "sent": 0,
+            "attempts": 0,
+            "status": "pending",
+            "created_at": now,
+            "next_attempt": now + self.lease,
+            "lease": ObjectId(),
+        }
+        entry["_id"] = self.collection.insert_one(entry).inserted_id
+        return entry
+
+    @staticmethod
+    def _leased(entry: Dict) -> Dict:
+        return {"_id": entry["_id"], "lease": entry["lease"], "status": "pending"}
+
+    def renew(self, entry: Dict, sent: int) -> bool:
+        """Record progress and extend the lease; False if another deliverer took the entry over."""
+        now = datetime.datetime.utcnow()
+        result = self.collection.update_one(
+            self._leased(entry), {"$set": {"sent": sent, "next_attempt": now + self.lease}}
+        )
+        return result.matched_count == 1
+
+    def mark_done(self, entry: Dict):
+        now = datetime.datetime.utcnow()
+        self.collection.update_one(
+            self._leased(entry),
+            {"$set": {"status": "done", "finished_at": now}, "$unset": {"chunks": ""}},
+        )
+
+    def reschedule(self, entry: Dict, sent: int, error: Exception):
+        """Record a failed attempt: retry it later with backoff, or give up."""
+        now = datetime.datetime.utcnow()
+        attempts = entry.get("attempts", 0) + 1
+        update = {"sent": sent, "attempts": attempts, "last_error": str(error)[:500]}
+        if _retryable(error) and attempts < self.max_attempts:
+            delay = max(retry_delay(attempts), getattr(error, "retry_after", None) or 0)
+            update["next_attempt"] = now + datetime.timedelta(seconds=delay)
+            self.retried += 1
+            logger.warning(f"Reply to thread {entry['thread_id']} failed (attempt {attempts}), "
+                           f"retrying in {delay:.0f}s: {error}")
+        else:
+            update.update(status="failed", finished_at=now)
+            self.failed += 1
+            logger.error(f"Giving up on reply to thread {entry['thread_id']} after {attempts} attempt(s): {error}")
+        self.collection.update_one(self._leased(entry), {"$set": update})
+
+    def claim_due(self, limit: int = OUTBOX_BATCH_SIZE) -> List[Dict]:
+        """Lease up to limit pending replies whose next attempt is due, oldest first."""
+        claimed = []
+        while len(claimed) < limit:
+            now = datetime.datetime.utcnow()
+            entry = self.collection.find_one_and_update(
+                {"status": "pending", "next_attempt": {"$lte": now},
+                 "_id": {"$nin": [doc["_id"] for doc in claimed]}},
+                {"$set": {"next_attempt": now + self.lease, "lease": ObjectId()}},
+                sort=[("next_attempt", 1)],
+                return_document=ReturnDocument.AFTER,
+            )
+            if entry is None:
+                break
+            claimed.append(entry)
+        return claimed
+
+    async def _deliver(self, channel, entry: Dict) -> bool:
+        chunks, first = entry["chunks"], entry.get("sent", 0)
+        sent = first
+        try:
+            if channel is None:
+                raise LookupError(f"channel {entry['thread_id']} is not available")
+            for index in range(first, len(chunks)):
+                if index > first and not await asyncio.to_thread(self.renew, entry, index):
+                    logger.warning(f"Reply {entry['_id']} was taken over by another delivery, stopping")
+                    return False
+                # One attempt per chunk: retries go through the outbox backoff,
+                # so a rate-limited send cannot outlive the lease
+                messaging.count_rest_call("send")
+                await channel.send(chunks[index])
+                sent = index + 1
+        except Exception as e:
+            await asyncio.to_thread(self.reschedule, entry, sent, e)
+            return False
+
+        self.delivered += 1
+        try:
+            await asyncio.to_thread(self.mark_done, entry)
+        except Exception as e:
+            # Still pending in Mongo, so it is sent again once the lease runs out
+            logger.warning(f"Could not mark reply {entry['_id']} as delivered: {e}")
+        return True
+
+    async def send(self, channel, user_id, content: str) -> bool:
+        """Persist a reply and try to deliver it now.
+
+        Returns False if the first attempt failed; the reply then stays in the
+        outbox for the background sender. If the outbox itself cannot be
+        written, the reply is sent directly as before.
+        """
+        chunks = messaging.split_message(content)
+        try:
+            entry = await asyncio.to_thread(self.add, channel.id, user_id, chunks)
+        except Exception as e:
+            logger.warning(f"Could not persist reply to thread {channel.id}, sending it directly: {e}")
+            await messaging.send_chunks(channel, chunks)
+            return True
+        return await self._deliver(channel, entry)
+
+    async def deliver_due(self, resolve_channel: Callable[[int], Optional[object]]) -> int:
+        """Retry a batch of replies that are due; returns how many were delivered."""
+        entries = await asyncio.to_thread(self.claim_due)
+        delivered = 0
+        for entry in entries:
+            if await self._deliver(resolve_channel(int(entry["thread_id"])), entry):
+                delivered += 1
+                self.redelivered += 1
+        if entries:
+            logger.info(f"Outbox: delivered {delivered} of {len(entries)} pending replies")
+        return delivered
+
+    def stats(self) -> Dict:
+        """Pending depth and age of the oldest pending reply, plus counters since startup."""
+        rows = list(self.collection.aggregate([
+            {"$match": {"status": "pending"}},
+            {"$group": {"_id": None, "depth": {"$sum": 1}, "oldest": {"$min": "$created_at"}}},
+        ]))
+        row = rows[0] if rows else {}
+        oldest = row.get("oldest")
+        return {
+            "depth": row.get("depth", 0),
+            "oldest_age_s": (datetime.datetime.utcnow() - oldest).total_seconds() if oldest else None,
+            "delivered": self.delivered,
+            "redelivered": self.redelivered,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+
+reply_outbox = ReplyOutbox()
@@ -0,0 +1,299 @@
+"""Data lifecycle for messages, conversations and ended sessions.
+
+Each collection can get a TTL index that expires documents N days after
+their timestamp. Before that happens, the archiver streams documents older
+than the archive age into gzip-compressed JSONL files, one per day:
+
+    <ARCHIVE_DIR>/<collection>/<YYYY-MM-DD>.jsonl.gz
+
+Archived documents are deleted batch by batch, each batch only after it has
+been flushed to disk, so memory use is bounded by the batch size. Archives
+can be re-imported with restore_archive().
+
+Everything is off until configured through the environment:
+
+    RETENTION_<COLLECTION>_TTL_DAYS       e.g. RETENTION_MESSAGES_TTL_DAYS=180
+    RETENTION_<COLLECTION>_ARCHIVE_DAYS   defaults to TTL_DAYS - 7
+    ARCHIVE_DIR                           defaults to ./archive
+
+The conversations settings apply to both the legacy per-turn collection and
+conversation_buckets; a bucket is archived and expired by its newest turn.
+
+Command line:
+
+    python retention.py ensure-indexes
+    python retention.py archive [--collection messages] [--dry-run]
+    python retention.py restore archive/messages --collection messages [--into messages_restored]
+"""
+import os
+import gzip
+import glob
+import logging
+import argparse
+import datetime
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from bson import json_util
+from pymongo.errors import BulkWriteError
+
+import db
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+ARCHIVE_BATCH_SIZE = 1000
+
+# Exact round-trip of ObjectIds, datetimes etc. through JSON
+JSON_OPTIONS = json_util.CANONICAL_JSON_OPTIONS
+
+
+@dataclass
+class RetentionPolicy:
+    """Retention settings for one collection."""
+
+    collection: str
+    time_field: str          # date field the TTL index expires on
+    ttl_days: int = 0        # 0 disables the TTL index
+    archive_days: int = 0    # 0 disables archiving
+    extra_filter: Optional[Dict] = None  # only documents matching this are archived
+    archive_by_time_field: bool = False  # select by time_field instead of _id, for documents that keep growing
+
+    @property
+    def index_name(self) -> str:
+        return f"ttl_{self.time_field}"
+
+
+def _policy_from_env(collection: str, time_field: str, extra_filter: Optional[Dict] = None,
+                     env_name: Optional[str] = None, archive_by_time_field: bool = False) -> RetentionPolicy:
+    prefix = f"RETENTION_{(env_name or collection).upper()}"
+    ttl_days = db._env_int(f"{prefix}_TTL_DAYS", 0)
+    archive_days = db._env_int(f"{prefix}_ARCHIVE_DAYS", max(ttl_days - 7, 1) if ttl_days else 0)
+    if ttl_days and archive_days >= ttl_days:
+        raise ValueError(f"{prefix}_ARCHIVE_DAYS must be lower than {prefix}_TTL_DAYS, "
+                         f"or documents expire before they are archived.")
+    return RetentionPolicy(collection, time_field, ttl_days, archive_days, extra_filter, archive_by_time_field)
+
+
+def load_policies() -> List[RetentionPolicy]:
+    """Retention policies for every managed collection, read from the environment."""
+    return [
+        _policy_from_env("messages", "timestamp"),
+        _policy_from_env("conversations", "timestamp"),
+        # A bucket expires and is archived once its newest turn is old enough
+        _policy_from_env("conversation_buckets", "end", env_name="conversations", archive_by_time_field=True),
+        # Active sessions have no end_time, so the TTL index never touches them
+        _policy_from_env("sessions", "end_time", extra_filter={"active": False}),
+    ]
+
+
+def ensure_ttl_indexes(policies: Optional[List[RetentionPolicy]] = None) -> List[str]:
+    """Create, update or drop TTL indexes so they match the configured policies.
+
+    A failure on one collection is logged and does not stop the others;
+    returns the collections whose index could not be updated.
+    """
+    failed = []
+    for policy in policies or load_policies():
+        try:
+            _ensure_ttl_index(policy)
+        except Exception as e:
+            failed.append(policy.collection)
+            logger.error(f"Could not update the TTL index on {policy.collection}.{policy.time_field}: {e}")
+    return failed
+
+
+def _ensure_ttl_index(policy: RetentionPolicy):
+    """Bring one policy's TTL index in line with its configured TTL."""
+    collection = db.get_database()[policy.collection]
+    existing = collection.index_information().get(policy.index_name)
+
+    if not policy.ttl_days:
+        if existing and "expireAfterSeconds" in existing:
+            collection.drop_index(policy.index_name)
+            logger.info(f"Dropped TTL index on {policy.collection}.{policy.time_field}")
+        return
+
+    if db._ensure_ttl_index(collection, policy.time_field, policy.ttl_days * 86400, name=policy.index_name):
+        logger.info(f"TTL on {policy.collection}.{policy.time_field} set to {policy.ttl_days} days")
+
+
+def _archive_path(archive_dir: str, collection: str, day: datetime.date) -> str:
+    return os.path.join(archive_dir, collection, f"{day.isoformat()}.jsonl.gz")
+
+
+class _PartitionWriter:
+    """Appends documents to the gzip file for their day, keeping one file open at a time."""
+
+    def __init__(self, archive_dir: str, collection: str):
+        self.archive_dir = archive_dir
+        self.collection = collection
+        self._day = None
+        self._file = None
+        self.files = set()
+
+    def write(self, day: datetime.date, line: str):
+        if day != self._day:
+            self.close()
+            path = _archive_path(self.archive_dir, self.collection, day)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Appending adds a new gzip member, which readers handle transparently
+            self._file = gzip.open(path, "at", encoding="utf-8")
+            self._day = day
+            self.files.add(path)
+        self._file.write(line)
+        self._file.write("\n")
+
+    def sync(self):
+        """Make everything written so far durable before the source documents are deleted."""
+        if self._file is not None:
+            self._file.flush()           # text layer -> gzip
+            self._file.buffer.flush()    # gzip sync flush -> file
+            os.fsync(self._file.buffer.fileobj.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+            self._day = None
+
+
+def archive_collection(policy: RetentionPolicy, archive_dir: str = ARCHIVE_DIR,
+                       batch_size: int = ARCHIVE_BATCH_SIZE, dry_run: bool = False,
+                       now: Optional[datetime.datetime] = None) -> Dict:
+    """Stream documents older than the policy's archive age to disk, then delete them.
+
+    Documents are selected by _id creation time, which also covers documents
+    written before they carried a timestamp field, unless the policy archives
+    by its time field.
+    """
+    if not policy.archive_days:
+        return {"collection": policy.collection, "archived": 0, "files": 0}
+
+    now = now or datetime.datetime.utcnow()
+    cutoff = now - datetime.timedelta(days=policy.archive_days)
+    if policy.archive_by_time_field:
+        query = {policy.time_field: {"$lt": cutoff}}
+    else:
+        query = {"_id": {"$lt": ObjectId.from_datetime(cutoff)}}
+    if policy.extra_filter:
+        query.update(policy.extra_filter)
+
+    collection = db.get_database()[policy.collection]
+    cursor = collection.find(query, batch_size=batch_size).sort("_id", 1)
+    writer = _PartitionWriter(archive_dir, policy.collection)
+    archived = 0
+    batch_ids = []
+
+    def commit_batch():
+        writer.sync()
+        if not dry_run:
+            collection.delete_many({"_id": {"$in": batch_ids}})
+        batch_ids.clear()
+
+    try:
+        for doc in cursor:
+            if policy.archive_by_time_field:
+                day = doc[policy.time_field].date()
+            else:
+                day = doc["_id"].generation_time.date()
+            if not dry_run:
+                writer.write(day, json_util.dumps(doc, json_options=JSON_OPTIONS))
+            batch_ids.append(doc["_id"])
+            archived += 1
+            if len(batch_ids) >= batch_size:
+                commit_batch()
+        if batch_ids:
+            commit_batch()
+    finally:
+        cursor.close()
+        writer.close()
+
+    logger.info(f"Archived {archived} documents from {policy.collection} into {len(writer.files)} file(s)")
+    return {"collection": policy.collection, "archived": archived, "files": len(writer.files)}
+
+
+def archive_all(archive_dir: str = ARCHIVE_DIR, dry_run: bool = False) -> List[Dict]:
+    """Run the archiver for every collection with archiving enabled."""
+    return [archive_collection(policy, archive_dir, dry_run=dry_run) for policy in load_policies() if policy.archive_days]
+
+
+def _iter_archive_files(path: str) -> Iterable[str]:
+    if os.path.isdir(path):
+        yield from sorted(glob.glob(os.path.join(path, "*.jsonl.gz")))
+    else:
+        yield path
+
+
+def restore_archive(path: str, collection: str, batch_size: int = ARCHIVE_BATCH_SIZE) -> Dict:
+    """Re-import an archive file, or every file in an archive directory, into a collection.
+
+    Documents that already exist (same _id) are skipped. Note that documents
+    restored into a collection with a TTL index are expired again by Mongo if
+    they are older than the TTL; restore into another collection to keep them.
+    """
+    target = db.get_database()[collection]
+    restored = 0
+    skipped = 0
+
+    def insert(batch):
+        nonlocal restored, skipped
+        try:
+            result = target.insert_many(batch, ordered=False)
+            restored += len(result.inserted_ids)
+        except BulkWriteError as e:
+            duplicates = sum(1 for error in e.details.get("writeErrors", []) if error.get("code") == 11000)
+            if duplicates != len(e.details.get("writeErrors", [])):
+                raise
+            restored += e.details.get("nInserted", 0)
+            skipped += duplicates
+
+    for file_path in _iter_archive_files(path):
+        batch = []
+        with gzip.open(file_path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    batch.append(json_util.loads(line, json_options=JSON_OPTIONS))
+                if len(batch) >= batch_size:
+                    insert(batch)
+                    batch = []
+        if batch:
+            insert(batch)
+
+    logger.info(f"Restored {restored} documents into {collection} ({skipped} already present)")
+    return {"collection": collection, "restored": restored, "skipped": skipped}
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Schrödy data retention and archiving")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    subcommands.add_parser("ensure-indexes", help="Create or update TTL indexes from the environment")
+
+    archive = subcommands.add_parser("archive", help="Archive documents older than the archive age")
+    archive.add_argument("--collection", help="Only archive this collection")
+    archive.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    archive.add_argument("--dry-run", action="store_true", help="Count documents without writing or deleting")
+
+    restore = subcommands.add_parser("restore", help="Re-import an archive file or directory")
+    restore.add_argument("path")
+    restore.add_argument("--collection", required=True, help="Collection the archive came from")
+    restore.add_argument("--into", help="Restore into this collection instead")
+
+    args = parser.parse_args()
+
+    if args.command == "ensure-indexes":
+        ensure_ttl_indexes()
+    elif args.command == "archive":
+        policies = [p for p in load_policies() if not args.collection or p.collection == args.collection]
+        for policy in policies:
+            print(archive_collection(policy, args.archive_dir, dry_run=args.dry_run))
+    elif args.command == "restore":
+        print(restore_archive(args.path, args.into or args.collection))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import os
+import re
+import zlib
+import asyncio
+import threading
+import numpy as np
+from typing import List, Optional, Protocol, Tuple
+
+import db
+from cache import TTLCache
+
+# Retrieved context is opt-in, like MODEL_ROUTING and HEDGE_REQUESTS; with it
+# off get_context only uses recent turns
+RETRIEVAL_CONTEXT = os.getenv("RETRIEVAL_CONTEXT", "").lower() in ("1", "true", "yes")
+
+EMBEDDING_DIM = 256
+MAX_USER_EXCHANGES = 2000   # newest exchanges kept per user
+INDEX_CACHE_USERS = 256     # users whose index is kept in memory
+INDEX_CACHE_TTL = 3600      # seconds an idle user's index stays loaded
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+class Embedder(Protocol):
+    """Anything that maps texts to an (n, dim) float32 matrix of L2-normalised rows."""
+
+    dim: int
+
+    def embed(self, texts: List[str]) -> np.ndarray: ...
+
+
+class HashingEmbedder:
+    """Deterministic local embedder: signed feature hashing of words and word pairs.
+
+    Needs no model or network and gives the same vectors in every process,
+    which makes it suitable for tests and benchmarks as well as production.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        tokens = _TOKEN_RE.findall(text.lower())
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                matrix[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+
+class UserIndex:
+    """One user's exchanges and their embeddings, in a matrix that grows by doubling."""
+
+    __slots__ = ("vectors", "exchanges", "size", "capacity")
+
+    def __init__(self, dim: int, capacity: int = MAX_USER_EXCHANGES):
+        self.vectors = np.zeros((16, dim), dtype=np.float32)
+        self.exchanges: List[Tuple[str, str]] = []
+        self.size = 0
+        self.capacity = capacity
+
+    def add(self, vectors: np.ndarray, exchanges: List[Tuple[str, str]]):
+        """Append exchanges; once over capacity the oldest ones are dropped."""
+        needed = self.size + len(exchanges)
+        if needed > len(self.vectors):
+            grown = np.zeros((max(needed, 2 * len(self.vectors)), self.vectors.shape[1]), dtype=np.float32)
+            grown[:self.size] = self.vectors[:self.size]
+            self.vectors = grown
+        self.vectors[self.size:needed] = vectors
+        self.exchanges.extend(exchanges)
+        self.size = needed
+        if self.size > self.capacity:
+            drop = self.size - self.capacity
+            self.vectors[:self.capacity] = self.vectors[drop:self.size]
+            del self.exchanges[:drop]
+            self.size = self.capacity
+
+    def search(self, queries: np.ndarray, k: int, exclude_last: int = 0) -> List[List[Tuple[float, int]]]:
+        """Top-k (cosine score, position) per query row, best first, ignoring the newest exclude_last."""
+        limit = self.size - exclude_last
+        if limit <= 0 or k <= 0:
+            return [[] for _ in range(len(queries))]
+        scores = queries @ self.vectors[:limit].T      # rows are normalised, so dot product = cosine
+        k = min(k, limit)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in enumerate(top):
+            ordered = candidates[np.argsort(-scores[row, candidates])]
+            results.append([(float(scores[row, i]), int(i)) for i in ordered])
+        return results
+
+
+class RetrievalIndex:
+    """Per-user retrieval over past exchanges stored in the conversation buckets.
+
+    A user's index is built from the database on first use (load_user) and
+    kept current with add_exchange; idle users are evicted from memory.
+    """
+
+    def __init__(self, embedder: Optional[Embedder] = None, max_users: int = INDEX_CACHE_USERS,
+                 ttl: float = INDEX_CACHE_TTL, max_exchanges: int = MAX_USER_EXCHANGES):
+        self.embedder = embedder or HashingEmbedder()
+        self.max_exchanges = max_exchanges
+        self._users = TTLCache(max_users, ttl)
+        self._lock = threading.Lock()
+
+    def _new_index(self) -> UserIndex:
+        return UserIndex(self.embedder.dim, self.max_exchanges)
+
+    @staticmethod
+    def _text(question: str, answer: str) -> str:
+        return f"{question}\n{answer}"
+
+    def load_user(self, user_id) -> UserIndex:
+        """Return the user's index, building it from stored conversations if not loaded."""
+        index = self._users.get(str(user_id))
+        if index is not None:
+            return index
+        exchanges = db.get_conversation_exchanges(user_id, limit=self.max_exchanges)
+        index = self._new_index()
+        if exchanges:
+            index.add(self.embedder.embed([self._text(q, a) for q, a in exchanges]), exchanges)
+        with self._lock:
+            # Another caller may have loaded it meanwhile; keep the first
+            existing = self._users.get(str(user_id))
+            if existing is not None:
+                return existing
+            self._users.set(str(user_id), index)
+        return index
+
+    async def ensure_loaded(self, user_id) -> UserIndex:
+        """load_user without blocking the event loop on the database read."""
+        index = self._users.get(str(user_id))
+        if index is not None:
+            return index
+        return await asyncio.to_thread(self.load_user, user_id)
+
+    def add_exchange(self, user_id, question: str, answer: str):
+        """Index a new exchange for a user whose index is loaded (others load it from the database later)."""
+        index = self._users.get(str(user_id))
+        if index is None:
+            return
+        index.add(self.embedder.embed([self._text(question, answer)]), [(question, answer)])
+
+    def search(self, user_id, query: str, k: int = 3, exclude_last: int = 0, min_score: float = 0.0,
+               in_order: bool = False) -> List[Tuple[float, str, str]]:
+        """Most similar past exchanges as (score, question, answer).
+
+        Best first, or in conversation order with in_order=True.
+        """
+        index = self._users.get(str(user_id))
+        if index is None or not index.size:
+            return []
+        hits = [(score, i) for score, i in index.search(self.embedder.embed([query]), k, exclude_last)[0]
+                if score >= min_score]
+        if in_order:
+            hits.sort(key=lambda hit: hit[1])
+        return [(score, *index.exchanges[i]) for score, i in hits]
+
+    def forget(self, user_id):
+        self._users.pop(str(user_id))
+
+    def stats(self) -> dict:
+        return self._users.stats()
+
+
+retrieval_index = RetrievalIndex()
@@ -0,0 +1,77 @@
+import os
+import asyncio
+import logging
+from typing import Dict, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# What the running process ended up using; reported at startup
+features: Dict[str, str] = {"loop": "asyncio", "json": "json", "resolver": "threaded"}
+
+
+def speed_mode_enabled() -> bool:
+    """Whether the opt-in speed runtime is on (SPEED_MODE, default off).
+
+    Uses the optional packages uvloop, orjson and aiodns; each one that is
+    missing falls back to the standard library with a warning.
+    """
+    return os.getenv("SPEED_MODE", "").lower() in ("1", "true", "yes")
+
+
+def use_uvloop() -> bool:
+    """Install uvloop's event loop policy; call before asyncio.run."""
+    try:
+        import uvloop
+    except ImportError:
+        logger.warning("SPEED_MODE: uvloop is not installed, using the default asyncio loop")
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    features["loop"] = "uvloop"
+    return True
+
+
+def use_orjson() -> bool:
+    """Make discord.py encode and decode gateway and HTTP JSON with orjson.
+
+    discord.py already picks orjson when it is importable at import time;
+    this only patches it in if that did not happen.
+    """
+    from discord import utils
+
+    if not getattr(utils, "HAS_ORJSON", False):
+        try:
+            import orjson
+        except ImportError:
+            logger.warning("SPEED_MODE: orjson is not installed, using the json module")
+            return False
+        utils._to_json = lambda obj: orjson.dumps(obj).decode("utf-8")
+        utils._from_json = orjson.loads
+        utils.HAS_ORJSON = True
+    features["json"] = "orjson"
+    return True
+
+
+def make_connector() -> Optional[aiohttp.TCPConnector]:
+    """TCP connector using aiodns for lookups, or None to keep aiohttp's default; call from the running loop."""
+    try:
+        resolver = aiohttp.AsyncResolver()
+    except (ImportError, RuntimeError) as e:
+        logger.warning(f"SPEED_MODE: aiodns resolver unavailable ({e}), using the threaded resolver")
+        return None
+    features["resolver"] = "aiodns"
+    # limit=0 matches the connector discord.py creates itself
+    return aiohttp.TCPConnector(limit=0, resolver=resolver)
+
+
+def install() -> Dict[str, str]:
+    """Apply the process-wide parts of speed mode (loop policy and JSON) if it is enabled."""
+    from discord import utils
+
+    if speed_mode_enabled():
+        use_uvloop()
+        use_orjson()
+    elif getattr(utils, "HAS_ORJSON", False):
+        features["json"] = "orjson"
+    return features
@@ -1,58 +1,148 @@
-import datetime
+import time
+import asyncio
 import learnlm
 import db
 import discord
-from typing import Dict, Optional
+import retrieval
+from retrieval import retrieval_index
+from outbox import reply_outbox
+from typing import Dict, List, Optional, Set, Tuple
+
+# How many exchanges each user keeps in memory for prompt context
+HISTORY_CAPACITY = 8
+
+# Context per turn with retrieval on: the latest exchanges plus the most relevant older ones
+RECENT_CONTEXT_TURNS = 2
+RETRIEVED_CONTEXT_TURNS = 3
+RETRIEVAL_MIN_SCORE = 0.2
+RETRIEVED_ANSWER_CHARS = 400
+
+class HistoryRing:
+    """Fixed-capacity ring buffer of (timestamp, user_message, bot_response) tuples.
+
+    Once full, each new exchange overwrites the oldest one, so memory per user is bounded.
+    """
+
+    __slots__ = ("_entries", "_next", "_size")
+
+    def __init__(self, capacity: int = HISTORY_CAPACITY):
+        self._entries = [None] * capacity
+        self._next = 0
+        self._size = 0
+
+    def append(self, timestamp: float, user_message: str, bot_response: str):
+        self._entries[self._next] = (timestamp, user_message, bot_response)
+        self._next = (self._next + 1) % len(self._entries)
+        self._size = min(self._size + 1, len(self._entries))
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
+
+    def last(self, count: int) -> List[Tuple[float, str, str]]:
+        """Return the most recent `count` entries, oldest first."""
+        count = min(count, self._size)
+        capacity = len(self._entries)
+        return [self._entries[(self._next - count + i) % capacity] for i in range(count)]
+
+    def __iter__(self):
+        return iter(self.last(self._size))
 
 class UserSession:
-    """Represents an individual user's session within a tutoring thread."""
+    """Represents an individual user's session within a tutoring thread.
+
+    Only snowflake IDs are stored; the discord.py objects are resolved from the
+    bot's cache on access so sessions never pin gateway cache entries.
+    """
+
+    __slots__ = ("user_id", "thread_id", "start_time", "active", "conversation_history", "last_activity")
     
     def __init__(self, user, thread):
-        self.user = user
-        self.thread = thread
-        self.start_time = datetime.datetime.utcnow()
+        self.user_id = getattr(user, "id", user)
+        self.thread_id = getattr(thread, "id", thread)
+        self.start_time = time.time()
         self.active = True
-        self.conversation_history = []  # Store user-specific conversation history
-        self.last_activity = datetime.datetime.utcnow()
+        self.conversation_history = HistoryRing()  # Store user-specific conversation history
+        self.last_activity = self.start_time
+
+    @property
+    def user(self):
+        """The discord.User from the bot's cache, or None if it is not cached."""
+        return session_manager.resolve_user(self.user_id)
+
+    @property
+    def thread(self):
+        """The tutoring thread, resolved from the bot's cache."""
+        return session_manager.resolve_channel(self.thread_id)
+
+    @property
+    def mention(self) -> str:
+        return f"<@{self.user_id}>"
     
     def add_to_history(self, message_content: str, response: str):
         """Add message and response to user's conversation history."""
-        self.conversation_history.append({
-            'timestamp': datetime.datetime.utcnow(),
-            'user_message': message_content,
-            'bot_response': response
-        })
-        self.last_activity = datetime.datetime.utcnow()
-    
-    def get_context(self) -> str:
-        """Get conversation context for this specific user."""
-        if not self.conversation_history:
-            return ""
-        
-        # Return last few exchanges for context (adjust number as needed)
-        recent_history = self.conversation_history[-5:]  # Last 5 exchanges
+        self.last_activity = time.time()
+        self.conversation_history.append(self.last_activity, message_content, response)
+    
+    def get_context(self, query: Optional[str] = None) -> str:
+        """Get conversation context for this specific user.
+
+        With a query and retrieval enabled, the context is the latest few
+        exchanges plus the older exchanges most similar to the query;
+        otherwise it is the last 5 exchanges.
+        """
+        if not query or not retrieval.RETRIEVAL_CONTEXT:
+            if not self.conversation_history:
+                return ""
+            # Return last few exchanges for context (adjust number as needed)
+            recent_history = self.conversation_history.last(5)  # Last 5 exchanges
+            context = []
+            for _, user_message, bot_response in recent_history:
+                context.append(f"User: {user_message}")
+                context.append(f"Assistant: {bot_response}")
+            return "\n".join(context)
+
+        recent_history = self.conversation_history.last(RECENT_CONTEXT_TURNS)
+        relevant = retrieval_index.search(
+            self.user_id, query, k=RETRIEVED_CONTEXT_TURNS,
+            exclude_last=len(recent_history), min_score=RETRIEVAL_MIN_SCORE, in_order=True,
+        )
         context = []
-        for entry in recent_history:
-            context.append(f"User: {entry['user_message']}")
-            context.append(f"Assistant: {entry['bot_response']}")
-        
+        for _, user_message, bot_response in relevant:
+            if len(bot_response) > RETRIEVED_ANSWER_CHARS:
+                bot_response = bot_response[:RETRIEVED_ANSWER_CHARS] + "…"
+            context.append(f"User: {user_message}")
+            context.append(f"Assistant: {bot_response}")
+        for _, user_message, bot_response in recent_history:
+            context.append(f"User: {user_message}")
+            context.append(f"Assistant: {bot_response}")
         return "\n".join(context)
 
 class TutoringSession:
     """Represents a tutoring session that can handle multiple users in the same thread."""
 
+    __slots__ = ("thread_id", "start_time", "active", "user_sessions", "session_timeout")
+
     def __init__(self, thread):
-        self.thread = thread
-        self.start_time = datetime.datetime.utcnow()
+        self.thread_id = getattr(thread, "id", thread)
+        self.start_time = time.time()
         self.active = True
         self.user_sessions: Dict[int, UserSession] = {}  # user_id -> UserSession
         self.session_timeout = 1800  # 30 min timeout for inactive users
+
+    @property
+    def thread(self):
+        """The tutoring thread, resolved from the bot's cache."""
+        return session_manager.resolve_channel(self.thread_id)
     
     def add_user(self, user) -> UserSession:
         """Add a new user to the session or return existing user session."""
-        if user.id not in self.user_sessions:
-            self.user_sessions[user.id] = UserSession(user, self.thread)
-        return self.user_sessions[user.id]
+        user_id = getattr(user, "id", user)
+        if user_id not in self.user_sessions:
+            self.user_sessions[user_id] = UserSession(user_id, self.thread_id)
+        return self.user_sessions[user_id]
     
     def get_user_session(self, user_id: int) -> Optional[UserSession]:
         """Get user session by user ID."""
@@ -61,14 +151,14 @@ class TutoringSession:
     def remove_inactive_users(self):
         """Remove users who have been inactive for too long."""
         try:
-            current_time = datetime.datetime.utcnow()
+            current_time = time.time()
             inactive_users = []
             
             for user_id, user_session in self.user_sessions.items():
                 try:
                     # Check if last_activity exists and is valid
-                    if hasattr(user_session, 'last_activity') and user_session.last_activity:
-                        time_since_activity = (current_time - user_session.last_activity).total_seconds()
+                    if user_session.last_activity:
+                        time_since_activity = current_time - user_session.last_activity
                         if time_since_activity > self.session_timeout:
                             inactive_users.append(user_id)
                     else:
@@ -103,7 +193,9 @@ class TutoringSession:
             return await message.channel.send(f"❌ {message.author.mention}, your individual session has ended. Rejoin with `/join_session`.")
         
         # Get user-specific context
-        context = user_session.get_context()
+        if retrieval.RETRIEVAL_CONTEXT:
+            await retrieval_index.ensure_loaded(user_session.user_id)
+        context = user_session.get_context(message.content)
         
         # Prepare message with context for LearnLM
         contextual_message = f"User: {message.author.display_name}\n"
@@ -112,20 +204,33 @@ class TutoringSession:
         contextual_message += f"Current message: {message.content}"
         
         # Get response from LearnLM
-        response = learnlm.ask_learnlm(contextual_message)
+        response = await learnlm.ask_learnlm_async(
+            contextual_message,
+            session_depth=len(user_session.conversation_history),
+            question=message.content,
+        )
         
         # Add to user's conversation history
         user_session.add_to_history(message.content, response)
         
-        # Send response mentioning the user
-        await message.channel.send(f"{message.author.mention}, {response}")
+        # Send response mentioning the user through the outbox, which keeps it
+        # for retries if Discord rejects or drops the send
+        await reply_outbox.send(message.channel, message.author.id, f"{message.author.mention}, {response}")
+
+        # Keep the exchange for retrieval in later turns and sessions (not error replies)
+        if retrieval.RETRIEVAL_CONTEXT and not response.startswith("❌"):
+            retrieval_index.add_exchange(user_session.user_id, message.content, response)
+            try:
+                await asyncio.to_thread(db.add_exchange, user_session.user_id, message.content, response)
+            except Exception as e:
+                print(f"Error saving exchange for user {user_session.user_id}: {e}")
     
     async def end_user_session(self, user):
         """Ends a specific user's session."""
         if user.id in self.user_sessions:
             user_session = self.user_sessions[user.id]
             user_session.active = False
-            db.end_session(user.id, self.thread.id)
+            db.end_session(user.id, self.thread_id)
             
             # Remove user from active sessions
             del self.user_sessions[user.id]
@@ -139,7 +244,7 @@ class TutoringSession:
         # End all user sessions
         for user_id, user_session in self.user_sessions.items():
             user_session.active = False
-            db.end_session(user_id, self.thread.id)
+            db.end_session(user_id, self.thread_id)
         
         # Notify all users
         user_mentions = [f"<@{user_id}>" for user_id in self.user_sessions.keys()]
@@ -149,17 +254,21 @@ class TutoringSession:
         
         self.user_sessions.clear()
     
+    def get_active_user_ids(self) -> list:
+        """Get IDs of active users in the session."""
+        return [user_id for user_id, user_session in self.user_sessions.items() if user_session.active]
+
     def get_active_users(self) -> list:
-        """Get list of active users in the session."""
-        return [user_session.user for user_session in self.user_sessions.values() if user_session.active]
+        """Get list of active users in the session (resolved from the bot's cache)."""
+        return [session_manager.resolve_user(user_id) or discord.Object(id=user_id) for user_id in self.get_active_user_ids()]
     
     def get_session_stats(self) -> dict:
         """Get statistics about the session."""
         return {
             'total_users': len(self.user_sessions),
             'active_users': len([us for us in self.user_sessions.values() if us.active]),
-            'session_duration': (datetime.datetime.utcnow() - self.start_time).total_seconds(),
-            'users': [us.user.display_name for us in self.user_sessions.values()]
+            'session_duration': time.time() - self.start_time,
+            'users': [us.mention for us in self.user_sessions.values()]
         }
 
 # Session Management 
@@ -167,13 +276,41 @@ class SessionManager:
     """Manages multiple tutoring sessions across different threads."""
     
     def __init__(self):
+        self.bot = None  # set by the tutor cog; used to resolve IDs to discord objects
         self.sessions: Dict[int, TutoringSession] = {}  # thread_id -> TutoringSession
+        # Every thread with an active tutoring session, including ones with an active
+        # session in the database but no in-memory session yet (e.g. after a restart).
+        # on_message answers only these threads, so unrelated traffic costs a single
+        # set lookup.
+        self.tutoring_thread_ids: Set[int] = set()
     
     def create_session(self, thread) -> TutoringSession:
         """Create a new tutoring session for a thread."""
         session = TutoringSession(thread)
         self.sessions[thread.id] = session
+        self.tutoring_thread_ids.add(thread.id)
         return session
+
+    def resolve_user(self, user_id: int):
+        """Look a user up in the bot's cache; None if unknown or no bot is attached."""
+        return self.bot.get_user(user_id) if self.bot else None
+
+    def resolve_channel(self, channel_id: int):
+        """Look a channel up in the bot's cache, falling back to a sendable partial channel."""
+        if self.bot is None:
+            return None
+        channel = self.bot.get_channel(channel_id)
+        if channel is None and hasattr(self.bot, "get_partial_messageable"):
+            channel = self.bot.get_partial_messageable(channel_id)
+        return channel
+
+    def rehydrate_thread_ids(self, thread_ids):
+        """Register tutoring threads loaded from the database."""
+        for thread_id in thread_ids:
+            try:
+                self.tutoring_thread_ids.add(int(thread_id))
+            except (TypeError, ValueError):
+                continue
     
     def get_session(self, thread_id: int) -> Optional[TutoringSession]:
         """Get existing session by thread ID."""
@@ -183,6 +320,7 @@ class SessionManager:
         """End and remove a session."""
         if thread_id in self.sessions:
             del self.sessions[thread_id]
+        self.tutoring_thread_ids.discard(thread_id)
     
     def cleanup_inactive_sessions(self):
         """Clean up inactive users across all sessions."""
@@ -0,0 +1,103 @@
+import datetime
+
+import mongomock
+import pytest
+
+from guest_tracker import GuestParticipationTracker
+
+DAY = 86400
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+class RecordingCollection:
+    """Keeps the filters of bulk upserts; mongomock's bulk_write does not match this pymongo."""
+
+    def __init__(self):
+        self.writes = []
+
+    def bulk_write(self, operations, ordered=True):
+        self.writes.extend(operation._filter["_id"] for operation in operations)
+
+
+@pytest.fixture
+def collection():
+    return RecordingCollection()
+
+
+def test_cache_stays_within_maxsize(clock, collection):
+    tracker = GuestParticipationTracker(collection, maxsize=100, ttl_days=7, clock=clock)
+    for user_id in range(1000):
+        clock.now += 1
+        tracker.add(user_id)
+        assert len(tracker) <= 100
+    # The least recently asked guests are the ones evicted
+    assert 999 in tracker
+    assert 0 not in tracker
+
+
+def test_entries_expire_after_ttl(clock, collection):
+    tracker = GuestParticipationTracker(collection, maxsize=100, ttl_days=7, clock=clock)
+    tracker.add(1)
+    clock.now += 6 * DAY
+    tracker.add(2)
+    assert 1 in tracker
+
+    clock.now += 2 * DAY
+    assert 1 not in tracker
+    assert 2 in tracker
+    assert tracker.purge_expired() == 0  # 1 was already dropped on access
+
+    clock.now += 7 * DAY
+    assert tracker.purge_expired() == 1
+    assert len(tracker) == 0
+
+
+def test_flush_writes_pending_once(clock, collection):
+    tracker = GuestParticipationTracker(collection, maxsize=100, ttl_days=7, clock=clock)
+    tracker.add(1)
+    tracker.add(2)
+    assert tracker.flush() == 2
+    assert tracker.pending == 0
+    assert tracker.flush() == 0
+    assert sorted(collection.writes) == ["1", "2"]
+
+
+def test_failed_flush_keeps_entries_pending(clock):
+    class FailingCollection:
+        def bulk_write(self, operations, ordered=True):
+            raise ConnectionError("mongo is down")
+
+    tracker = GuestParticipationTracker(FailingCollection(), maxsize=100, ttl_days=7, clock=clock)
+    tracker.add(1)
+    with pytest.raises(ConnectionError):
+        tracker.flush()
+    assert tracker.pending == 1
+
+
+def test_load_skips_expired_entries(clock):
+    collection = mongomock.MongoClient().db.guest_participation
+    now = datetime.datetime.utcfromtimestamp(clock.now)
+    collection.insert_many([
+        {"_id": "1", "asked_at": now - datetime.timedelta(days=8)},
+        {"_id": "2", "asked_at": now - datetime.timedelta(days=3)},
+    ])
+    tracker = GuestParticipationTracker(collection, maxsize=100, ttl_days=7, clock=clock)
+    assert tracker.load() == 1
+    assert 2 in tracker
+    assert 1 not in tracker
+
+    # Loaded entries keep their original expiry rather than a fresh TTL
+    clock.now += 5 * DAY
+    assert 2 not in tracker
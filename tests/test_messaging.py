@@ -0,0 +1,111 @@
+import random
+
+import pytest
+
+import messaging
+from messaging import split_message
+
+WORDS = [
+    "the", "derivative", "of", "function", "is", "let's", "think", "about", "why",
+    "**key idea**", "*note*", "`f(x)`", "a² + b² = c²", "x = (-b ± √(b² - 4ac)) ÷ 2a",
+    "∫₀^∞ e^(-x²) dx = √π/2", "Σₙ₌₁^∞ 1/n² = π²/6", "θ", "λ", "café", "naïve",
+]
+
+
+def make_response(rng, size):
+    """Tutor-like Markdown: prose, Unicode math, inline code and fenced code blocks."""
+    parts = []
+    length = 0
+    while length < size:
+        roll = rng.random()
+        if roll < 0.02:
+            lines = "\n".join(f"    total += values[{i}] * {rng.randrange(100)}" for i in range(rng.randrange(2, 120)))
+            part = f"\n```python\ndef compute(values):\n    total = 0\n{lines}\n    return total\n```\n"
+        elif roll < 0.08:
+            part = "\n\n"
+        elif roll < 0.12:
+            part = "\n- "
+        else:
+            part = rng.choice(WORDS)
+        parts.append(part)
+        length += len(part) + 1
+    return " ".join(parts)
+
+
+def normalise(text):
+    return "".join(text.split()).replace("```python", "").replace("```", "")
+
+
+def check_chunks(text, chunks, limit):
+    """Every chunk fits, fences and inline code are balanced, math is not split
+    and no non-whitespace content is lost or reordered."""
+    for chunk in chunks:
+        assert len(chunk) <= limit, f"chunk of {len(chunk)} chars exceeds {limit}"
+        assert chunk.count("```") % 2 == 0, "unbalanced code fence"
+        assert chunk.count("`") % 2 == 0, "unbalanced inline code"
+    cursor = 0
+    for left, right in zip(chunks, chunks[1:]):
+        if left.endswith("```") or right.startswith("```"):
+            cursor = 0
+            continue
+        # Locate the gap between the two chunks in the original text
+        end = text.find(left[-30:], cursor) + len(left[-30:])
+        start = text.find(right[:30], end)
+        cursor = start
+        if "\n" in text[end:start]:
+            continue
+        tail, head = left.rstrip()[-1], right.lstrip()[0]
+        assert not (messaging._is_math_char(tail) or messaging._is_math_char(head)), \
+            f"math split between {left[-20:]!r} and {right[:20]!r}"
+    assert normalise("".join(chunks)) == normalise(text), "content lost or reordered"
+
+
+def test_short_message_is_not_split():
+    assert split_message("hello") == ["hello"]
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_generated_responses_keep_invariants(seed):
+    rng = random.Random(seed)
+    text = make_response(rng, rng.randrange(2000, 16000))
+    check_chunks(text, split_message(text), messaging.DISCORD_MESSAGE_LIMIT)
+
+
+@pytest.mark.parametrize("limit", [60, 100, 250])
+def test_small_limits_keep_invariants(limit):
+    rng = random.Random(limit)
+    for _ in range(20):
+        text = make_response(rng, rng.randrange(limit, limit * 10))
+        check_chunks(text, split_message(text, limit), limit)
+
+
+def test_math_expression_is_not_split():
+    text = "word " * 390 + "a² + b² = c² " + "word " * 100
+    chunks = split_message(text)
+    assert any("a² + b² = c²" in chunk for chunk in chunks)
+    check_chunks(text, chunks, messaging.DISCORD_MESSAGE_LIMIT)
+
+
+def test_long_code_block_reopens_fence():
+    body = "\n".join(f"print({i})" for i in range(400))
+    chunks = split_message(f"```python\n{body}\n```")
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk.startswith("```python\n") and chunk.endswith("\n```")
+        assert len(chunk) <= messaging.DISCORD_MESSAGE_LIMIT
+
+
+def test_fence_header_filling_the_limit_terminates():
+    # The header leaves no room for content between the re-opened fences
+    chunks = split_message("```" + "x" * 1996 + "\nprint(1)\n```")
+    assert all(len(chunk) <= messaging.DISCORD_MESSAGE_LIMIT for chunk in chunks)
+    assert "print(1)" in "".join(chunks)
+
+
+@pytest.mark.parametrize("limit", range(8, 24))
+def test_long_header_with_small_limit_terminates(limit):
+    header = "```b.  ="
+    chunks = split_message(header + "\n" + "y = 1\n" * 10 + "```", limit)
+    assert all(len(chunk) <= limit for chunk in chunks)
+    content = "".join(chunk.replace(header, "").replace("```", "") for chunk in chunks)
+    assert "".join(content.split()) == "y=1" * 10
@@ -0,0 +1,118 @@
+import os
+import hmac
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import List, Optional
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: set TRACE_FILE to record anonymized traffic traces for benchmarks/replay.py
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+# Key for the ID hashes. Set it to keep hashes stable across restarts; by
+# default every process uses a random key, so traces cannot be linked.
+TRACE_SALT = os.getenv("TRACE_SALT", "")
+TRACE_FLUSH_INTERVAL = 1.0
+
+
+class TraceRecorder:
+    """Appends anonymized traffic events to a JSONL file.
+
+    Discord IDs are replaced by keyed hashes and text by its length, so a
+    trace keeps the shape of real traffic (who talks in which thread, when,
+    and how much) without its content. Events are buffered in memory and
+    written by a background thread, never from the event loop.
+    """
+
+    def __init__(self, path: str, salt: str = "", flush_interval: float = TRACE_FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.recorded = 0
+        self._key = (salt or os.urandom(16).hex()).encode("utf-8")
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._writer = None
+
+    def anonymize(self, value) -> Optional[str]:
+        if value is None:
+            return None
+        return hmac.new(self._key, str(value).encode("utf-8"), hashlib.sha256).hexdigest()[:16]
+
+    def record(self, kind: str, name: str, user=None, channel=None, guild=None, chars: int = 0, **fields):
+        event = {
+            "ts": round(time.time(), 3),
+            "kind": kind,
+            "name": name,
+            "user": self.anonymize(user),
+            "channel": self.anonymize(channel),
+            "guild": self.anonymize(guild),
+            "chars": chars,
+            **fields,
+        }
+        line = json.dumps(event, separators=(",", ":"))
+        with self._lock:
+            self._pending.append(line)
+            self.recorded += 1
+
+    def record_message(self, message):
+        """Record a message posted in a tutoring thread."""
+        self.record(
+            "message", "on_message",
+            user=message.author.id,
+            channel=message.channel.id,
+            guild=message.guild.id if message.guild else None,
+            chars=len(message.content or ""),
+            tutoring_thread=True,
+        )
+
+    def record_interaction(self, interaction: discord.Interaction):
+        """Record a slash command invocation; string options only contribute their length."""
+        data = interaction.data or {}
+        channel = interaction.channel
+        self.record(
+            "command", data.get("name", "unknown"),
+            user=interaction.user.id,
+            channel=interaction.channel_id,
+            guild=interaction.guild_id,
+            chars=sum(len(option["value"]) for option in data.get("options", [])
+                      if isinstance(option.get("value"), str)),
+            # Same test /ask uses to tell a tutoring thread apart
+            tutoring_thread=isinstance(channel, discord.Thread) and channel.name.startswith("Schrödy-"),
+        )
+
+    def start(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._stop.clear()
+        self._writer = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+        self._writer.start()
+        logger.info(f"Recording anonymized traffic traces to {self.path}")
+
+    def stop(self):
+        self._stop.set()
+        if self._writer is not None:
+            self._writer.join(self.flush_interval * 2)
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError as e:
+                logger.warning(f"Could not write trace events to {self.path}: {e}")
+
+    def flush(self):
+        with self._lock:
+            lines, self._pending = self._pending, []
+        if lines:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+
+
+recorder: Optional[TraceRecorder] = TraceRecorder(TRACE_FILE, TRACE_SALT) if TRACE_FILE else None